@@ -10,18 +10,16 @@ This is the main operations of the script
 
 import argparse
 import asyncio
-import inspect
-import json
 import os
 import sys
+import time
+from functools import partial
 from pathlib import Path
 
 import httpx
-import tiktoken
 from openai import AsyncOpenAI
 from rich.console import Console
 from rich.markdown import Markdown
-from rich.prompt import Prompt
 
 from config import (
     MAIN_SYSTEM_PROMPT,
@@ -30,19 +28,48 @@ from config import (
     OPENAI_TEMP,
     OPENAI_TOP_P,
     OPENAI_MAX_TOKENS,
+    OPENAI_STREAM,
+    TOOL_MAX_CONCURRENCY,
+    TOOL_SELECTION_TOP_K,
+    TOOL_SELECTION_ALWAYS_ON,
+    TOOL_SELECTION_FALLBACK,
+    MEMORY_TOKEN_BUDGET,
+    MEMORY_KEEP_RECENT,
+    MEMORY_SUMMARY_MODEL,
+    MEMORY_RETRIEVAL_BUDGET,
+    MEMORY_RECENT_WINDOW,
+    JOURNAL_ENABLED,
+    JOURNAL_DIR,
+    JOURNAL_COMPACT_MB,
+    JOURNAL_RESUME_MESSAGES,
+    FAST_PATH_ENABLED,
+    FAST_PATH_INTENTS,
+    FAST_PATH_MIN_CONFIDENCE,
     live_spinner,
 )
-from utils.openai_model_tools import (
-    ask_chat_gpt_4_0314_synchronous,
-    ask_chat_gpt_4_0314_asynchronous,
-    ask_chat_gpt_4_32k_0314_synchronous,
-    ask_chat_gpt_4_32k_0314_asynchronous,
-    ask_chat_gpt_4_0613_synchronous,
-    ask_chat_gpt_4_0613_asynchronous,
-    ask_gpt_4_vision,
+from utils.base_tools import (
+    base_tool_list,
+    available_functions as base_functions,
 )
-from utils.openai_dalle_tools import generate_an_image_with_dalle3
-from utils.core_tools import get_current_date_time, display_help
+from utils.core_tools import display_help
+from utils.tool_registry import ToolRegistry
+from utils.tool_selector import ToolSelector
+from utils.tool_dispatcher import ToolDispatcher
+from utils.tool_cache import tool_result_cache
+from utils.tool_prefetcher import tool_prefetcher
+from utils.tool_executor import tool_executor
+from utils.token_tools import count_tokens
+from utils.conversation_memory import ConversationMemory
+from utils.memory_compactor import MemoryCompactor
+from utils.memory_retriever import MemoryRetriever
+from utils.conversation_journal import ConversationJournal
+from utils.fast_path import FastPathRouter
+from utils.completion_cache import completion_cache
+from utils.request_sizer import request_sizer
+from utils.expert_router import expert_router
+from utils.circuit_breaker import circuit_breakers, model_upstream
+from utils.stream_tools import collect_stream, MarkdownStreamRenderer
+from utils.async_console import AsyncLineReader, BackgroundSpeaker
 from output_methods.audio_pyttsx3 import tts_output
 
 from plugins.plugins_enabled import enable_plugins
@@ -66,6 +93,23 @@ main_client = AsyncOpenAI(
     )
 )
 
+
+async def request_completion(**params):
+    """
+    This function requests a chat completion from the main client.
+
+    The client is looked up on every call, so a replaced ``main_client``
+    is used.
+    """
+    return await main_client.chat.completions.create(**params)
+
+
+# Stop calling the main model while it keeps failing, without stopping the
+# expert models.
+main_create = circuit_breakers.guard(
+    model_upstream("api.openai.com", OPENAI_MODEL), request_completion
+)
+
 # Define the parameters for the OpenAI main client.
 openai_defaults = {
     "model": OPENAI_MODEL,
@@ -76,23 +120,39 @@ openai_defaults = {
     "presence_penalty": 0,
 }
 
+# Define the dispatcher that runs the tool calls of each turn.
+tool_dispatcher = ToolDispatcher(
+    max_concurrency=TOOL_MAX_CONCURRENCY,
+    result_cache=tool_result_cache,
+    executor=tool_executor,
+)
+
+# Stop the background summaries while the summary model keeps failing.
+summary_create = circuit_breakers.guard(
+    model_upstream("api.openai.com", MEMORY_SUMMARY_MODEL), request_completion
+)
 
-def join_messages(memory: list[dict]):
-    """
-    This function joins messages for conversation memory.
+# Define the compactor that summarizes the oldest turns in the background.
+memory_compactor = MemoryCompactor(
+    partial(request_sizer.acreate, summary_create),
+    MEMORY_SUMMARY_MODEL,
+    budget=MEMORY_TOKEN_BUDGET,
+    keep_recent=MEMORY_KEEP_RECENT,
+)
 
-    Args:
-        memory: The conversation memory.
+# Define the router that answers trivial requests locally.
+fast_path_router = FastPathRouter(
+    intents=FAST_PATH_INTENTS,
+    min_confidence=FAST_PATH_MIN_CONFIDENCE,
+    enabled=FAST_PATH_ENABLED,
+    executor=tool_executor,
+)
 
-    Returns:
-        The joined messages.
-    """
-    text = ""
-    for m in memory:
-        content = m.get("content")
-        if content is not None:
-            text += content + "\n"
-    return text
+# Define the retriever that selects the memory sent with each request.
+memory_retriever = MemoryRetriever(
+    budget=MEMORY_RETRIEVAL_BUDGET,
+    recent=MEMORY_RECENT_WINDOW,
+)
 
 
 def check_under_context_limit(text: str, limit: int, model: str):
@@ -107,13 +167,22 @@ def check_under_context_limit(text: str, limit: int, model: str):
     Returns:
         Whether the context is under the token limit.
     """
-    enc = tiktoken.encoding_for_model(model)
-    numtokens = len(enc.encode(text))
-    return numtokens <= limit
+    return count_tokens(text, model) <= limit
+
+
+def trim_memory(memory: ConversationMemory, limit: int = 128000):
+    """
+    This function evicts the oldest messages over the size limit.
+
+    Args:
+        memory: The conversation memory.
+        limit: The size limit of the serialized memory.
+    """
+    memory.trim_size(limit)
 
 
 async def follow_conversation(
-    user_text: str, memory: list[dict], mem_size: int, model: str
+    user_text: str, memory: ConversationMemory, mem_size: int, model: str
 ):
     """
     This function follows the conversation.
@@ -130,21 +199,18 @@ async def follow_conversation(
 
     ind = min(mem_size, len(memory))
     if ind == 0:
-        memory = [{"role": "system", "content": MAIN_SYSTEM_PROMPT}]
+        memory = ConversationMemory(
+            [{"role": "system", "content": MAIN_SYSTEM_PROMPT}], model=model
+        )
+    else:
+        memory = ConversationMemory.wrap(memory, model)
     memory.append({"role": "user", "content": user_text})
-    while (
-        not check_under_context_limit(
-            join_messages(memory),
-            128000,
-            model
-        ) and ind > 1
-    ):
+    while memory.total_tokens > 128000 and ind > 1 and memory.evictable > 1:
         ind -= 1
-        memory.pop(0)
-
+        memory.popleft()
 
     response = await main_client.chat.completions.create(
-        model=model, messages=memory[-ind:]
+        model=model, messages=memory.window(ind)
     )
 
     if (
@@ -165,6 +231,76 @@ async def follow_conversation(
     return memory
 
 
+async def create_chat_completion(messages, tools, stream=False, on_token=None):
+    """
+    This function requests a tool-enabled chat completion.
+
+    The request is fitted into the model's context window before it is
+    sent, and retried once if it is still rejected as too long.
+
+    Args:
+        messages: The messages to send.
+        tools: The tools.
+        stream: Whether to stream the completion.
+        on_token: Called with each streamed content delta.
+
+    Returns:
+        The response from the model.
+    """
+    response = await request_sizer.acreate(
+        partial(completion_cache.acreate, main_create),
+        model=openai_defaults["model"],
+        messages=messages,
+        tools=tools,
+        tool_choice="auto",
+        temperature=openai_defaults["temperature"],
+        top_p=openai_defaults["top_p"],
+        max_tokens=openai_defaults["max_tokens"],
+        frequency_penalty=openai_defaults["frequency_penalty"],
+        presence_penalty=openai_defaults["presence_penalty"],
+        stream=stream,
+    )
+
+    if stream:
+        return await collect_stream(response, on_token)
+    return response
+
+
+async def run_fast_path(
+    router, messages, tools, available_functions, original_user_input, memory
+):
+    """
+    This function answers a trivial request without the model.
+
+    The request and its answer are recorded in the conversation memory as a
+    regular turn.
+
+    Args:
+        router: The fast path router.
+        messages: The messages opening a new conversation.
+        tools: The enabled tools.
+        available_functions: The available functions.
+        original_user_input: The original user input.
+        memory: The conversation memory.
+
+    Returns:
+        The fast path answer, or None to run the full conversation, and the
+        conversation memory.
+    """
+    answer = await router.route(original_user_input, tools, available_functions)
+    if answer is None:
+        return None, memory
+
+    model = openai_defaults["model"]
+    if len(memory) == 0:
+        memory = ConversationMemory(messages, model=model)
+    else:
+        memory = ConversationMemory.wrap(memory, model)
+        memory.append({"role": "user", "content": original_user_input})
+    memory.append({"role": "assistant", "content": answer.text})
+    return answer, memory
+
+
 async def run_conversation(
     messages,
     tools,
@@ -172,95 +308,153 @@ async def run_conversation(
     original_user_input,
     memory,
     mem_size,
+    stream=False,
+    on_token=None,
+    tool_selector=None,
+    compactor=None,
+    retriever=None,
+    prefetcher=None,
+    on_tool_event=None,
+    on_discard=None,
     **kwargs,
 ):
     """
     This function runs the conversation.
 
+    A turn makes a single tool-enabled completion. A follow-up completion is
+    only made when the model called tools, and the final reply is recorded
+    in the conversation memory once. With a ``tool_selector`` only the tools
+    relevant to the user input are sent, and the first completion is retried
+    with every tool if the model calls one that was left out. With a
+    ``compactor`` the oldest turns are summarized in the background once the
+    memory is over its token budget. With a ``retriever`` the recent
+    messages and the older turns relevant to the user input are sent instead
+    of the last ``mem_size`` messages. With a ``prefetcher`` the tool calls
+    predicted from the user input run during the first completion, and the
+    dispatcher serves the matching calls of the model from them.
+    ``on_tool_event`` is told when each tool call starts and finishes.
+
+    A streamed first completion that may be retried with every tool calls
+    ``on_discard`` before the retry, so the consumer drops the text it
+    already shows. Without ``on_discard`` its tokens are held back until the
+    retry is ruled out.
+
     Args:
-        messages: The messages.
+        messages: The messages opening a new conversation.
         tools: The tools.
         available_functions: The available functions.
         original_user_input: The original user input.
         memory: The conversation memory.
         mem_size: The memory size.
+        stream: Whether to stream the completions.
+        on_token: Called with each streamed content delta.
+        tool_selector: Selects the tools sent for the user input.
+        compactor: Summarizes the oldest turns of the memory.
+        retriever: Selects the memory sent for the user input.
+        prefetcher: Starts the tool calls predicted from the user input.
+        on_tool_event: Called with the start and finish of each tool call.
+        on_discard: Called when the streamed text of a retried completion
+            must be dropped.
         **kwargs: The keyword arguments.
 
     Returns:
-        The final response from the model.
+        The final response from the model and the conversation memory.
     """
+    model = openai_defaults["model"]
 
-    memory = await follow_conversation(
-        user_text=original_user_input,
-        memory=memory,
-        mem_size=mem_size,
-        model=openai_defaults["model"],
-    )
-    memory.append({"role": "user", "content": original_user_input})
-
-    while len(json.dumps(memory)) > 128000:
-        memory.pop(0)
+    if len(memory) == 0:
+        memory = ConversationMemory(messages, model=model)
+    else:
+        memory = ConversationMemory.wrap(memory, model)
+        memory.append({"role": "user", "content": original_user_input})
 
-    response = await main_client.chat.completions.create(
-        model=openai_defaults["model"],
-        messages=memory[-mem_size:],
-        tools=tools,
-        tool_choice="auto",
-        temperature=openai_defaults["temperature"],
-        top_p=openai_defaults["top_p"],
-        max_tokens=openai_defaults["max_tokens"],
-        frequency_penalty=openai_defaults["frequency_penalty"],
-        presence_penalty=openai_defaults["presence_penalty"],
-    )
+    # Hard limit, used when the background compaction cannot keep up.
+    trim_memory(memory)
 
-    response_message = response.choices[0].message
-    tool_calls = (
-        response_message.tool_calls if hasattr(
-            response_message, "tool_calls"
-        ) else []
-    )
+    request_tools = tools
+    if tool_selector is not None:
+        request_tools = tool_selector.select(original_user_input, tools)
 
-    if response_message.content is not None:
-        memory.append(
-            {
-                "role": "assistant", "content": response_message.content
-            }
+    if retriever is not None:
+        request_messages = retriever.select(
+            memory, original_user_input, mem_size
         )
+    else:
+        request_messages = memory.window(mem_size)
 
-    if tool_calls:
-        messages.append(response_message)
-        executed_tool_call_ids = []
-
-        for tool_call in tool_calls:
-            function_name = tool_call.function.name
-
-            if function_name not in available_functions:
-                continue
+    prefetched = None
+    if prefetcher is not None:
+        prefetched = prefetcher.start(
+            original_user_input, available_functions, tools
+        )
 
-            function_to_call = available_functions[function_name]
-            function_args = json.loads(tool_call.function.arguments)
+    may_fall_back = request_tools is not tools and TOOL_SELECTION_FALLBACK
+    held_tokens = []
+    first_on_token = on_token
+    if stream and on_token is not None and may_fall_back:
+        def first_on_token(token):
+            held_tokens.append(token)
+            if on_discard is not None:
+                on_token(token)
+
+    try:
+        response = await create_chat_completion(
+            request_messages,
+            request_tools,
+            stream=stream,
+            on_token=first_on_token,
+        )
 
-            if inspect.iscoroutinefunction(function_to_call):
-                function_response = await function_to_call(**function_args)
-            else:
-                function_response = function_to_call(**function_args)
-
-            if function_response is None:
-                function_response = "No response received from the function."
-            elif not isinstance(function_response, str):
-                function_response = json.dumps(function_response)
-
-            function_response_message = {
-                "role": "tool",
-                "name": function_name,
-                "content": function_response,
-                "tool_call_id": tool_call.id,
-            }
+        response_message = response.choices[0].message
+        tool_calls = (
+            response_message.tool_calls if hasattr(
+                response_message, "tool_calls"
+            ) else []
+        )
 
-            messages.append(function_response_message)
-            executed_tool_call_ids.append(tool_call.id)
+        if tool_calls and may_fall_back:
+            sent = {tool["function"]["name"] for tool in request_tools}
+            if any(call.function.name not in sent for call in tool_calls):
+                # The model asked for a tool that was not sent, retry the turn
+                # with the full tool list.
+                tool_selector.record_fallback()
+                if held_tokens and on_discard is not None:
+                    on_discard()
+                held_tokens.clear()
+                request_tools = tools
+                response = await create_chat_completion(
+                    request_messages,
+                    request_tools,
+                    stream=stream,
+                    on_token=on_token,
+                )
+                response_message = response.choices[0].message
+                tool_calls = (
+                    response_message.tool_calls if hasattr(
+                        response_message, "tool_calls"
+                    ) else []
+                )
+
+        if on_discard is None:
+            # The first completion is kept, release its held tokens.
+            for token in held_tokens:
+                on_token(token)
+
+        if tool_calls:
+            request_messages.append(response_message)
+
+            tool_messages, _ = await tool_dispatcher.dispatch(
+                tool_calls, available_functions, prefetched, on_tool_event
+            )
+            request_messages.extend(tool_messages)
+    finally:
+        # Unclaimed prefetches are cancelled or cached even when the turn
+        # fails.
+        if prefetched is not None:
+            await prefetched.close()
 
-        messages.append(
+    if tool_calls:
+        request_messages.append(
             {
                 "role": "user",
                 "content": (
@@ -274,21 +468,18 @@ async def run_conversation(
             }
         )
 
-        second_response = await main_client.chat.completions.create(
-            model=openai_defaults["model"],
-            messages=messages,
-            tools=tools,
-            tool_choice="auto",
-            temperature=openai_defaults["temperature"],
-            top_p=openai_defaults["top_p"],
-            max_tokens=openai_defaults["max_tokens"],
-            frequency_penalty=openai_defaults["frequency_penalty"],
-            presence_penalty=openai_defaults["presence_penalty"],
+        response = await create_chat_completion(
+            request_messages, request_tools, stream=stream, on_token=on_token
         )
 
-        return second_response, memory
-    else:
-        return response, memory
+    final_message = response.choices[0].message
+    if final_message.content is not None:
+        memory.append({"role": "assistant", "content": final_message.content})
+
+    if compactor is not None:
+        compactor.schedule(memory)
+
+    return response, memory
 
 
 async def main():
@@ -307,274 +498,110 @@ async def main():
     parser.add_argument(
         "--talk", action="store_true", help="Use TTS for the final response"
     )
+    parser.add_argument(
+        "--no-stream",
+        action="store_true",
+        help="Wait for the full response instead of streaming tokens",
+    )
+    parser.add_argument(
+        "--session",
+        default="default",
+        help="Name of the conversation journal to resume",
+    )
+    parser.add_argument(
+        "--new-session",
+        action="store_true",
+        help="Discard the journal of the session and start over",
+    )
     args = parser.parse_args()
 
     use_tts = args.talk
+    use_stream = OPENAI_STREAM and not args.no_stream
 
     console.print(Markdown("# 👋  GPT_ALL 👋"), style="bold blue")
 
-    available_functions = {
-        "get_current_date_time": get_current_date_time,
-        "ask_chat_gpt_4_0314_synchronous": ask_chat_gpt_4_0314_synchronous,
-        "ask_chat_gpt_4_0314_asynchronous": ask_chat_gpt_4_0314_asynchronous,
-        "ask_chat_gpt_4_32k_0314_synchronous": ask_chat_gpt_4_32k_0314_synchronous,
-        "ask_chat_gpt_4_32k_0314_asynchronous": ask_chat_gpt_4_32k_0314_asynchronous,
-        "ask_chat_gpt_4_0613_synchronous": ask_chat_gpt_4_0613_synchronous,
-        "ask_chat_gpt_4_0613_asynchronous": ask_chat_gpt_4_0613_asynchronous,
-        "generate_an_image_with_dalle3": generate_an_image_with_dalle3,
-        "ask_gpt_4_vision": ask_gpt_4_vision,
-    }
-
-    tools = [
-        {
-            "type": "function",
-            "function": {
-                "name": "get_current_date_time",
-                "description": "Get the current date and time from the local machine.",
-            },
-        },
-        {
-            "type": "function",
-            "function": {
-                "name": "ask_chat_gpt_4_0314_synchronous",
-                "description": "This function allows you to ask a larger AI LLM for assistance synchronously, like asking a more experienced colleague for assistance.",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "temperature": {
-                            "type": "integer",
-                            "description": "The temperature associated with request: 0 for factual, 2 for creative.",
-                        },
-                        "question": {
-                            "type": "string",
-                            "description": "What are you, the ai assistant, requesting to be done with the text you are providing?",
-                        },
-                        "text": {
-                            "type": "string",
-                            "description": "The text to be analyzed",
-                        },
-                    },
-                    "required": ["question", "text"],
-                },
-            },
-        },
-        {
-            "type": "function",
-            "function": {
-                "name": "ask_chat_gpt_4_0314_asynchronous",
-                "description": "This function allows you to ask a larger AI LLM for assistance asynchronously, like asking a more experienced colleague for assistance.",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "temperature": {
-                            "type": "integer",
-                            "description": "The temperature associated with request: 0 for factual, 2 for creative.",
-                        },
-                        "question": {
-                            "type": "string",
-                            "description": "What are you, the ai assistant, requesting to be done with the text you are providing?",
-                        },
-                        "text": {
-                            "type": "string",
-                            "description": "The text to be analyzed",
-                        },
-                    },
-                    "required": ["question", "text"],
-                },
-            },
-        },
-        {
-            "type": "function",
-            "function": {
-                "name": "ask_chat_gpt_4_32k_0314_synchronous",
-                "description": "This function allows you to ask a larger AI LLM for assistance synchronously, like asking a more experienced colleague for assistance.",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "temperature": {
-                            "type": "integer",
-                            "description": "The temperature associated with request: 0 for factual, 2 for creative.",
-                        },
-                        "question": {
-                            "type": "string",
-                            "description": "What are you, the ai assistant, requesting to be done with the text you are providing?",
-                        },
-                        "text": {
-                            "type": "string",
-                            "description": "The text to be analyzed",
-                        },
-                    },
-                    "required": ["question", "text"],
-                },
-            },
-        },
-        {
-            "type": "function",
-            "function": {
-                "name": "ask_chat_gpt_4_32k_0314_asynchronous",
-                "description": "This function allows you to ask a larger AI LLM for assistance asynchronously, like asking a more experienced colleague for assistance.",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "temperature": {
-                            "type": "integer",
-                            "description": "The temperature associated with request: 0 for factual, 2 for creative.",
-                        },
-                        "question": {
-                            "type": "string",
-                            "description": "What are you, the ai assistant, requesting to be done with the text you are providing?",
-                        },
-                        "text": {
-                            "type": "string",
-                            "description": "The text to be analyzed",
-                        },
-                    },
-                    "required": ["question", "text"],
-                },
-            },
-        },
-        {
-            "type": "function",
-            "function": {
-                "name": "ask_chat_gpt_4_0613_synchronous",
-                "description": "This function allows you to ask a larger AI LLM for assistance synchronously, like asking a more experienced colleague for assistance.",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "temperature": {
-                            "type": "integer",
-                            "description": "The temperature associated with request: 0 for factual, 2 for creative.",
-                        },
-                        "question": {
-                            "type": "string",
-                            "description": "What are you, the ai assistant, requesting to be done with the text you are providing?",
-                        },
-                        "text": {
-                            "type": "string",
-                            "description": "The text to be analyzed",
-                        },
-                        "tools": {
-                            "type": "string",
-                            "description": "The tools to use for the request.",
-                        },
-                        "tool_choice": {
-                            "type": "string",
-                            "description": "The tool choice to use for the request.",
-                        },
-                    },
-                    "required": ["question", "text"],
-                },
-            },
-        },
-        {
-            "type": "function",
-            "function": {
-                "name": "ask_chat_gpt_4_0613_asynchronous",
-                "description": "This function allows you to ask a larger AI LLM for assistance asynchronously, like asking a more experienced colleague for assistance.",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "temperature": {
-                            "type": "integer",
-                            "description": "The temperature associated with request: 0 for factual, 2 for creative.",
-                        },
-                        "question": {
-                            "type": "string",
-                            "description": "What are you, the ai assistant, requesting to be done with the text you are providing?",
-                        },
-                        "text": {
-                            "type": "string",
-                            "description": "The text to be analyzed",
-                        },
-                        "tools": {
-                            "type": "string",
-                            "description": "The tools to use for the request.",
-                        },
-                        "tool_choice": {
-                            "type": "string",
-                            "description": "The tool choice to use for the request.",
-                        },
-                    },
-                    "required": ["question", "text"],
-                },
-            },
-        },
-        {
-            "type": "function",
-            "function": {
-                "name": "ask_gpt_4_vision",
-                "description": "Ask GPT-4 Vision a question about a specific image file located in the 'uploads' folder.",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "image_name": {
-                            "type": "string",
-                            "description": "The name of the image file in the 'uploads' folder.",
-                        },
-                    },
-                    "required": ["image_name"],
-                },
-            },
-        },
-        {
-            "type": "function",
-            "function": {
-                "name": "generate_an_image_with_dalle3",
-                "description": "Generate an image with DALL-E 3.",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "prompt": {
-                            "type": "string",
-                            "description": "The prompt to use for image generation.",
-                        },
-                        "n": {
-                            "type": "integer",
-                            "description": "The number of images to generate.",
-                        },
-                        "size": {
-                            "type": "string",
-                            "description": "The image size to generate.",
-                        },
-                        "quality": {
-                            "type": "string",
-                            "description": "The image quality to generate.",
-                        },
-                        "style": {
-                            "type": "string",
-                            "description": "The image style to generate. natural or vivid",
-                        },
-                        "response_format": {
-                            "type": "string",
-                            "description": "The response format to use for image generation b64_json or url.",
-                        },
-                    },
-                    "required": ["prompt"],
-                },
-            },
-        },
-    ]
-
-    available_functions, tools = await enable_plugins(
-        available_functions,
-        tools
+    plugin_functions, plugin_tools = await enable_plugins({}, [])
+
+    # Build the tool registry once and keep a view of it for this session.
+    tool_registry = ToolRegistry(model=openai_model)
+    tool_registry.register_many(base_tool_list, base_functions)
+    tool_registry.register_many(plugin_tools, plugin_functions)
+    tool_session = tool_registry.session()
+    tool_selector = ToolSelector(
+        tool_registry,
+        top_k=TOOL_SELECTION_TOP_K,
+        always_on=TOOL_SELECTION_ALWAYS_ON,
     )
 
-    memory = []
+    journal = None
+    if JOURNAL_ENABLED:
+        journal = ConversationJournal(
+            os.path.join(JOURNAL_DIR, f"{args.session}.journal"),
+            compact_bytes=JOURNAL_COMPACT_MB * 1024 * 1024,
+            resume_messages=JOURNAL_RESUME_MESSAGES,
+        )
+        if args.new_session and os.path.exists(journal.path):
+            os.remove(journal.path)
+        memory = journal.resume(openai_model)
+        if len(memory):
+            console.print(
+                f"Resumed session '{args.session}' with {len(memory)} messages.",
+                style="dim",
+            )
+    else:
+        memory = ConversationMemory(model=openai_model)
+
+    # Read the input and speak the responses without blocking the loop,
+    # so background tasks run and the next prompt can be typed ahead.
+    line_reader = AsyncLineReader(console)
+    speaker = BackgroundSpeaker(tts_output)
 
     # Main Loop
     while True:
 
-        user_input = Prompt.ask(
-            "\nHow can I be of assistance? ([yellow]/tools[/yellow] or [bold yellow]quit[/bold yellow])",
+        user_input = await line_reader.readline(
+            "\nHow can I be of assistance? ([yellow]/tools[/yellow], [yellow]/stats[/yellow], [yellow]/compact[/yellow] or [bold yellow]quit[/bold yellow]):",
         )
 
-        if user_input.lower() == "quit":
+        if user_input is None or user_input.lower() == "quit":
             console.print("\nQuitting the program.", style="bold red")
+            await speaker.drain()
+            if journal is not None:
+                await journal.drain()
             break
 
         elif user_input.lower() == "/tools":
-            display_help(tools)
+            display_help(tool_session.tools())
+            continue
+
+        elif user_input.lower() == "/compact":
+            if journal is not None:
+                await journal.compact(memory)
+                console.print_json(data=journal.stats())
+            continue
+
+        elif user_input.lower() == "/stats":
+            console.print_json(
+                data={
+                    "tool_dispatcher": tool_dispatcher.stats(),
+                    "completion_cache": completion_cache.stats(),
+                    "tool_cache": tool_result_cache.stats(),
+                    "tool_prefetcher": tool_prefetcher.stats(),
+                    "tool_selector": tool_selector.stats(),
+                    "fast_path": fast_path_router.stats(),
+                    "request_sizer": request_sizer.stats(),
+                    "expert_router": expert_router.stats(),
+                    "circuit_breakers": circuit_breakers.stats(),
+                    "memory": {
+                        "messages": len(memory),
+                        "tokens": memory.total_tokens,
+                        "summarized": memory.summarized,
+                        "compactor": memory_compactor.stats(),
+                        "retriever": memory_retriever.stats(),
+                    },
+                    "journal": journal.stats() if journal else None,
+                }
+            )
             continue
 
         messages = [
@@ -589,36 +616,89 @@ async def main():
             {"role": "user", "content": f"{user_input}"},
         ]
 
-        with live_spinner:
+        fast_answer, memory = await run_fast_path(
+            fast_path_router,
+            messages,
+            tool_session.tools(),
+            tool_session.available_functions,
+            user_input,
+            memory,
+        )
+        if fast_answer is not None:
+            if journal is not None:
+                journal.schedule(memory)
+            console.print("\n" + fast_answer.text, style="green")
+            if use_tts:
+                speaker.speak(fast_answer.text)
+            continue
 
-            live_spinner.start()
+        started = time.perf_counter()
+        streamed = False
+        if use_stream:
+            with MarkdownStreamRenderer(console) as renderer:
+                final_response, memory = await run_conversation(
+                    messages=messages,
+                    tools=tool_session.tools(),
+                    available_functions=tool_session.available_functions,
+                    original_user_input=user_input,
+                    mem_size=200,
+                    memory=memory,
+                    stream=True,
+                    on_token=renderer.on_token,
+                    on_discard=renderer.discard,
+                    tool_selector=tool_selector,
+                    compactor=memory_compactor,
+                    retriever=memory_retriever,
+                    prefetcher=tool_prefetcher,
+                )
+            streamed = bool(renderer.parts)
+            if renderer.time_to_first_token is not None:
+                console.print(
+                    f"Time to first token: {renderer.time_to_first_token:.2f}s",
+                    style="dim",
+                )
+        else:
+            with live_spinner:
 
-            final_response, memory = await run_conversation(
-                messages=messages,
-                tools=tools,
-                available_functions=available_functions,
-                original_user_input=user_input,
-                mem_size=200,
-                memory=memory,
-            )
-            live_spinner.stop()
+                live_spinner.start()
+
+                final_response, memory = await run_conversation(
+                    messages=messages,
+                    tools=tool_session.tools(),
+                    available_functions=tool_session.available_functions,
+                    original_user_input=user_input,
+                    mem_size=200,
+                    memory=memory,
+                    tool_selector=tool_selector,
+                    compactor=memory_compactor,
+                    retriever=memory_retriever,
+                    prefetcher=tool_prefetcher,
+                )
+                live_spinner.stop()
+
+        fast_path_router.record_pipeline(time.perf_counter() - started)
+
+        if journal is not None:
+            journal.schedule(memory)
 
         if final_response:
             response_message = final_response.choices[0].message
             if response_message.content is not None:
                 final_text = response_message.content
-                if use_tts:
-                    console.print("\n" + final_text, style="green")
-                    tts_output(final_text)
-                else:
+                if not streamed:
                     console.print("\n" + final_text, style="green")
+                if use_tts:
+                    speaker.speak(final_text)
             else:
                 console.print("\nI'm not sure how to help with that.", style="red")
         else:
             console.print("\nI'm not sure how to help with that.", style="red")
 
-        # Remove tools from the tools list after processing
-        tools[:] = [tool for tool in tools if not tool.get("function", {}).get("name", "").lower() in user_input.lower()]
+        # Disable the tools named in the user input after processing
+        lowered_input = user_input.lower()
+        for name in tool_registry.names():
+            if name.lower() in lowered_input:
+                tool_session.disable(name)
 
 
 # Run the main function
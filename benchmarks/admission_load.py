@@ -0,0 +1,170 @@
+# !/usr/bin/env python
+# coding: utf-8
+# Filename: admission_load.py
+# Path: benchmarks/admission_load.py
+# Run command: python -m benchmarks.admission_load
+
+"""
+Load test the admission controller of the web server.
+
+A burst of users starts turns against a simulated upstream that serves
+``capacity`` calls at full speed and shares its throughput between the
+calls beyond that, like a rate-limited model API. A turn makes a few
+upstream calls and fails when it runs past its deadline. The report
+compares the turn latencies without admission control and with it: the
+admitted turns keep a stable latency while the surplus is rejected at
+once with a ``Retry-After``. The run fails if the admitted p95 latency
+exceeds the time of a full queue.
+"""
+
+import argparse
+import asyncio
+import random
+import time
+
+from utils.admission_controller import (
+    AdmissionController,
+    AdmissionRejected,
+)
+
+
+class SharedUpstream:
+    """
+    Upstream whose throughput is shared by the calls in flight.
+    """
+
+    def __init__(self, capacity: int, service: float, tick: float = 0.005):
+        self.capacity = capacity
+        self.service = service
+        self.tick = tick
+        self.active = 0
+
+    async def call(self):
+        self.active += 1
+        try:
+            remaining = self.service
+            while remaining > 0:
+                await asyncio.sleep(self.tick)
+                remaining -= self.tick * min(1.0, self.capacity / self.active)
+        finally:
+            self.active -= 1
+
+
+async def turn(upstream, calls: int, deadline: float, controller=None):
+    """
+    Run one turn and return its outcome and latency.
+    """
+    started = time.perf_counter()
+
+    async def work():
+        for _ in range(calls):
+            await upstream.call()
+
+    try:
+        if controller is None:
+            await asyncio.wait_for(work(), deadline)
+        else:
+            async with controller.admit():
+                await asyncio.wait_for(work(), deadline)
+    except AdmissionRejected:
+        return "rejected", time.perf_counter() - started
+    except asyncio.TimeoutError:
+        return "failed", time.perf_counter() - started
+    return "ok", time.perf_counter() - started
+
+
+async def burst(args, controller=None):
+    """
+    Start the turns of every user over the arrival window.
+    """
+    upstream = SharedUpstream(args.capacity, args.service)
+    rng = random.Random(args.seed)
+    offsets = sorted(rng.uniform(0, args.arrival) for _ in range(args.users))
+
+    async def user(offset):
+        await asyncio.sleep(offset)
+        return await turn(upstream, args.calls, args.deadline, controller)
+
+    return await asyncio.gather(*(user(offset) for offset in offsets))
+
+
+def percentile(values: list, fraction: float) -> float:
+    """
+    Get a percentile of a list of seconds, in milliseconds.
+    """
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[int(fraction * (len(values) - 1))] * 1000
+
+
+def report(label: str, outcomes: list):
+    """
+    Print the latency of the completed turns and the outcome counts.
+    """
+    ok = [latency for outcome, latency in outcomes if outcome == "ok"]
+    rejected = [
+        latency for outcome, latency in outcomes if outcome == "rejected"
+    ]
+    failed = sum(1 for outcome, _ in outcomes if outcome == "failed")
+    print(
+        f"{label:<18}{len(ok):>6}{failed:>8}{len(rejected):>10}"
+        f"{percentile(ok, 0.5):>10.0f}{percentile(ok, 0.95):>10.0f}"
+        f"{percentile(ok, 1.0):>10.0f}{percentile(rejected, 0.95):>14.1f}"
+    )
+    return ok
+
+
+async def main():
+    """
+    Run the burst with and without admission control and print the report.
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=120)
+    parser.add_argument("--arrival", type=float, default=1.0)
+    parser.add_argument("--capacity", type=int, default=8)
+    parser.add_argument("--service", type=float, default=0.2)
+    parser.add_argument("--calls", type=int, default=2)
+    parser.add_argument("--deadline", type=float, default=5.0)
+    parser.add_argument("--max-in-flight", type=int, default=8)
+    parser.add_argument("--max-queue", type=int, default=16)
+    parser.add_argument("--queue-timeout", type=float, default=5.0)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    controller = AdmissionController(
+        max_in_flight=args.max_in_flight,
+        max_queue=args.max_queue,
+        queue_timeout=args.queue_timeout,
+    )
+    unlimited = await burst(args)
+    admitted = await burst(args, controller)
+
+    turn_ms = args.calls * args.service * 1000
+    print(
+        f"{args.users} users over {args.arrival:g} s, upstream capacity "
+        f"{args.capacity}, {turn_ms:.0f} ms per turn at full speed"
+    )
+    print(
+        f"{'admission':<18}{'ok':>6}{'failed':>8}{'rejected':>10}"
+        f"{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}{'reject p95 ms':>14}"
+    )
+    report("none", unlimited)
+    ok = report("controller", admitted)
+    stats = controller.stats()
+    print(
+        f"queue wait: average {stats['average_wait_ms']} ms, "
+        f"p95 {stats['p95_wait_ms']} ms, max {stats['max_wait_ms']} ms"
+    )
+
+    rounds = 1 + args.max_queue / args.max_in_flight
+    limit = turn_ms * rounds * 1.5
+    if percentile(ok, 0.95) > limit:
+        raise SystemExit(
+            f"admitted p95 latency {percentile(ok, 0.95):.0f} ms exceeds "
+            f"{limit:.0f} ms"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,196 @@
+# !/usr/bin/env python
+# coding: utf-8
+# Filename: conversation_bench.py
+# Path: benchmarks/conversation_bench.py
+# Run command: python -m benchmarks.conversation_bench
+
+"""
+Benchmark run_conversation and follow_conversation end to end.
+
+Each session is seeded with 10, 200 or 2,000 messages, then a few turns are
+run against the local mock of the chat completions API. The report shows,
+per turn, the wall time, the upstream calls, the request bytes sent, the
+CPU time spent trimming the memory and the tool dispatch overhead (the
+dispatch wall time minus the slowest tool call).
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+for _name, _value in {
+    "OPENAI_API_KEY": "sk-benchmark",
+    "OPENAI_ORG_ID": "org-benchmark",
+    "OPENAI_MODEL": "gpt-4-1106-preview",
+    "TTS_ENGINE": "pyttsx3",
+    "TTS_VOICE_ID": "benchmark",
+    "MAIN_SYSTEM_PROMPT": "Benchmark system prompt.",
+    "COMPLETION_CACHE_ENABLED": "false",
+}.items():
+    os.environ.setdefault(_name, _value)
+
+import app  # noqa: E402
+from benchmarks.mock_openai import MockChatCompletions, make_client  # noqa: E402
+from utils.base_tools import base_tool_list, available_functions  # noqa: E402
+
+
+class Probe:
+    """
+    Time the memory trimming and the tool dispatch of the app.
+    """
+
+    def __init__(self):
+        self.trim_cpu = 0.0
+        self.dispatch_overhead = 0.0
+        self._trim_memory = app.trim_memory
+        self._dispatch = app.tool_dispatcher.dispatch
+
+    def install(self):
+        """
+        Wrap ``app.trim_memory`` and ``app.tool_dispatcher.dispatch``.
+        """
+        def trim_memory(*args, **kwargs):
+            started = time.process_time()
+            try:
+                return self._trim_memory(*args, **kwargs)
+            finally:
+                self.trim_cpu += time.process_time() - started
+
+        async def dispatch(*args, **kwargs):
+            started = time.perf_counter()
+            messages, records = await self._dispatch(*args, **kwargs)
+            elapsed = time.perf_counter() - started
+            slowest = max((record["duration"] for record in records), default=0)
+            self.dispatch_overhead += elapsed - slowest
+            return messages, records
+
+        app.trim_memory = trim_memory
+        app.tool_dispatcher.dispatch = dispatch
+
+    def reset(self):
+        """
+        Reset the timers.
+        """
+        self.trim_cpu = 0.0
+        self.dispatch_overhead = 0.0
+
+
+def seed_memory(length: int, words: int) -> app.ConversationMemory:
+    """
+    Build a memory holding a system prompt and ``length`` messages.
+    """
+    memory = app.ConversationMemory(
+        [{"role": "system", "content": app.MAIN_SYSTEM_PROMPT}],
+        model=app.openai_model,
+    )
+    for index in range(length - 1):
+        role = "user" if index % 2 == 0 else "assistant"
+        memory.append(
+            {"role": role, "content": f"message {index} " + "ipsum " * words}
+        )
+    return memory
+
+
+async def run_session(
+    pipeline: str, length: int, turns: int, mock, probe, args
+) -> dict:
+    """
+    Run ``turns`` turns of a seeded session and return per-turn averages.
+    """
+    memory = seed_memory(length, args.words)
+    mock.reset()
+    probe.reset()
+    wall = 0.0
+
+    for turn in range(turns):
+        user_input = f"benchmark question {turn}"
+        started = time.perf_counter()
+        if pipeline == "follow":
+            memory = await app.follow_conversation(
+                user_text=user_input,
+                memory=memory,
+                mem_size=args.mem_size,
+                model=app.openai_model,
+            )
+        else:
+            _, memory = await app.run_conversation(
+                messages=[
+                    {"role": "system", "content": app.MAIN_SYSTEM_PROMPT},
+                    {"role": "user", "content": user_input},
+                ],
+                tools=base_tool_list,
+                available_functions=available_functions,
+                original_user_input=user_input,
+                memory=memory,
+                mem_size=args.mem_size,
+                stream=args.stream,
+                compactor=app.memory_compactor if args.compact else None,
+                retriever=app.memory_retriever if args.retrieve else None,
+            )
+        wall += time.perf_counter() - started
+
+    if args.compact:
+        await app.memory_compactor.drain()
+
+    return {
+        "wall": wall / turns,
+        "calls": mock.calls / turns,
+        "bytes": mock.bytes_sent / turns,
+        "trim_cpu": probe.trim_cpu / turns,
+        "dispatch": probe.dispatch_overhead / turns,
+    }
+
+
+async def main():
+    """
+    Run every pipeline and session length and print the report.
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--turns", type=int, default=5)
+    parser.add_argument(
+        "--lengths", type=int, nargs="+", default=[10, 200, 2000]
+    )
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--completion-tokens", type=int, default=50)
+    parser.add_argument("--words", type=int, default=40)
+    parser.add_argument("--tool-every", type=int, default=2)
+    parser.add_argument("--tool-parallel", type=int, default=2)
+    parser.add_argument("--mem-size", type=int, default=200)
+    parser.add_argument("--stream", action="store_true")
+    parser.add_argument("--compact", action="store_true")
+    parser.add_argument("--retrieve", action="store_true")
+    args = parser.parse_args()
+
+    mock = MockChatCompletions(
+        latency=args.latency,
+        completion_tokens=args.completion_tokens,
+        tool_every=args.tool_every,
+        tool_parallel=args.tool_parallel,
+    )
+    client = make_client(mock)
+    # The compactor sends its summaries through the main client as well.
+    app.main_client = client
+
+    probe = Probe()
+    probe.install()
+
+    print(
+        f"{'pipeline':<10}{'messages':>10}{'wall ms':>10}{'calls':>8}"
+        f"{'KB sent':>10}{'trim cpu ms':>13}{'dispatch ms':>13}"
+    )
+    for pipeline in ("run", "follow"):
+        for length in args.lengths:
+            result = await run_session(
+                pipeline, length, args.turns, mock, probe, args
+            )
+            print(
+                f"{pipeline:<10}{length:>10}{result['wall'] * 1000:>10.1f}"
+                f"{result['calls']:>8.2f}{result['bytes'] / 1024:>10.1f}"
+                f"{result['trim_cpu'] * 1000:>13.2f}"
+                f"{result['dispatch'] * 1000:>13.3f}"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,139 @@
+# !/usr/bin/env python
+# coding: utf-8
+# Filename: loop_responsiveness.py
+# Path: benchmarks/loop_responsiveness.py
+# Run command: python -m benchmarks.loop_responsiveness
+
+"""
+Benchmark the event loop responsiveness during blocking tool calls.
+
+A heartbeat task ticks every few milliseconds while the tool dispatcher
+runs a turn of blocking tools: a plain function and a coroutine doing
+blocking I/O inside ``async def``, declared ``"thread"``. The report shows
+the worst heartbeat delay and the turn time when the tools run on the
+event loop and when they run through the tool executor. The run fails if
+the loop stalls with the executor.
+"""
+
+import argparse
+import asyncio
+import os
+import time
+from types import SimpleNamespace
+
+for _name, _value in {
+    "OPENAI_API_KEY": "sk-benchmark",
+    "OPENAI_ORG_ID": "org-benchmark",
+    "OPENAI_MODEL": "gpt-4-1106-preview",
+    "TTS_ENGINE": "pyttsx3",
+    "TTS_VOICE_ID": "benchmark",
+}.items():
+    os.environ.setdefault(_name, _value)
+
+from utils.tool_dispatcher import ToolDispatcher  # noqa: E402
+from utils.tool_executor import ToolExecutor  # noqa: E402
+
+
+def build_tools(blocking: float):
+    """
+    Build a blocking function and a coroutine that blocks inside.
+    """
+    def lookup_synchronous():
+        time.sleep(blocking)
+        return "sync result"
+
+    async def lookup_asynchronous():
+        time.sleep(blocking)
+        return "async result"
+
+    return {
+        "lookup_synchronous": lookup_synchronous,
+        "lookup_asynchronous": lookup_asynchronous,
+    }
+
+
+def tool_call(index: int, name: str):
+    """
+    Build a tool call as returned by the model.
+    """
+    return SimpleNamespace(
+        id=f"call_{index}",
+        function=SimpleNamespace(name=name, arguments="{}"),
+    )
+
+
+async def heartbeat(interval: float, delays: list, stop: asyncio.Event):
+    """
+    Record how late each tick of the event loop is.
+    """
+    while not stop.is_set():
+        expected = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        delays.append(max(0.0, time.perf_counter() - expected))
+
+
+async def measure(dispatcher, functions, calls, interval: float):
+    """
+    Dispatch the calls and return the worst heartbeat delay and turn time.
+    """
+    delays = []
+    stop = asyncio.Event()
+    ticker = asyncio.create_task(heartbeat(interval, delays, stop))
+    await asyncio.sleep(interval)
+
+    started = time.perf_counter()
+    await dispatcher.dispatch(calls, functions)
+    turn = time.perf_counter() - started
+
+    stop.set()
+    await ticker
+    return max(delays, default=0.0), turn
+
+
+async def main():
+    """
+    Measure both dispatchers and print the report.
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=4)
+    parser.add_argument("--blocking", type=float, default=0.2)
+    parser.add_argument("--interval", type=float, default=0.005)
+    parser.add_argument("--max-delay", type=float, default=0.05)
+    args = parser.parse_args()
+
+    functions = build_tools(args.blocking)
+    names = list(functions)
+    calls = [
+        tool_call(index, names[index % len(names)])
+        for index in range(args.calls)
+    ]
+
+    executor = ToolExecutor(max_workers=args.calls)
+    executor.register({"lookup_asynchronous": "thread"})
+
+    on_loop = await measure(
+        ToolDispatcher(max_concurrency=args.calls), functions, calls,
+        args.interval,
+    )
+    threaded = await measure(
+        ToolDispatcher(max_concurrency=args.calls, executor=executor),
+        functions, calls, args.interval,
+    )
+
+    print(f"{args.calls} tool calls blocking {args.blocking * 1000:.0f} ms each")
+    print(f"{'dispatch':<16}{'max loop delay ms':>20}{'turn ms':>12}")
+    for label, (delay, turn) in (
+        ("on the loop", on_loop),
+        ("tool executor", threaded),
+    ):
+        print(f"{label:<16}{delay * 1000:>20.1f}{turn * 1000:>12.1f}")
+
+    if threaded[0] > args.max_delay:
+        raise SystemExit(
+            f"event loop stalled for {threaded[0] * 1000:.1f} ms "
+            "during blocking tool calls"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,112 @@
+# !/usr/bin/env python
+# coding: utf-8
+# Filename: memory_store.py
+# Path: benchmarks/memory_store.py
+# Run command: python -m benchmarks.memory_store
+
+"""
+Benchmark the conversation memory footprint and trim cost.
+
+A session of 10,000 messages is stored both as the previous list of dicts
+and as a ConversationMemory. The report shows the memory allocated for each
+(measured with tracemalloc) and the time to trim the session after one more
+message is appended, using the previous ``json.dumps`` loop for the list
+and ``trim_size`` for the ConversationMemory.
+"""
+
+import argparse
+import json
+import time
+import tracemalloc
+
+from utils.conversation_memory import ConversationMemory
+
+
+def build_messages(count: int, words: int) -> list[dict]:
+    """
+    Build a system prompt followed by alternating user and assistant turns.
+
+    Every message is built from fresh strings, as when a session is decoded
+    from a request body.
+    """
+    messages = [{"role": "system", "content": "Benchmark system prompt."}]
+    for index in range(count - 1):
+        role = "user" if index % 2 == 0 else "assistant"
+        messages.append(
+            {
+                "role": role,
+                "content": f"message {index} " + "ipsum " * words,
+            }
+        )
+    return json.loads(json.dumps(messages))
+
+
+def measure(build):
+    """
+    Return the object built by ``build`` and the bytes it allocated.
+    """
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    value = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return value, after - before
+
+
+def trim_list(memory: list, limit: int) -> int:
+    """
+    Trim a list of dicts with the previous ``json.dumps`` loop.
+    """
+    evicted = 0
+    while len(json.dumps(memory)) > limit:
+        memory.pop(0)
+        evicted += 1
+    return evicted
+
+
+def main():
+    """
+    Measure both stores and print the report.
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=10000)
+    parser.add_argument("--words", type=int, default=40)
+    parser.add_argument("--turns", type=int, default=20)
+    args = parser.parse_args()
+
+    source = build_messages(args.messages, args.words)
+    limit = len(json.dumps(source))
+    extra = [
+        {"role": "user", "content": f"new message {turn} " + "ipsum " * args.words}
+        for turn in range(args.turns)
+    ]
+
+    messages, list_bytes = measure(lambda: json.loads(json.dumps(source)))
+    memory, memory_bytes = measure(
+        lambda: ConversationMemory(json.loads(json.dumps(source)))
+    )
+    assert memory.serialized_size == limit
+
+    started = time.perf_counter()
+    for message in extra:
+        messages.append(message)
+        trim_list(messages, limit)
+    list_trim = (time.perf_counter() - started) / args.turns
+
+    started = time.perf_counter()
+    for message in extra:
+        memory.append(message)
+        memory.trim_size(limit)
+    memory_trim = (time.perf_counter() - started) / args.turns
+
+    print(f"{args.messages} messages, {limit / 1024:.0f} KB serialized")
+    print(f"{'store':<22}{'footprint KB':>14}{'trim ms/turn':>14}")
+    print(f"{'list of dicts':<22}{list_bytes / 1024:>14.0f}{list_trim * 1000:>14.3f}")
+    print(
+        f"{'ConversationMemory':<22}{memory_bytes / 1024:>14.0f}"
+        f"{memory_trim * 1000:>14.3f}"
+    )
+
+
+if __name__ == "__main__":
+    main()
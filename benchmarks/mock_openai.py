@@ -0,0 +1,216 @@
+# !/usr/bin/env python
+# coding: utf-8
+# Filename: mock_openai.py
+# Path: benchmarks/mock_openai.py
+
+"""
+Local stand-in for the OpenAI chat completions API.
+
+The mock is an ``httpx.MockTransport`` handler, so an ``AsyncOpenAI`` client
+built with ``make_client`` goes through the real SDK request and response
+handling without leaving the process. Latency, completion size and the
+tool_call pattern are configurable, and every request is recorded.
+"""
+
+import asyncio
+import json
+import time
+
+import httpx
+from openai import AsyncOpenAI
+
+
+class MockChatCompletions:
+    """
+    Mock ``/chat/completions`` endpoint.
+
+    Args:
+        latency (float): Seconds slept before each response.
+        completion_tokens (int): Number of words in each text reply.
+        tool_every (int): Request tool calls on every Nth user turn
+            (0 never calls tools).
+        tool_names (list): The tools called, in turn.
+        tool_parallel (int): Number of tool calls per tool turn.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.05,
+        completion_tokens: int = 50,
+        tool_every: int = 2,
+        tool_names=("get_current_date_time",),
+        tool_parallel: int = 1,
+    ):
+        self.latency = latency
+        self.completion_tokens = completion_tokens
+        self.tool_every = tool_every
+        self.tool_names = list(tool_names)
+        self.tool_parallel = tool_parallel
+        self.turns = 0
+        self.requests = []
+
+    def reset(self):
+        """
+        Forget the recorded requests.
+        """
+        self.turns = 0
+        self.requests = []
+
+    @property
+    def calls(self) -> int:
+        """
+        Get the number of recorded requests.
+        """
+        return len(self.requests)
+
+    @property
+    def bytes_sent(self) -> int:
+        """
+        Get the number of request body bytes received.
+        """
+        return sum(record["bytes"] for record in self.requests)
+
+    def wants_tools(self, body: dict) -> bool:
+        """
+        Check whether a request should be answered with tool calls.
+
+        Only the first request of a turn can call tools, the follow-up
+        request carrying the tool results gets a text reply.
+        """
+        if not body.get("tools") or not self.tool_every:
+            return False
+        if any(message.get("role") == "tool" for message in body["messages"]):
+            return False
+        self.turns += 1
+        return self.turns % self.tool_every == 0
+
+    def build_message(self, body: dict) -> tuple[dict, str]:
+        """
+        Build the reply message and finish reason of a request.
+        """
+        if self.wants_tools(body):
+            offered = {tool["function"]["name"] for tool in body["tools"]}
+            names = [name for name in self.tool_names if name in offered]
+            if names:
+                calls = [
+                    {
+                        "id": f"call_{len(self.requests)}_{index}",
+                        "type": "function",
+                        "function": {
+                            "name": names[index % len(names)],
+                            "arguments": "{}",
+                        },
+                    }
+                    for index in range(self.tool_parallel)
+                ]
+                return (
+                    {"role": "assistant", "content": None, "tool_calls": calls},
+                    "tool_calls",
+                )
+
+        content = " ".join(["lorem"] * self.completion_tokens)
+        return {"role": "assistant", "content": content}, "stop"
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        """
+        Answer a chat completion request.
+        """
+        payload = request.content
+        body = json.loads(payload)
+        self.requests.append(
+            {
+                "bytes": len(payload),
+                "messages": len(body.get("messages", ())),
+                "tools": len(body.get("tools") or ()),
+            }
+        )
+        await asyncio.sleep(self.latency)
+
+        message, finish_reason = self.build_message(body)
+        completion_id = f"chatcmpl-mock-{len(self.requests)}"
+        created = int(time.time())
+        usage = {
+            "prompt_tokens": len(payload) // 4,
+            "completion_tokens": self.completion_tokens,
+            "total_tokens": len(payload) // 4 + self.completion_tokens,
+        }
+
+        if body.get("stream"):
+            return httpx.Response(
+                200,
+                headers={"content-type": "text/event-stream"},
+                content=self.stream_events(
+                    completion_id, created, body["model"], message, finish_reason
+                ),
+            )
+
+        return httpx.Response(
+            200,
+            json={
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": body["model"],
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": message,
+                        "finish_reason": finish_reason,
+                    }
+                ],
+                "usage": usage,
+            },
+        )
+
+    @staticmethod
+    def stream_events(completion_id, created, model, message, finish_reason):
+        """
+        Encode a reply as server-sent chat completion chunks.
+        """
+        deltas = []
+        if message.get("tool_calls"):
+            deltas.append(
+                {
+                    "role": "assistant",
+                    "tool_calls": [
+                        {"index": index, **call}
+                        for index, call in enumerate(message["tool_calls"])
+                    ],
+                }
+            )
+        else:
+            deltas.append({"role": "assistant", "content": ""})
+            deltas.extend(
+                {"content": f"{word} "} for word in message["content"].split()
+            )
+
+        chunks = [
+            {"index": 0, "delta": delta, "finish_reason": None}
+            for delta in deltas
+        ]
+        chunks.append({"index": 0, "delta": {}, "finish_reason": finish_reason})
+
+        lines = []
+        for choice in chunks:
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [choice],
+            }
+            lines.append(f"data: {json.dumps(chunk)}\n\n")
+        lines.append("data: [DONE]\n\n")
+        return "".join(lines).encode()
+
+
+def make_client(mock: MockChatCompletions) -> AsyncOpenAI:
+    """
+    Build an AsyncOpenAI client answered by the mock.
+    """
+    return AsyncOpenAI(
+        api_key="sk-benchmark",
+        base_url="http://mock-openai.local/v1",
+        http_client=httpx.AsyncClient(transport=httpx.MockTransport(mock.handle)),
+        max_retries=0,
+    )
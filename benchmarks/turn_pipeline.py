@@ -0,0 +1,174 @@
+# !/usr/bin/env python
+# coding: utf-8
+# Filename: turn_pipeline.py
+# Path: benchmarks/turn_pipeline.py
+# Run command: python -m benchmarks.turn_pipeline
+
+"""
+Benchmark the chat completions made per turn.
+
+The "before" pipeline replays the previous flow, where every turn ran
+follow_conversation before run_conversation. The "after" pipeline is the
+single-completion run_conversation. Both run against a stub client with a
+fixed upstream latency, so no API quota is used.
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+for _name, _value in {
+    "OPENAI_API_KEY": "sk-benchmark",
+    "OPENAI_ORG_ID": "org-benchmark",
+    "OPENAI_MODEL": "gpt-4-1106-preview",
+    "TTS_ENGINE": "pyttsx3",
+    "TTS_VOICE_ID": "benchmark",
+}.items():
+    os.environ.setdefault(_name, _value)
+
+from openai.types.chat import ChatCompletion  # noqa: E402
+
+import app  # noqa: E402
+from utils.core_tools import get_current_date_time  # noqa: E402
+
+
+class StubCompletions:
+    """
+    Stand-in for ``chat.completions`` that counts requests.
+
+    User inputs starting with ``[tool]`` make the first completion request
+    a tool call; every other completion returns plain text.
+    """
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.requests = 0
+
+    async def create(self, **kwargs):
+        self.requests += 1
+        await asyncio.sleep(self.latency)
+
+        messages = kwargs["messages"]
+        last = messages[-1]
+        wants_tool = (
+            kwargs.get("tools")
+            and isinstance(last, dict)
+            and last.get("role") == "user"
+            and last.get("content", "").startswith("[tool]")
+        )
+
+        message = {"role": "assistant", "content": "Stub answer."}
+        finish_reason = "stop"
+        if wants_tool:
+            message = {
+                "role": "assistant",
+                "content": None,
+                "tool_calls": [
+                    {
+                        "id": f"call_{self.requests}",
+                        "type": "function",
+                        "function": {
+                            "name": "get_current_date_time",
+                            "arguments": "{}",
+                        },
+                    }
+                ],
+            }
+            finish_reason = "tool_calls"
+
+        return ChatCompletion.model_validate(
+            {
+                "id": f"chatcmpl-{self.requests}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": kwargs["model"],
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": message,
+                        "finish_reason": finish_reason,
+                    }
+                ],
+            }
+        )
+
+
+class StubClient:
+    """
+    Stand-in for ``AsyncOpenAI`` exposing ``chat.completions``.
+    """
+
+    def __init__(self, latency: float):
+        self.completions = StubCompletions(latency)
+        self.chat = self
+
+
+async def run_turns(pipeline: str, turns: int, latency: float):
+    """
+    Run a conversation and return the request count and mean turn latency.
+    """
+    client = StubClient(latency)
+    app.main_client = client
+
+    tools = [
+        {
+            "type": "function",
+            "function": {
+                "name": "get_current_date_time",
+                "description": "Get the current date and time.",
+            },
+        }
+    ]
+    available_functions = {
+        "get_current_date_time": get_current_date_time,
+    }
+
+    memory = app.ConversationMemory(model=app.openai_model)
+    elapsed = 0.0
+
+    for turn in range(turns):
+        user_input = f"[tool] question {turn}" if turn % 2 else f"question {turn}"
+        messages = [
+            {"role": "system", "content": "Benchmark system prompt."},
+            {"role": "user", "content": user_input},
+        ]
+
+        started = time.perf_counter()
+        if pipeline == "before":
+            memory = await app.follow_conversation(
+                user_text=user_input,
+                memory=memory,
+                mem_size=200,
+                model=app.openai_model,
+            )
+        _, memory = await app.run_conversation(
+            messages=messages,
+            tools=tools,
+            available_functions=available_functions,
+            original_user_input=user_input,
+            memory=memory,
+            mem_size=200,
+        )
+        elapsed += time.perf_counter() - started
+
+    return client.completions.requests / turns, elapsed / turns
+
+
+async def main():
+    """
+    Run both pipelines and print the per-turn results.
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.25)
+    args = parser.parse_args()
+
+    print(f"{'pipeline':<10}{'requests/turn':>15}{'latency/turn (s)':>20}")
+    for pipeline in ("before", "after"):
+        requests, latency = await run_turns(pipeline, args.turns, args.latency)
+        print(f"{pipeline:<10}{requests:>15.2f}{latency:>20.3f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
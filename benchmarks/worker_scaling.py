@@ -0,0 +1,178 @@
+# !/usr/bin/env python
+# coding: utf-8
+# Filename: worker_scaling.py
+# Path: benchmarks/worker_scaling.py
+# Run command: python -m benchmarks.worker_scaling
+
+"""
+Benchmark the throughput of the CPU-bound turn work across worker processes.
+
+Each worker process runs the CPU-bound part of a turn in a loop: a tool
+result lookup through the tool result cache, HTML parsing of the page the
+tool would fetch on a miss, and JSON encoding of the conversation. The workers
+share the tool results through a SQLite shared store, as the Hypercorn
+workers of the web server do, so each page is parsed once across all of
+them. The report shows the turns per second, the cache hit rate and the
+pages parsed from 1 to N workers; the speedup is bounded by the number of
+CPU cores.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+from html.parser import HTMLParser
+
+for _name, _value in {
+    "OPENAI_API_KEY": "sk-benchmark",
+    "OPENAI_ORG_ID": "org-benchmark",
+    "OPENAI_MODEL": "gpt-4-1106-preview",
+    "TTS_ENGINE": "pyttsx3",
+    "TTS_VOICE_ID": "benchmark",
+}.items():
+    os.environ.setdefault(_name, _value)
+
+
+class TextExtractor(HTMLParser):
+    """
+    Collect the text of an HTML page.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.parts = []
+
+    def handle_data(self, data):
+        if data.strip():
+            self.parts.append(data.strip())
+
+
+def build_page(index: int, paragraphs: int) -> str:
+    """
+    Build an article page like the ones the news and search tools fetch.
+    """
+    body = "".join(
+        f"<p class='story'>Paragraph {number} of article {index}: "
+        f"<a href='/link/{number}'>markets</a> and <em>weather</em> "
+        "updates for the week.</p>"
+        for number in range(paragraphs)
+    )
+    return (
+        f"<html><head><title>Article {index}</title></head>"
+        f"<body>{body}</body></html>"
+    )
+
+
+def run_turns(worker: int, args, start, results):
+    """
+    Run turns until the deadline and report the counts of the worker.
+    """
+    from utils.tool_cache import tool_result_cache
+
+    tool_result_cache.register(
+        {
+            "get_article": {
+                "ttl": 600,
+                "key_fields": ["index"],
+                "max_entries": args.keys,
+            },
+        }
+    )
+    rng = random.Random(worker)
+    history = [
+        {"role": "assistant", "content": f"Earlier reply {number}. " * 40}
+        for number in range(args.history)
+    ]
+    turns = hits = 0
+    start.wait()
+    deadline = time.perf_counter() + args.duration
+    while time.perf_counter() < deadline:
+        index = rng.randrange(args.keys)
+        status, article = tool_result_cache.lookup(
+            "get_article", {"index": index}
+        )
+        if status == "hit":
+            hits += 1
+        else:
+            parser = TextExtractor()
+            parser.feed(build_page(index, args.paragraphs))
+            article = " ".join(parser.parts)
+            tool_result_cache.store("get_article", {"index": index}, article)
+
+        messages = history + [
+            {"role": "user", "content": f"Summarize article {index}"},
+            {"role": "tool", "content": article},
+        ]
+        json.loads(json.dumps(messages))
+        turns += 1
+    results.put((turns, hits))
+
+
+def measure(workers: int, args) -> tuple:
+    """
+    Run the workers against a fresh shared store and sum their counts.
+    """
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ["SHARED_STORE_PATH"] = os.path.join(
+            directory, "shared_state.sqlite3"
+        )
+        start = context.Event()
+        results = context.Queue()
+        processes = [
+            context.Process(
+                target=run_turns, args=(worker, args, start, results)
+            )
+            for worker in range(workers)
+        ]
+        for process in processes:
+            process.start()
+        # Let every worker import its modules before the clock starts.
+        time.sleep(args.warmup)
+        start.set()
+        counts = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+    turns = sum(count[0] for count in counts)
+    hits = sum(count[1] for count in counts)
+    hit_rate = hits / turns if turns else 0.0
+    return turns / args.duration, hit_rate, turns - hits
+
+
+def main():
+    """
+    Measure each worker count and print the report.
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--workers", type=int, nargs="+",
+        default=sorted({1, 2, max(2, os.cpu_count() or 1)}),
+    )
+    parser.add_argument("--keys", type=int, default=200)
+    parser.add_argument("--paragraphs", type=int, default=200)
+    parser.add_argument("--history", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--warmup", type=float, default=3.0)
+    args = parser.parse_args()
+
+    os.environ["SHARED_STORE_ENABLED"] = "true"
+    print(f"{os.cpu_count()} CPU cores, {args.keys} distinct tool results")
+    print(
+        f"{'workers':<10}{'turns/s':>12}{'speedup':>10}{'hit rate':>10}"
+        f"{'pages parsed':>14}"
+    )
+    baseline = None
+    for workers in args.workers:
+        throughput, hit_rate, parsed = measure(workers, args)
+        baseline = baseline or throughput
+        print(
+            f"{workers:<10}{throughput:>12.0f}"
+            f"{throughput / baseline:>9.2f}x{hit_rate:>10.1%}{parsed:>14}"
+        )
+
+
+if __name__ == "__main__":
+    main()
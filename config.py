@@ -48,6 +48,162 @@ OPENAI_TOP_P = float(os.getenv("OPENAI_TOP_P", str(0.5)))
 # Main app OpenAI MAX Response token limit.
 OPENAI_MAX_TOKENS = int(os.getenv("OPENAI_MAX_TOKENS", str(1500)))
 
+# Context window assumed for a model missing from the request sizer's table.
+OPENAI_DEFAULT_CONTEXT_WINDOW = int(
+    os.getenv("OPENAI_DEFAULT_CONTEXT_WINDOW", str(128000))
+)
+
+# Stream the main app responses token by token in the CLI.
+OPENAI_STREAM = os.getenv("OPENAI_STREAM", "true").lower() == "true"
+
+# Maximum number of tool calls run concurrently within a single turn.
+TOOL_MAX_CONCURRENCY = int(os.getenv("TOOL_MAX_CONCURRENCY", str(4)))
+
+# Maximum number of blocking tool calls run in worker threads at once.
+TOOL_THREAD_WORKERS = int(os.getenv("TOOL_THREAD_WORKERS", str(8)))
+
+# Number of tools ranked relevant to the user input sent per request (0 sends all).
+TOOL_SELECTION_TOP_K = int(os.getenv("TOOL_SELECTION_TOP_K", str(12)))
+
+# Comma separated tools always sent with a request.
+TOOL_SELECTION_ALWAYS_ON = [
+    name.strip()
+    for name in os.getenv(
+        "TOOL_SELECTION_ALWAYS_ON", "get_current_date_time"
+    ).split(",")
+    if name.strip()
+]
+
+# Retry with every tool when the model calls a tool that was not sent.
+TOOL_SELECTION_FALLBACK = (
+    os.getenv("TOOL_SELECTION_FALLBACK", "true").lower() == "true"
+)
+
+# Comma separated OpenAI models the expert requests are routed across.
+EXPERT_OPENAI_MODELS = [
+    name.strip()
+    for name in os.getenv(
+        "EXPERT_OPENAI_MODELS", "gpt-4-0314,gpt-4-0613,gpt-4-32k-0314"
+    ).split(",")
+    if name.strip()
+]
+
+# Weight of the newest call in the expert latency and error rate averages.
+EXPERT_EWMA_ALPHA = float(os.getenv("EXPERT_EWMA_ALPHA", str(0.3)))
+
+# Error rate above which an expert model only receives probe requests.
+EXPERT_MAX_ERROR_RATE = float(os.getenv("EXPERT_MAX_ERROR_RATE", str(0.5)))
+EXPERT_PROBE_INTERVAL = float(os.getenv("EXPERT_PROBE_INTERVAL", str(30)))
+
+# Number of expert models tried before an expert request gives up.
+EXPERT_MAX_ATTEMPTS = int(os.getenv("EXPERT_MAX_ATTEMPTS", str(2)))
+
+# Answer trivial requests with a local function instead of the model.
+FAST_PATH_ENABLED = os.getenv("FAST_PATH_ENABLED", "true").lower() == "true"
+FAST_PATH_INTENTS = [
+    name.strip()
+    for name in os.getenv(
+        "FAST_PATH_INTENTS", "current_time,list_tools,next_event"
+    ).split(",")
+    if name.strip()
+]
+FAST_PATH_MIN_CONFIDENCE = float(os.getenv("FAST_PATH_MIN_CONFIDENCE", str(0.8)))
+
+# Start the tool calls predicted from the user input during the first completion.
+PREFETCH_ENABLED = os.getenv("PREFETCH_ENABLED", "true").lower() == "true"
+PREFETCH_MAX_CALLS = int(os.getenv("PREFETCH_MAX_CALLS", str(2)))
+
+# Suspend a prefetch rule for a cooldown, in seconds, once it was wasted
+# this many more times than used.
+PREFETCH_MAX_WASTED = int(os.getenv("PREFETCH_MAX_WASTED", str(5)))
+PREFETCH_SUSPEND_SECONDS = float(
+    os.getenv("PREFETCH_SUSPEND_SECONDS", str(600))
+)
+
+# Fail fast on an upstream after this many consecutive failures.
+CIRCUIT_BREAKER_ENABLED = (
+    os.getenv("CIRCUIT_BREAKER_ENABLED", "true").lower() == "true"
+)
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", str(3)))
+
+# Seconds an open breaker waits before letting a probe call through.
+CIRCUIT_RESET_TIMEOUT = float(os.getenv("CIRCUIT_RESET_TIMEOUT", str(30)))
+
+# Seconds after which a plugin tool call counts as failed.
+CIRCUIT_CALL_TIMEOUT = float(os.getenv("CIRCUIT_CALL_TIMEOUT", str(30)))
+
+# Token budget above which the oldest turns are summarized (0 disables).
+MEMORY_TOKEN_BUDGET = int(os.getenv("MEMORY_TOKEN_BUDGET", str(8000)))
+
+# Number of newest messages never summarized.
+MEMORY_KEEP_RECENT = int(os.getenv("MEMORY_KEEP_RECENT", str(6)))
+
+# Model used to summarize the oldest turns.
+MEMORY_SUMMARY_MODEL = os.getenv("MEMORY_SUMMARY_MODEL", OPENAI_MODEL)
+
+# Token budget of the memory sent with a request, filled with the recent
+# messages and the older turns most relevant to the user input (0 sends the
+# newest messages only).
+MEMORY_RETRIEVAL_BUDGET = int(os.getenv("MEMORY_RETRIEVAL_BUDGET", str(6000)))
+
+# Number of newest messages always sent with a request.
+MEMORY_RECENT_WINDOW = int(os.getenv("MEMORY_RECENT_WINDOW", str(8)))
+
+# Persist the CLI conversation in a journal and resume it on startup.
+JOURNAL_ENABLED = os.getenv("JOURNAL_ENABLED", "true").lower() == "true"
+JOURNAL_DIR = os.getenv("JOURNAL_DIR", "cache/sessions")
+JOURNAL_COMPACT_MB = int(os.getenv("JOURNAL_COMPACT_MB", str(8)))
+JOURNAL_RESUME_MESSAGES = int(os.getenv("JOURNAL_RESUME_MESSAGES", str(200)))
+
+# Keep the web conversations on the server, evicting idle sessions.
+SESSION_STORE_MAX_SESSIONS = int(
+    os.getenv("SESSION_STORE_MAX_SESSIONS", str(1000))
+)
+SESSION_IDLE_TTL = float(os.getenv("SESSION_IDLE_TTL", str(1800)))
+
+# Persist the web conversations in SQLite to survive eviction and restarts.
+SESSION_STORE_PERSIST = (
+    os.getenv("SESSION_STORE_PERSIST", "true").lower() == "true"
+)
+SESSION_STORE_PATH = os.getenv(
+    "SESSION_STORE_PATH", "cache/web_sessions.sqlite3"
+)
+
+# Number of Hypercorn worker processes serving the web app.
+WEB_WORKERS = int(os.getenv("WEB_WORKERS", str(1)))
+
+# Share the tool results, lookups and circuit state between the workers.
+SHARED_STORE_ENABLED = (
+    os.getenv("SHARED_STORE_ENABLED", "true").lower() == "true"
+)
+SHARED_STORE_PATH = os.getenv(
+    "SHARED_STORE_PATH", "cache/shared_state.sqlite3"
+)
+
+# Cap the web turns running at once, per worker.
+# The surplus waits in a bounded queue or is rejected.
+ADMISSION_CONTROL_ENABLED = (
+    os.getenv("ADMISSION_CONTROL_ENABLED", "true").lower() == "true"
+)
+ADMISSION_MAX_IN_FLIGHT = int(os.getenv("ADMISSION_MAX_IN_FLIGHT", str(8)))
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", str(16)))
+ADMISSION_QUEUE_TIMEOUT = float(
+    os.getenv("ADMISSION_QUEUE_TIMEOUT", str(30))
+)
+
+# Exact-match cache for deterministic (temperature 0) chat completions.
+COMPLETION_CACHE_ENABLED = (
+    os.getenv("COMPLETION_CACHE_ENABLED", "true").lower() == "true"
+)
+COMPLETION_CACHE_PATH = os.getenv(
+    "COMPLETION_CACHE_PATH", "cache/completions.sqlite3"
+)
+COMPLETION_CACHE_MEMORY_ENTRIES = int(
+    os.getenv("COMPLETION_CACHE_MEMORY_ENTRIES", str(256))
+)
+COMPLETION_CACHE_TTL = int(os.getenv("COMPLETION_CACHE_TTL", str(86400)))
+COMPLETION_CACHE_MAX_MB = int(os.getenv("COMPLETION_CACHE_MAX_MB", str(64)))
+
 # Configures the main app to use the local system TTS engine.
 TTS_ENGINE = os.getenv("TTS_ENGINE")
 if TTS_ENGINE is None:
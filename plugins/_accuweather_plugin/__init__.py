@@ -12,6 +12,8 @@ from .accuweather_tools import (
     get_five_day_weather_forecast,
     accu_weather_tools,
     available_functions,
+    cache_policies,
+    prefetch_rules,
 )
 
 __all__ = [
@@ -25,4 +27,6 @@ __all__ = [
     'get_five_day_weather_forecast',
     'accu_weather_tools',
     'available_functions',
+    'cache_policies',
+    'prefetch_rules',
 ]
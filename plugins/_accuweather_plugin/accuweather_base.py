@@ -17,6 +17,9 @@ from plugins.plugin_base import PluginBase
 from plugins._accuweather_plugin.accuweather_tools import (
     accu_weather_tools,
     available_functions as accuweather_functions,
+    cache_policies as accuweather_cache_policies,
+    prefetch_rules as accuweather_prefetch_rules,
+    upstreams as accuweather_upstreams,
 )
 
 
@@ -50,6 +53,9 @@ class AccuWeatherPlugin(PluginBase):
 
         """
         self.tools.extend(accu_weather_tools)
+        self.cache_policies.update(accuweather_cache_policies)
+        self.prefetch_rules.update(accuweather_prefetch_rules)
+        self.upstreams.update(accuweather_upstreams)
         for func_name, func in accuweather_functions.items():
             # Bind the AccuWeather API key and base URL to the functions
             self.available_functions[func_name] = functools.partial(
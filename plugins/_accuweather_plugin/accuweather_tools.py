@@ -18,8 +18,13 @@ import json
 import aiohttp
 import spacy
 
+from utils.shared_store import shared_store
+
 nlp = spacy.load("en_core_web_md")
 
+# Seconds a location key is reused, the key of a city does not change.
+LOCATION_KEY_TTL = 30 * 86400
+
 
 def extract_location(user_input):
     """
@@ -41,7 +46,15 @@ async def get_location_key(api_key, base_url, location_name):
 
     If no location provided or an empty string passed, defaults to Atlanta.
 
+    The keys are kept in the shared store, so a location is searched once
+    across the web server workers and the daily API quota is spared.
+
     """
+    cache_key = location_name.strip().lower()
+    location_key = await shared_store.aget("accuweather_location", cache_key)
+    if location_key is not None:
+        return location_key
+
     url = f"{base_url}/locations/v1/cities/search"
     params = {"apikey": api_key, "q": location_name}
     async with aiohttp.ClientSession() as session:
@@ -49,7 +62,12 @@ async def get_location_key(api_key, base_url, location_name):
             response.raise_for_status()
             locations = await response.json()
             if locations:
-                return locations[0]["Key"]
+                location_key = locations[0]["Key"]
+                await shared_store.aset(
+                    "accuweather_location", cache_key, location_key,
+                    ttl=LOCATION_KEY_TTL,
+                )
+                return location_key
             else:
                 return None
 
@@ -430,6 +448,52 @@ accu_weather_tools = [
         },
     ]
 
+def prefetch_location(user_input):
+    """
+    This function builds the prefetch arguments of a weather request.
+
+    The prefetch is skipped when the user input names no location.
+
+    """
+    locations = extract_location(user_input)
+    return {"location": locations[0]} if locations else None
+
+
+prefetch_rules = {
+    "get_current_weather": {
+        "pattern": r"\b(?:weather|temperature|raining|snowing)\b",
+        "arguments": prefetch_location,
+    },
+}
+
+cache_policies = {
+    "get_current_weather": {
+        "ttl": 600,
+        "key_fields": ["location"],
+        "max_entries": 128,
+    },
+    "get_one_hour_weather_forecast": {
+        "ttl": 900,
+        "key_fields": ["location"],
+        "max_entries": 128,
+    },
+    "get_twelve_hour_weather_forecast": {
+        "ttl": 1800,
+        "key_fields": ["location"],
+        "max_entries": 128,
+    },
+    "get_one_day_weather_forecast": {
+        "ttl": 3600,
+        "key_fields": ["location"],
+        "max_entries": 128,
+    },
+    "get_five_day_weather_forecast": {
+        "ttl": 3600,
+        "key_fields": ["location"],
+        "max_entries": 128,
+    },
+}
+
 available_functions = {
     "get_current_weather": get_current_weather,
     "get_one_hour_weather_forecast": get_one_hour_weather_forecast,
@@ -437,3 +501,6 @@ available_functions = {
     "get_one_day_weather_forecast": get_one_day_weather_forecast,
     "get_five_day_weather_forecast": get_five_day_weather_forecast,
 }
+
+# Define the upstream host of each tool for the circuit breakers
+upstreams = {name: "dataservice.accuweather.com" for name in available_functions}
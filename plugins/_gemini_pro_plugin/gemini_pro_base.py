@@ -15,14 +15,20 @@ import os
 import functools
 import google.generativeai as genai
 from plugins.plugin_base import PluginBase
+from utils.expert_router import expert_router
 
 from plugins._gemini_pro_plugin.gemini_pro_vision_tools import (
     gemini_pro_vision_tools,
-    available_functions as gemini_pro_vision_functions
+    available_functions as gemini_pro_vision_functions,
+    upstreams as gemini_pro_vision_upstreams,
+    execution_modes as gemini_pro_vision_execution_modes,
 )
 from plugins._gemini_pro_plugin.gemini_pro_tools import (
+    gemini_expert,
     gemini_pro_tools,
-    available_functions as gemini_pro_functions
+    available_functions as gemini_pro_functions,
+    upstreams as gemini_pro_upstreams,
+    execution_modes as gemini_pro_execution_modes,
 )
 
 
@@ -60,11 +66,19 @@ class GeminiProPlugin(PluginBase):
             # Bind the GeminiProPlugin instance to the function
             self.available_functions[func_name] = functools.partial(func, self)
 
+        self.upstreams.update(gemini_pro_upstreams)
+        self.execution_modes.update(gemini_pro_execution_modes)
+
+        # Let the expert router send expert requests to Gemini Pro
+        expert_router.register(gemini_expert)
+
         # Load tools and functions from gemini_pro_vision_tools.py
         self.tools.extend(gemini_pro_vision_tools)
         for func_name, func in gemini_pro_vision_functions.items():
             # Bind the GeminiProPlugin instance to the function
             self.available_functions[func_name] = functools.partial(func, self)
+        self.upstreams.update(gemini_pro_vision_upstreams)
+        self.execution_modes.update(gemini_pro_vision_execution_modes)
 
     def default_generation_config(self):
         """
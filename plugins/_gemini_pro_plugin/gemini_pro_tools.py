@@ -10,6 +10,9 @@ This module defines the Gemini Pro Tools.
 
 import google.generativeai as genai
 
+from utils.circuit_breaker import circuit_breakers
+from utils.expert_router import ExpertBackend
+
 generation_config = {
     "temperature": 0.5,
     "top_p": 0.5,
@@ -45,6 +48,63 @@ model = genai.GenerativeModel(
 )
 
 
+def gemini_prompt(question: str, text: str) -> str:
+    """
+    Join an expert question and its text into a Gemini Pro prompt.
+    """
+    return f"{question}\n\n{text}" if text else question
+
+
+def gemini_config(temperature: float, top_p: float, max_tokens: int) -> dict:
+    """
+    Build the generation config of an expert request.
+    """
+    return {
+        **generation_config,
+        "temperature": temperature,
+        "top_p": top_p,
+        "max_output_tokens": min(max_tokens, 2048),
+    }
+
+
+def gemini_expert_call(question, text, temperature=0.2, top_p=0.5, max_tokens=2048):
+    """
+    Answer an expert request with Gemini Pro.
+    """
+    response = model.generate_content(
+        gemini_prompt(question, text),
+        generation_config=gemini_config(temperature, top_p, max_tokens),
+    )
+    return response.text or None
+
+
+async def gemini_expert_acall(
+    question, text, temperature=0.2, top_p=0.5, max_tokens=2048
+):
+    """
+    Answer an expert request with Gemini Pro without blocking the loop.
+    """
+    response = await model.generate_content_async(
+        gemini_prompt(question, text),
+        generation_config=gemini_config(temperature, top_p, max_tokens),
+    )
+    return response.text or None
+
+
+# Gemini Pro takes 30720 input tokens and 2048 output tokens.
+gemini_expert = ExpertBackend(
+    "gemini-pro",
+    "google",
+    30720 + 2048,
+    call=circuit_breakers.guard(
+        "generativelanguage.googleapis.com", gemini_expert_call
+    ),
+    acall=circuit_breakers.guard(
+        "generativelanguage.googleapis.com", gemini_expert_acall
+    ),
+)
+
+
 def ask_gemini_pro_synchronous(plugin_instance, question):
     """
     Ask Gemini Pro a question and get a response.
@@ -130,3 +190,10 @@ available_functions = {
     "ask_gemini_pro_synchronous": ask_gemini_pro_synchronous,
     "ask_gemini_pro_asynchronous": ask_gemini_pro_asynchronous,
 }
+
+# Define the upstream host of each tool for the circuit breakers
+upstreams = {name: "generativelanguage.googleapis.com" for name in available_functions}
+
+# The asynchronous question uses the blocking chat API, so it runs in a
+# worker thread
+execution_modes = {"ask_gemini_pro_asynchronous": "thread"}
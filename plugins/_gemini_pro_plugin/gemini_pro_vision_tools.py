@@ -161,3 +161,9 @@ gemini_pro_vision_tools = [
 available_functions = {
     "ask_gemini_pro_vision": ask_gemini_pro_vision,
 }
+
+# Define the upstream host of each tool for the circuit breakers
+upstreams = {name: "generativelanguage.googleapis.com" for name in available_functions}
+
+# Define the execution mode of the blocking Gemini Pro Vision calls
+execution_modes = {"ask_gemini_pro_vision": "thread"}
@@ -318,6 +318,12 @@ calendar_tools_list = [
     },
 ]
 
+prefetch_rules = {
+    "get_next_calendar_event": {
+        "pattern": r"\b(?:next|upcoming) (?:meeting|event|appointment)\b",
+    },
+}
+
 available_functions = {
     "get_next_calendar_event": get_next_calendar_event,
     "add_event": add_event,
@@ -331,3 +337,13 @@ available_functions = {
     "update_calendar": update_calendar,
     "delete_calendar": delete_calendar,
 }
+
+# Define the upstream host of each tool for the circuit breakers
+upstreams = {name: "www.googleapis.com/calendar" for name in available_functions}
+
+# The Google API client blocks and is not thread-safe, so the tools run
+# in worker threads one at a time
+execution_modes = {
+    name: {"mode": "thread", "group": "calendar"}
+    for name in available_functions
+}
@@ -16,8 +16,13 @@ from googleapiclient.http import (
     MediaFileUpload,
 )
 
+from utils.shared_store import shared_store
+
 nlp = spacy.load("en_core_web_md")
 
+# Seconds a folder ID is reused before the folder is looked up again.
+FOLDER_ID_TTL = 86400
+
 
 def extract_file_names(text):
     """
@@ -79,6 +84,30 @@ def build_drive_service(credentials):
     return build('drive', 'v3', credentials=credentials)
 
 
+def find_folder_id(drive_service, folder_name):
+    """
+    Find the ID of a Google Drive folder by name, or None.
+
+    The IDs are kept in the shared store, so a folder is looked up once
+    across the web server workers.
+    """
+    folder_id = shared_store.get("drive_folder", folder_name)
+    if folder_id is not None:
+        return folder_id
+
+    folder_query = f"name = '{folder_name}' and mimeType = 'application/vnd.google-apps.folder'"
+    folder_response = drive_service.files().list(
+        q=folder_query, fields="files(id, name)"
+    ).execute()
+    folders = folder_response.get('files', [])
+    if not folders:
+        return None
+
+    folder_id = folders[0].get('id')
+    shared_store.set("drive_folder", folder_name, folder_id, ttl=FOLDER_ID_TTL)
+    return folder_id
+
+
 async def upload_file(drive_service, user_input):
     """
     Upload or update a file to Google Drive based on user input.
@@ -126,11 +155,7 @@ async def download_file(drive_service, user_input, local_path):
 
         folder_id = None
         if folder_name:
-            folder_query = f"name = '{folder_name}' and mimeType = 'application/vnd.google-apps.folder'"
-            folder_response = drive_service.files().list(q=folder_query, fields="files(id)").execute()
-            folders = folder_response.get('files', [])
-            if folders:
-                folder_id = folders[0].get('id')
+            folder_id = find_folder_id(drive_service, folder_name)
 
         return f"Downloaded file '{file_name}' to {local_path}"
 
@@ -143,17 +168,10 @@ async def list_files(drive_service, folder_name='root', max_results=10):
     List files in Google Drive within a specified folder.
     """
     try:
-        folder_query = f"name = '{folder_name}' and mimeType = 'application/vnd.google-apps.folder'"
-        folder_response = drive_service.files().list(
-            q=folder_query, fields="files(id, name)"
-        ).execute()
-        folders = folder_response.get('files', [])
-
-        if not folders:
+        folder_id = find_folder_id(drive_service, folder_name)
+        if folder_id is None:
             return []
 
-        folder_id = folders[0].get('id')
-
         query = "'%s' in parents" % folder_id
         response = drive_service.files().list(
             q=query, pageSize=max_results, fields="nextPageToken, files(id, name)"
@@ -375,3 +393,12 @@ available_functions = {
     "share_file": share_file,
     "move_file": move_file,
 }
+
+# Define the upstream host of each tool for the circuit breakers
+upstreams = {name: "www.googleapis.com/drive" for name in available_functions}
+
+# The Google API client blocks and is not thread-safe, so the tools run
+# in worker threads one at a time
+execution_modes = {
+    name: {"mode": "thread", "group": "drive"} for name in available_functions
+}
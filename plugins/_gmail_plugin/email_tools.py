@@ -303,3 +303,12 @@ available_functions = {
     "gmail_send_message": gmail_send_message,
     "gmail_delete_message": gmail_delete_message,
 }
+
+# Define the upstream host of each tool for the circuit breakers
+upstreams = {name: "gmail.googleapis.com" for name in available_functions}
+
+# The Google API client blocks and is not thread-safe, so the tools run
+# in worker threads one at a time
+execution_modes = {
+    name: {"mode": "thread", "group": "gmail"} for name in available_functions
+}
@@ -16,16 +16,23 @@ from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
 from plugins._gmail_plugin.email_tools import (
     email_tools_list,
-    available_functions as email_functions
+    available_functions as email_functions,
+    upstreams as email_upstreams,
+    execution_modes as email_execution_modes,
 )
 from plugins._gmail_plugin.calendar_tools import (
     calendar_tools_list,
-    available_functions as calendar_functions
+    available_functions as calendar_functions,
+    prefetch_rules as calendar_prefetch_rules,
+    upstreams as calendar_upstreams,
+    execution_modes as calendar_execution_modes,
 )
 # Make sure to import drive_tools correctly
 from plugins._gmail_plugin.drive_tools import (
     drive_tools_list,
-    available_functions as drive_functions
+    available_functions as drive_functions,
+    upstreams as drive_upstreams,
+    execution_modes as drive_execution_modes,
 )
 from plugins.plugin_base import PluginBase
 
@@ -67,6 +74,8 @@ class GmailPlugin(PluginBase):
                 func,
                 self.gmail_service
             )
+        self.upstreams.update(email_upstreams)
+        self.execution_modes.update(email_execution_modes)
 
         # Load tools and functions from calendar_tools.py
         self.tools.extend(calendar_tools_list)
@@ -75,6 +84,9 @@ class GmailPlugin(PluginBase):
                 func,
                 self.calendar_service
             )
+        self.prefetch_rules.update(calendar_prefetch_rules)
+        self.upstreams.update(calendar_upstreams)
+        self.execution_modes.update(calendar_execution_modes)
 
         # Load tools and functions from drive_tools.py
         self.tools.extend(drive_tools_list)
@@ -84,6 +96,8 @@ class GmailPlugin(PluginBase):
                 func,
                 self.drive_service
             )
+        self.upstreams.update(drive_upstreams)
+        self.execution_modes.update(drive_execution_modes)
 
     def _load_credentials(self):
         if os.path.exists("plugins/_gmail_plugin/token.json"):
@@ -12,7 +12,9 @@ from plugins.plugin_base import PluginBase
 
 from plugins._google_search_plugin.google_search_tools import (
     search_google_tools,
-    available_functions as google_functions
+    available_functions as google_functions,
+    cache_policies as google_cache_policies,
+    upstreams as google_upstreams,
 )
 
 
@@ -35,3 +37,5 @@ class GoogleSearchPlugin(PluginBase):
         # Load tools and functions from google_search_tools.py
         self.tools.extend(search_google_tools)
         self.available_functions.update(google_functions)
+        self.cache_policies.update(google_cache_policies)
+        self.upstreams.update(google_upstreams)
@@ -201,7 +201,23 @@ search_google_tools = [
     },
 ]
 
+cache_policies = {
+    "search_google_synchronous": {
+        "ttl": 3600,
+        "key_fields": None,
+        "max_entries": 256,
+    },
+    "search_google_asynchronous": {
+        "ttl": 3600,
+        "key_fields": None,
+        "max_entries": 256,
+    },
+}
+
 available_functions = {
     "search_google_synchronous": search_google_synchronous,
     "search_google_asynchronous": search_google_asynchronous,
 }
+
+# Define the upstream host of each tool for the circuit breakers
+upstreams = {name: "www.googleapis.com/customsearch" for name in available_functions}
@@ -10,11 +10,16 @@ This module defines the News Expert plugin.
 
 from plugins._news_plugin.newsapi_tools import (
     newsorg_tool_list,
-    available_functions as newsapi_functions
+    available_functions as newsapi_functions,
+    cache_policies as newsapi_cache_policies,
+    prefetch_rules as newsapi_prefetch_rules,
+    upstreams as newsapi_upstreams,
 )
 from plugins._news_plugin.nytimes_tools import (
     nytimes_tool_list,
-    available_functions as nytimes_functions
+    available_functions as nytimes_functions,
+    cache_policies as nytimes_cache_policies,
+    upstreams as nytimes_upstreams,
 )
 
 from plugins.plugin_base import PluginBase
@@ -37,7 +42,12 @@ class NewsPlugin(PluginBase):
         # Load tools and functions from newsapi_tools.py
         self.tools.extend(newsorg_tool_list)
         self.available_functions.update(newsapi_functions)
+        self.cache_policies.update(newsapi_cache_policies)
+        self.prefetch_rules.update(newsapi_prefetch_rules)
+        self.upstreams.update(newsapi_upstreams)
 
         # Load tools and functions from nytimes_tools.py
         self.tools.extend(nytimes_tool_list)
         self.available_functions.update(nytimes_functions)
+        self.cache_policies.update(nytimes_cache_policies)
+        self.upstreams.update(nytimes_upstreams)
@@ -95,7 +95,8 @@ async def get_top_headlines_newsapi(api_key=TOOL_API_KEY, **kwargs) -> List:
 
                 return news
 
-        return []
+        except aiohttp.ServerTimeoutError:
+            return []
 
 
 # Define the tool list outside the class
@@ -204,8 +205,30 @@ newsorg_tool_list = [
     },
 ]
 
+cache_policies = {
+    "get_articles_newsapi": {
+        "ttl": 900,
+        "key_fields": None,
+        "max_entries": 128,
+    },
+    "get_top_headlines_newsapi": {
+        "ttl": 900,
+        "key_fields": None,
+        "max_entries": 128,
+    },
+}
+
+prefetch_rules = {
+    "get_articles_newsapi": {
+        "pattern": r"\bnews (?:about|on|regarding|for) (?P<q>[^?.!]+)",
+    },
+}
+
 # Define the available functions outside the class
 available_functions = {
     "get_articles_newsapi": get_articles_newsapi,
     "get_top_headlines_newsapi": get_top_headlines_newsapi,
 }
+
+# Define the upstream host of each tool for the circuit breakers
+upstreams = {name: "newsapi.org" for name in available_functions}
@@ -84,6 +84,17 @@ nytimes_tool_list = [
     }
 ]
 
+cache_policies = {
+    "get_news_from_nytimes": {
+        "ttl": 900,
+        "key_fields": None,
+        "max_entries": 128,
+    },
+}
+
 available_functions = {
     "get_news_from_nytimes": get_news_from_nytimes,
 }
+
+# Define the upstream host of each tool for the circuit breakers
+upstreams = {name: "api.nytimes.com" for name in available_functions}
@@ -10,7 +10,10 @@ This module defines the NHTSA vPic Vehicle Data plugin.
 
 from plugins._nhtsa_plugin.nhtsa_vpic_tools import (
     nhtsa_vpic_tool_list,
-    available_functions as nhtsa_vpic_functions
+    available_functions as nhtsa_vpic_functions,
+    cache_policies as nhtsa_vpic_cache_policies,
+    upstreams as nhtsa_vpic_upstreams,
+    execution_modes as nhtsa_vpic_execution_modes,
 )
 from plugins.plugin_base import PluginBase
 
@@ -32,3 +35,6 @@ class NHTSAVPICPlugin(PluginBase):
         # Load tools and functions from nhtsa_vpic_tools.py
         self.tools.extend(nhtsa_vpic_tool_list)
         self.available_functions.update(nhtsa_vpic_functions)
+        self.cache_policies.update(nhtsa_vpic_cache_policies)
+        self.upstreams.update(nhtsa_vpic_upstreams)
+        self.execution_modes.update(nhtsa_vpic_execution_modes)
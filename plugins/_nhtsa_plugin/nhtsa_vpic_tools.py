@@ -64,7 +64,27 @@ nhtsa_vpic_tool_list = [
 ]
 
 
+# Decoded VINs never change, so their results never expire.
+cache_policies = {
+    "get_vehicle_details_by_vin_synchronous": {
+        "ttl": None,
+        "key_fields": ["vin"],
+        "max_entries": 512,
+    },
+    "get_vehicle_details_by_vin_asynchronous": {
+        "ttl": None,
+        "key_fields": ["vin"],
+        "max_entries": 512,
+    },
+}
+
 available_functions = {
     "get_vehicle_details_by_vin_synchronous": get_vehicle_details_by_vin_synchronous,
     "get_vehicle_details_by_vin_asynchronous": get_vehicle_details_by_vin_asynchronous,
 }
+
+# Define the upstream host of each tool for the circuit breakers
+upstreams = {name: "vpic.nhtsa.dot.gov" for name in available_functions}
+
+# The asynchronous lookup uses requests, so it runs in a worker thread
+execution_modes = {"get_vehicle_details_by_vin_asynchronous": "thread"}
@@ -10,7 +10,8 @@ This file contains the System Commands plugin class.
 
 from plugins._system_commands.system_commands_tools import (
     system_commands_tool_list,
-    available_functions as system_commands_functions
+    available_functions as system_commands_functions,
+    execution_modes as system_commands_execution_modes,
 )
 from plugins.plugin_base import PluginBase
 
@@ -32,3 +33,4 @@ class SystemCommandsPlugin(PluginBase):
         # Load tools and functions from system_commands_tools.py
         self.tools.extend(system_commands_tool_list)
         self.available_functions.update(system_commands_functions)
+        self.execution_modes.update(system_commands_execution_modes)
@@ -305,3 +305,6 @@ available_functions = {
     "amend_python_script": amend_python_script,
     "execute_python_script": execute_python_script,
 }
+
+# The commands and file operations block, so the tools run in worker threads
+execution_modes = {name: "thread" for name in available_functions}
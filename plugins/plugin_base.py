@@ -16,6 +16,10 @@ class PluginBase:
     def __init__(self, **kwargs):
         self.tools = []
         self.available_functions = {}
+        self.cache_policies = {}
+        self.prefetch_rules = {}
+        self.upstreams = {}
+        self.execution_modes = {}
         self.__dict__.update(kwargs)
 
     async def initialize(self):
@@ -41,3 +45,27 @@ class PluginBase:
         Get the available functions.
         """
         return self.available_functions
+
+    def get_cache_policies(self):
+        """
+        Get the result cache policies of the tools.
+        """
+        return self.cache_policies
+
+    def get_prefetch_rules(self):
+        """
+        Get the prefetch rules of the tools.
+        """
+        return self.prefetch_rules
+
+    def get_upstreams(self):
+        """
+        Get the upstream hosts of the tools.
+        """
+        return self.upstreams
+
+    def get_execution_modes(self):
+        """
+        Get the execution modes of the tools.
+        """
+        return self.execution_modes
@@ -11,15 +11,23 @@ Enable plugins.
 import os
 import importlib.util
 import inspect
+import time
 from rich.console import Console
 from plugins.plugin_base import PluginBase
+from utils.tool_cache import tool_result_cache
+from utils.tool_prefetcher import tool_prefetcher
+from utils.circuit_breaker import circuit_breakers
+from utils.tool_executor import tool_executor
 
 console = Console()
 
 
-async def enable_plugins(available_functions, tools):
+async def enable_plugins(available_functions, tools, timings=None):
     """
     Enable plugins.
+
+    The time taken to construct and initialize each plugin is printed and,
+    when ``timings`` is given, stored in it keyed by plugin class name.
     """
     plugins_folder = "plugins"
 
@@ -45,13 +53,32 @@ async def enable_plugins(available_functions, tools):
 
                         if plugin_enabled and cls.__name__ not in available_functions:
 
+                            started = time.perf_counter()
                             plugin = cls()
                             await plugin.initialize()
+                            elapsed = time.perf_counter() - started
+                            if timings is not None:
+                                timings[cls.__name__] = elapsed
+                            console.print(
+                                f"Plugin {cls.__name__} initialized in {elapsed * 1000:.0f} ms."
+                            )
                             plugin_tools = plugin.get_tools()
                             available_functions.update(
-                                plugin.get_available_functions()
+                                circuit_breakers.wrap_functions(
+                                    plugin.get_available_functions(),
+                                    plugin.get_upstreams(),
+                                )
                             )
                             tools.extend(plugin_tools)
+                            tool_result_cache.register(
+                                plugin.get_cache_policies()
+                            )
+                            tool_prefetcher.register(
+                                plugin.get_prefetch_rules()
+                            )
+                            tool_executor.register(
+                                plugin.get_execution_modes()
+                            )
                         else:
                             console.print(
                                 f"Plugin {cls.__name__} is not enabled. Set {env_var_name} to true to enable it."
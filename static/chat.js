@@ -8,7 +8,8 @@ $(document).ready(function () {
       chatWindow.scrollTop = chatWindow.scrollHeight;
   }
 
-  let memory = [];
+  // The conversation is kept on the server under this session ID.
+  let sessionId = null;
 
   function showTypingAnimation() {
       const typingDots = '<span>.</span><span>.</span><span>.</span>';
@@ -41,19 +42,115 @@ $(document).ready(function () {
 
       showTypingAnimation();
 
+      const started = performance.now();
+      let firstByte = null;
+      let firstToken = null;
+      let aiMessage = null;
+      let streamed = "";
+
+      // The AI message is created on the first event that shows output.
+      function ensureAiMessage() {
+          if (aiMessage === null) {
+              removeTypingAnimation();
+              const wrapper = $(`<div class="message-wrapper ai"><img class="aiavatar" src="${aiAvatarUrl}" /><div class="ai-message"></div></div>`);
+              $("#chat-window").append(wrapper);
+              aiMessage = wrapper.find(".ai-message");
+          }
+          return aiMessage;
+      }
+
+      function showToolStatus(text) {
+          ensureAiMessage().find(".tool-status").remove();
+          if (text) {
+              aiMessage.append($('<div class="tool-status"></div>').text(text));
+          }
+          scrollToBottom();
+      }
+
+      function handleEvent(name, data) {
+          if (name === "start") {
+              sessionId = data.session_id;
+          } else if (name === "token") {
+              if (firstToken === null) {
+                  firstToken = performance.now() - started;
+              }
+              streamed += data.text;
+              ensureAiMessage().text(streamed);
+              scrollToBottom();
+          } else if (name === "discard") {
+              // The completion is retried, its streamed text is dropped.
+              streamed = "";
+              if (aiMessage !== null) {
+                  aiMessage.text("");
+              }
+          } else if (name === "tool_start") {
+              showToolStatus(`Running ${data.name}...`);
+          } else if (name === "tool_end") {
+              showToolStatus(`${data.name} finished in ${Math.round(data.duration_ms)} ms`);
+          } else if (name === "final") {
+              ensureAiMessage().html(data.response);
+              scrollToBottom();
+              console.info(
+                  "Chat timings:",
+                  `first byte ${Math.round(firstByte)} ms,`,
+                  `first token ${firstToken === null ? "n/a" : Math.round(firstToken) + " ms"},`,
+                  `total ${Math.round(performance.now() - started)} ms`,
+                  "(server:", data.timings, ")"
+              );
+          } else if (name === "error") {
+              throw new Error(data.error);
+          }
+      }
+
+      // Split the Server-Sent Events on blank lines and decode each one.
+      function parseEvent(block) {
+          let name = "message";
+          let data = "";
+          block.split("\n").forEach(line => {
+              if (line.startsWith("event:")) {
+                  name = line.slice(6).trim();
+              } else if (line.startsWith("data:")) {
+                  data += line.slice(5).trim();
+              }
+          });
+          handleEvent(name, data ? JSON.parse(data) : null);
+      }
+
       try {
-          const response = await $.ajax({
-              url: "/chat", // Make sure this endpoint is correct
-              type: "POST",
-              contentType: "application/json",
-              data: JSON.stringify({ user_input: userText, memory }),
+          const response = await fetch("/chat/stream", {
+              method: "POST",
+              headers: { "Content-Type": "application/json" },
+              body: JSON.stringify({ user_input: userText, session_id: sessionId }),
           });
+          if (response.status === 429) {
+              removeTypingAnimation();
+              const retryAfter = response.headers.get("Retry-After") || "a few";
+              $("#chat-window").append(`<div class="message-wrapper ai"><div class="ai-message">The assistant is busy, please retry in ${retryAfter} seconds.</div></div>`);
+              scrollToBottom();
+              return;
+          }
+          if (!response.ok || !response.body) {
+              throw new Error(`HTTP ${response.status}`);
+          }
 
-          removeTypingAnimation();
-          $("#chat-window").append(`<div class="message-wrapper ai"><img class="aiavatar" src="${aiAvatarUrl}" /><div class="ai-message">${response.response}</div></div>`);
-          memory = response.memory;
-          scrollToBottom();
+          const reader = response.body.getReader();
+          const decoder = new TextDecoder();
+          let buffer = "";
+          while (true) {
+              const { value, done } = await reader.read();
+              if (done) break;
+              if (firstByte === null) {
+                  firstByte = performance.now() - started;
+              }
+              buffer += decoder.decode(value, { stream: true });
+              let boundary;
+              while ((boundary = buffer.indexOf("\n\n")) !== -1) {
+                  parseEvent(buffer.slice(0, boundary));
+                  buffer = buffer.slice(boundary + 2);
+              }
+          }
       } catch (error) {
+          removeTypingAnimation();
           console.error("Error: Unable to get a response from the assistant.", error);
           $("#chat-window").append(`<div class="message-wrapper ai"><div class="ai-message">Error: Unable to get a response from the assistant.</div></div>`);
       }
@@ -61,5 +158,6 @@ $(document).ready(function () {
 
   $("#clear-chat-btn").click(function () {
       clearChatHistory();
+      sessionId = null;
   });
 });
\ No newline at end of file
@@ -0,0 +1,207 @@
+# !/usr/bin/env python
+# coding: utf-8
+# Filename: admission_controller.py
+# Path: utils/admission_controller.py
+
+"""
+
+Admission Controller
+===============
+This module limits the conversation turns the web server runs at once, so
+a burst of users waits in a short queue or is turned away quickly instead
+of fanning out into unbounded model and tool calls.
+
+
+Classes
+-------
+AdmissionRejected
+    Raised when a turn is turned away, with the seconds to wait.
+AdmissionController
+    Cap the in-flight turns behind a bounded FIFO wait queue.
+
+"""
+import asyncio
+import contextlib
+import math
+import time
+from collections import deque
+
+
+class AdmissionRejected(Exception):
+    """
+    Raised when a turn is turned away, with the seconds to wait.
+    """
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(f"Turn rejected ({reason}), retry in {retry_after} s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Cap the in-flight turns behind a bounded FIFO wait queue.
+
+    At most ``max_in_flight`` turns run at once. The next ``max_queue``
+    turns wait in arrival order for a free slot, at most ``queue_timeout``
+    seconds; further turns are rejected at once. A finished turn hands its
+    slot to the oldest waiter, so a new turn cannot overtake the queue.
+
+    The ``retry_after`` of a rejection is estimated from the moving average
+    of the turn durations and the length of the queue.
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int = 8,
+        max_queue: int = 16,
+        queue_timeout: float = 30.0,
+        alpha: float = 0.2,
+        enabled: bool = True,
+    ):
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self.alpha = alpha
+        self.enabled = enabled
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.peak_queued = 0
+        self.admitted = 0
+        self.queued = 0
+        self.rejected_full = 0
+        self.rejected_timeout = 0
+        self.turn_time = None
+        self.wait_time = 0.0
+        self.max_wait = 0.0
+        self._waits = deque(maxlen=500)
+        self._waiters = deque()
+
+    def retry_after(self) -> int:
+        """
+        Estimate the seconds until a new turn could be admitted.
+        """
+        turn = self.turn_time if self.turn_time is not None else 1.0
+        rounds = (len(self._waiters) + 1) / self.max_in_flight
+        return max(1, math.ceil(turn * rounds))
+
+    async def acquire(self):
+        """
+        Wait for a turn slot, or raise ``AdmissionRejected``.
+
+        A turn holding a slot must call ``release`` exactly once.
+        """
+        if not self.enabled:
+            return
+        if self.in_flight < self.max_in_flight and not self._waiters:
+            self._admit(0.0)
+            return
+        if len(self._waiters) >= self.max_queue:
+            self.rejected_full += 1
+            raise AdmissionRejected("queue full", self.retry_after())
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.queued += 1
+        self.peak_queued = max(self.peak_queued, len(self._waiters))
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(
+                asyncio.shield(waiter), self.queue_timeout
+            )
+        except (asyncio.TimeoutError, asyncio.CancelledError) as error:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over as the wait ended.
+                self.release(None)
+            else:
+                waiter.cancel()
+                self._waiters.remove(waiter)
+            if isinstance(error, asyncio.CancelledError):
+                raise
+            self.rejected_timeout += 1
+            raise AdmissionRejected(
+                "queue timeout", self.retry_after()
+            ) from None
+        # ``release`` already counted this turn in flight.
+        self._admit(time.perf_counter() - started, handed_over=True)
+
+    def _admit(self, waited: float, handed_over: bool = False):
+        """
+        Count an admitted turn and the time it waited.
+        """
+        if not handed_over:
+            self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        self.admitted += 1
+        self.wait_time += waited
+        self.max_wait = max(self.max_wait, waited)
+        self._waits.append(waited)
+
+    def release(self, duration: float = None):
+        """
+        Free the slot of a finished turn, handing it to the oldest waiter.
+
+        Args:
+            duration (float): The seconds the turn ran, to estimate
+                ``retry_after``.
+        """
+        if not self.enabled:
+            return
+        if duration is not None:
+            self.turn_time = (
+                duration if self.turn_time is None
+                else self.turn_time + self.alpha * (duration - self.turn_time)
+            )
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(True)
+                return
+        self.in_flight -= 1
+
+    @contextlib.asynccontextmanager
+    async def admit(self):
+        """
+        Hold a turn slot for the duration of the block.
+
+        Raises:
+            AdmissionRejected: When the queue is full or the wait timed out.
+        """
+        await self.acquire()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.release(time.perf_counter() - started)
+
+    def stats(self):
+        """
+        Get the admission counters and queue times.
+        """
+        waits = sorted(self._waits)
+        return {
+            "enabled": self.enabled,
+            "max_in_flight": self.max_in_flight,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "waiting": len(self._waiters),
+            "peak_in_flight": self.peak_in_flight,
+            "peak_waiting": self.peak_queued,
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "rejected_full": self.rejected_full,
+            "rejected_timeout": self.rejected_timeout,
+            "average_wait_ms": round(
+                self.wait_time / self.admitted * 1000
+                if self.admitted else 0.0, 1
+            ),
+            "p95_wait_ms": round(
+                waits[int(0.95 * (len(waits) - 1))] * 1000
+                if waits else 0.0, 1
+            ),
+            "max_wait_ms": round(self.max_wait * 1000, 1),
+            "turn_ms": (
+                round(self.turn_time * 1000, 1)
+                if self.turn_time is not None else None
+            ),
+        }
@@ -0,0 +1,134 @@
+# !/usr/bin/env python
+# coding: utf-8
+# Filename: async_console.py
+# Path: utils/async_console.py
+
+"""
+
+Async Console
+===============
+This module reads the user input and speaks the responses of the CLI
+without blocking the event loop.
+
+
+Classes
+-------
+AsyncLineReader
+    Read input lines in a background thread and queue them for the loop.
+BackgroundSpeaker
+    Speak responses one after another in a worker thread.
+
+"""
+import asyncio
+import sys
+import threading
+
+
+class AsyncLineReader:
+    """
+    Read input lines in a background thread and queue them for the loop.
+
+    The thread keeps reading while a turn runs, so the user can type the
+    next prompt while the previous answer is rendered or spoken, and the
+    event loop stays free for background tasks between prompts. End of
+    input is queued as ``None``.
+    """
+
+    def __init__(self, console, stream=None):
+        self.console = console
+        self.stream = stream if stream is not None else sys.stdin
+        self._queue = None
+        self._thread = None
+
+    def start(self):
+        """
+        Start reading lines in a daemon thread.
+        """
+        if self._thread is not None:
+            return
+        loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self._thread = threading.Thread(
+            target=self._read, args=(loop,), name="input-reader", daemon=True
+        )
+        self._thread.start()
+
+    def _read(self, loop):
+        """
+        Forward every input line to the queue of the event loop.
+        """
+        while True:
+            try:
+                line = self.stream.readline()
+            except (OSError, ValueError):
+                line = ""
+            if not line:
+                loop.call_soon_threadsafe(self._queue.put_nowait, None)
+                return
+            loop.call_soon_threadsafe(
+                self._queue.put_nowait, line.rstrip("\r\n")
+            )
+
+    @property
+    def pending(self) -> int:
+        """
+        Get the number of lines typed ahead.
+        """
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def readline(self, prompt: str = ""):
+        """
+        Print a prompt and wait for the next input line.
+
+        Args:
+            prompt (str): The rich markup of the prompt.
+
+        Returns:
+            str: The line, or ``None`` at the end of the input.
+        """
+        self.start()
+        if prompt:
+            self.console.print(prompt, end=" ")
+        return await self._queue.get()
+
+
+class BackgroundSpeaker:
+    """
+    Speak responses one after another in a worker thread.
+
+    ``speak`` returns at once; the blocking text-to-speech function runs in
+    a thread, so the next prompt can be read while a response is spoken.
+    """
+
+    def __init__(self, output):
+        self.output = output
+        self.spoken = 0
+        self.failures = 0
+        self._task = None
+
+    def speak(self, text: str):
+        """
+        Queue a text to be spoken after the previous ones.
+        """
+        self._task = asyncio.create_task(self._speak(self._task, text))
+
+    async def _speak(self, previous, text: str):
+        """
+        Wait for the previous text, then speak this one.
+        """
+        if previous is not None:
+            await asyncio.gather(previous, return_exceptions=True)
+        try:
+            await asyncio.to_thread(self.output, text)
+        # A failing speech engine must not end the session.
+        except Exception:  # pylint: disable=broad-except
+            self.failures += 1
+        else:
+            self.spoken += 1
+
+    async def drain(self):
+        """
+        Wait for the queued texts to be spoken.
+        """
+        if self._task is not None:
+            await asyncio.gather(self._task, return_exceptions=True)
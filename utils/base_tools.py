@@ -0,0 +1,264 @@
+# !/usr/bin/env python
+# coding: utf-8
+# Filename: base_tools.py
+# Path: utils/base_tools.py
+
+"""
+Base tools.
+
+This file contains the tool schemas and functions that are always
+available, independent of the enabled plugins.
+"""
+from utils.openai_model_tools import (
+    ask_chat_gpt_4_0314_synchronous,
+    ask_chat_gpt_4_0314_asynchronous,
+    ask_chat_gpt_4_32k_0314_synchronous,
+    ask_chat_gpt_4_32k_0314_asynchronous,
+    ask_chat_gpt_4_0613_synchronous,
+    ask_chat_gpt_4_0613_asynchronous,
+    ask_gpt_4_vision,
+)
+from utils.openai_dalle_tools import generate_an_image_with_dalle3
+from utils.core_tools import get_current_date_time
+
+base_tool_list = [
+    {
+        "type": "function",
+        "function": {
+            "name": "get_current_date_time",
+            "description": "Get the current date and time from the local machine.",
+        },
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "ask_chat_gpt_4_0314_synchronous",
+            "description": "This function allows you to ask a larger AI LLM for assistance synchronously, like asking a more experienced colleague for assistance.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "temperature": {
+                        "type": "integer",
+                        "description": "The temperature associated with request: 0 for factual, 2 for creative.",
+                    },
+                    "question": {
+                        "type": "string",
+                        "description": "What are you, the ai assistant, requesting to be done with the text you are providing?",
+                    },
+                    "text": {
+                        "type": "string",
+                        "description": "The text to be analyzed",
+                    },
+                },
+                "required": ["question", "text"],
+            },
+        },
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "ask_chat_gpt_4_0314_asynchronous",
+            "description": "This function allows you to ask a larger AI LLM for assistance asynchronously, like asking a more experienced colleague for assistance.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "temperature": {
+                        "type": "integer",
+                        "description": "The temperature associated with request: 0 for factual, 2 for creative.",
+                    },
+                    "question": {
+                        "type": "string",
+                        "description": "What are you, the ai assistant, requesting to be done with the text you are providing?",
+                    },
+                    "text": {
+                        "type": "string",
+                        "description": "The text to be analyzed",
+                    },
+                },
+                "required": ["question", "text"],
+            },
+        },
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "ask_chat_gpt_4_32k_0314_synchronous",
+            "description": "This function allows you to ask a larger AI LLM for assistance synchronously, like asking a more experienced colleague for assistance.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "temperature": {
+                        "type": "integer",
+                        "description": "The temperature associated with request: 0 for factual, 2 for creative.",
+                    },
+                    "question": {
+                        "type": "string",
+                        "description": "What are you, the ai assistant, requesting to be done with the text you are providing?",
+                    },
+                    "text": {
+                        "type": "string",
+                        "description": "The text to be analyzed",
+                    },
+                },
+                "required": ["question", "text"],
+            },
+        },
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "ask_chat_gpt_4_32k_0314_asynchronous",
+            "description": "This function allows you to ask a larger AI LLM for assistance asynchronously, like asking a more experienced colleague for assistance.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "temperature": {
+                        "type": "integer",
+                        "description": "The temperature associated with request: 0 for factual, 2 for creative.",
+                    },
+                    "question": {
+                        "type": "string",
+                        "description": "What are you, the ai assistant, requesting to be done with the text you are providing?",
+                    },
+                    "text": {
+                        "type": "string",
+                        "description": "The text to be analyzed",
+                    },
+                },
+                "required": ["question", "text"],
+            },
+        },
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "ask_chat_gpt_4_0613_synchronous",
+            "description": "This function allows you to ask a larger AI LLM for assistance synchronously, like asking a more experienced colleague for assistance.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "temperature": {
+                        "type": "integer",
+                        "description": "The temperature associated with request: 0 for factual, 2 for creative.",
+                    },
+                    "question": {
+                        "type": "string",
+                        "description": "What are you, the ai assistant, requesting to be done with the text you are providing?",
+                    },
+                    "text": {
+                        "type": "string",
+                        "description": "The text to be analyzed",
+                    },
+                    "tools": {
+                        "type": "string",
+                        "description": "The tools to use for the request.",
+                    },
+                    "tool_choice": {
+                        "type": "string",
+                        "description": "The tool choice to use for the request.",
+                    },
+                },
+                "required": ["question", "text"],
+            },
+        },
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "ask_chat_gpt_4_0613_asynchronous",
+            "description": "This function allows you to ask a larger AI LLM for assistance asynchronously, like asking a more experienced colleague for assistance.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "temperature": {
+                        "type": "integer",
+                        "description": "The temperature associated with request: 0 for factual, 2 for creative.",
+                    },
+                    "question": {
+                        "type": "string",
+                        "description": "What are you, the ai assistant, requesting to be done with the text you are providing?",
+                    },
+                    "text": {
+                        "type": "string",
+                        "description": "The text to be analyzed",
+                    },
+                    "tools": {
+                        "type": "string",
+                        "description": "The tools to use for the request.",
+                    },
+                    "tool_choice": {
+                        "type": "string",
+                        "description": "The tool choice to use for the request.",
+                    },
+                },
+                "required": ["question", "text"],
+            },
+        },
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "ask_gpt_4_vision",
+            "description": "Ask GPT-4 Vision a question about a specific image file located in the 'uploads' folder.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "image_name": {
+                        "type": "string",
+                        "description": "The name of the image file in the 'uploads' folder.",
+                    },
+                },
+                "required": ["image_name"],
+            },
+        },
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "generate_an_image_with_dalle3",
+            "description": "Generate an image with DALL-E 3.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "prompt": {
+                        "type": "string",
+                        "description": "The prompt to use for image generation.",
+                    },
+                    "n": {
+                        "type": "integer",
+                        "description": "The number of images to generate.",
+                    },
+                    "size": {
+                        "type": "string",
+                        "description": "The image size to generate.",
+                    },
+                    "quality": {
+                        "type": "string",
+                        "description": "The image quality to generate.",
+                    },
+                    "style": {
+                        "type": "string",
+                        "description": "The image style to generate. natural or vivid",
+                    },
+                    "response_format": {
+                        "type": "string",
+                        "description": "The response format to use for image generation b64_json or url.",
+                    },
+                },
+                "required": ["prompt"],
+            },
+        },
+    },
+]
+
+available_functions = {
+    "get_current_date_time": get_current_date_time,
+    "ask_chat_gpt_4_0314_synchronous": ask_chat_gpt_4_0314_synchronous,
+    "ask_chat_gpt_4_0314_asynchronous": ask_chat_gpt_4_0314_asynchronous,
+    "ask_chat_gpt_4_32k_0314_synchronous": ask_chat_gpt_4_32k_0314_synchronous,
+    "ask_chat_gpt_4_32k_0314_asynchronous": ask_chat_gpt_4_32k_0314_asynchronous,
+    "ask_chat_gpt_4_0613_synchronous": ask_chat_gpt_4_0613_synchronous,
+    "ask_chat_gpt_4_0613_asynchronous": ask_chat_gpt_4_0613_asynchronous,
+    "generate_an_image_with_dalle3": generate_an_image_with_dalle3,
+    "ask_gpt_4_vision": ask_gpt_4_vision,
+}
@@ -0,0 +1,426 @@
+# !/usr/bin/env python
+# coding: utf-8
+# Filename: circuit_breaker.py
+# Path: utils/circuit_breaker.py
+
+"""
+
+Circuit Breaker
+===============
+This module stops calling an upstream service that keeps failing, so a
+dead upstream costs a fast error instead of a timeout on every turn.
+
+Plugins declare the upstream host of each tool in their ``upstreams``
+dictionary, for example::
+
+    upstreams = {
+        "get_articles_newsapi": "newsapi.org",
+    }
+
+Every tool of the same host shares one breaker. Model APIs key their
+breakers by model with ``model_upstream``, so the rate limits of one
+model do not stop the calls to the others. With a shared store, a
+breaker opened by one worker process of the web server opens the breaker
+of the same host in the other workers.
+
+
+Classes
+-------
+CircuitOpenError
+    Raised instead of calling an upstream whose breaker is open.
+CircuitBreaker
+    Consecutive-failure breaker of a single upstream.
+CircuitBreakers
+    The breakers keyed by upstream host.
+
+"""
+import asyncio
+import functools
+import inspect
+import threading
+import time
+
+from config import (
+    CIRCUIT_BREAKER_ENABLED,
+    CIRCUIT_FAILURE_THRESHOLD,
+    CIRCUIT_RESET_TIMEOUT,
+    CIRCUIT_CALL_TIMEOUT,
+    SHARED_STORE_ENABLED,
+)
+from utils.shared_store import shared_store
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised instead of calling an upstream whose breaker is open.
+    """
+
+    def __init__(self, upstream: str, retry_after: float):
+        super().__init__(
+            f"{upstream} is unavailable, retry in {retry_after:.0f} s"
+        )
+        self.upstream = upstream
+        self.retry_after = retry_after
+
+
+def model_upstream(host: str, model: str) -> str:
+    """
+    Get the upstream key of a model served by a host.
+    """
+    return f"{host}/{model}"
+
+
+def is_upstream_failure(error: Exception) -> bool:
+    """
+    Check whether an error means the upstream is unhealthy.
+
+    Errors carrying an HTTP status count only for server errors and rate
+    limits, so a rejected request does not open the breaker. Programming
+    errors raised while reading a response do not count either.
+    """
+    for attribute in ("status_code", "status", "code"):
+        status = getattr(error, attribute, None)
+        if isinstance(status, int) and 100 <= status < 600:
+            return status >= 500 or status == 429
+    return not isinstance(error, (KeyError, TypeError, AttributeError))
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure breaker of a single upstream.
+
+    The breaker opens after ``failure_threshold`` consecutive failures and
+    rejects calls for ``reset_timeout`` seconds. It then goes half-open and
+    lets a single probe call through: the breaker closes when the probe
+    succeeds and opens again when it fails.
+
+    With a ``shared`` store, the breaker publishes when it opens and adopts
+    the open state published by other processes, checked at most every
+    ``sync_interval`` seconds. Guarded coroutines use ``abefore_call`` and
+    ``arecord``, which reach the shared store from a worker thread.
+    """
+
+    def __init__(
+        self,
+        upstream: str,
+        failure_threshold: int = 3,
+        reset_timeout: float = 30.0,
+        shared=None,
+        sync_interval: float = 1.0,
+    ):
+        self.upstream = upstream
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.shared = shared
+        self.sync_interval = sync_interval
+        self._synced = float("-inf")
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.calls = 0
+        self.failures = 0
+        self.rejected = 0
+        self.opened = 0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def before_call(self) -> bool:
+        """
+        Admit a call, or raise ``CircuitOpenError``.
+
+        Returns:
+            bool: Whether the call is the probe of a half-open breaker.
+        """
+        if self.shared is not None and self._sync_due():
+            self._adopt(self.shared.get("circuit", self.upstream))
+        return self._admit()
+
+    async def abefore_call(self) -> bool:
+        """
+        Admit a call, reading the shared state in a worker thread.
+
+        Returns:
+            bool: Whether the call is the probe of a half-open breaker.
+        """
+        if self.shared is not None and self._sync_due():
+            self._adopt(await self.shared.aget("circuit", self.upstream))
+        return self._admit()
+
+    def _admit(self) -> bool:
+        """
+        Admit a call according to the local state.
+        """
+        with self._lock:
+            if self.state == "closed":
+                self.calls += 1
+                return False
+            remaining = self.opened_at + self.reset_timeout - time.monotonic()
+            if remaining > 0 or self._probing:
+                self.rejected += 1
+                raise CircuitOpenError(self.upstream, max(remaining, 0.0))
+            self.state = "half_open"
+            self._probing = True
+            self.calls += 1
+            return True
+
+    def _sync_due(self) -> bool:
+        """
+        Check whether the shared state should be read again.
+        """
+        now = time.monotonic()
+        if now - self._synced < self.sync_interval:
+            return False
+        self._synced = now
+        return True
+
+    def _adopt(self, open_until):
+        """
+        Adopt the open state published by another process.
+        """
+        if open_until is None:
+            return
+        now = time.monotonic()
+        remaining = open_until - time.time()
+        with self._lock:
+            if remaining > 0 and self.state == "closed":
+                self.state = "open"
+                self.opened += 1
+                self.opened_at = now + remaining - self.reset_timeout
+
+    def record(self, ok: bool, probe: bool = False):
+        """
+        Record the outcome of an admitted call.
+        """
+        change = self._update(ok, probe)
+        if change == "opened":
+            self.shared.set(
+                "circuit", self.upstream,
+                time.time() + self.reset_timeout, ttl=self.reset_timeout,
+            )
+        elif change == "closed":
+            self.shared.delete("circuit", self.upstream)
+
+    async def arecord(self, ok: bool, probe: bool = False):
+        """
+        Record the outcome of an admitted call, publishing a change of
+        state in a worker thread.
+        """
+        change = self._update(ok, probe)
+        if change == "opened":
+            await self.shared.aset(
+                "circuit", self.upstream,
+                time.time() + self.reset_timeout, ttl=self.reset_timeout,
+            )
+        elif change == "closed":
+            await self.shared.adelete("circuit", self.upstream)
+
+    def _update(self, ok: bool, probe: bool):
+        """
+        Update the local state with the outcome of a call.
+
+        Returns:
+            str: ``opened`` or ``closed`` when the change must be published
+            to the shared store, else ``None``.
+        """
+        with self._lock:
+            if probe:
+                self._probing = False
+            if ok:
+                self.consecutive_failures = 0
+                if probe:
+                    self.state = "closed"
+                closed, opened = probe, False
+            else:
+                self.failures += 1
+                self.consecutive_failures += 1
+                closed = False
+                opened = (
+                    probe
+                    or self.consecutive_failures >= self.failure_threshold
+                )
+                if opened:
+                    if self.state != "open":
+                        self.opened += 1
+                    self.state = "open"
+                    self.opened_at = time.monotonic()
+
+        if self.shared is None:
+            return None
+        if opened:
+            return "opened"
+        if closed:
+            return "closed"
+        return None
+
+    def release(self, probe: bool = False):
+        """
+        Forget an admitted call that was cancelled.
+        """
+        if probe:
+            with self._lock:
+                self._probing = False
+
+    def stats(self):
+        """
+        Get the state and counters of the breaker.
+        """
+        retry_after = (
+            max(0.0, self.opened_at + self.reset_timeout - time.monotonic())
+            if self.state != "closed" else 0.0
+        )
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "retry_after": round(retry_after, 1),
+            "calls": self.calls,
+            "failures": self.failures,
+            "rejected": self.rejected,
+            "opened": self.opened,
+        }
+
+
+class CircuitBreakers:
+    """
+    The breakers keyed by upstream host.
+
+    ``guard`` wraps a function so its calls go through the breaker of an
+    upstream. A guarded call taking longer than its ``timeout`` counts as
+    a failure: coroutine calls are cancelled, blocking calls are only
+    counted since they cannot be interrupted.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = 3,
+        reset_timeout: float = 30.0,
+        call_timeout: float = 30.0,
+        enabled: bool = True,
+        shared=None,
+    ):
+        self.enabled = enabled
+        self.shared = shared
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.call_timeout = call_timeout
+        self.breakers = {}
+        self._lock = threading.Lock()
+
+    def get(self, upstream: str) -> CircuitBreaker:
+        """
+        Get the breaker of an upstream, creating it on first use.
+        """
+        with self._lock:
+            breaker = self.breakers.get(upstream)
+            if breaker is None:
+                breaker = self.breakers[upstream] = CircuitBreaker(
+                    upstream, self.failure_threshold, self.reset_timeout,
+                    shared=self.shared,
+                )
+            return breaker
+
+    def guard(self, upstream: str, function, asynchronous=None, timeout=None):
+        """
+        Wrap a function with the breaker of an upstream.
+
+        Args:
+            upstream (str): The upstream host.
+            function (callable): The function calling the upstream.
+            asynchronous (bool): Whether the function returns an awaitable,
+                detected from the function when ``None``.
+            timeout (float): The seconds after which a call is a failure.
+
+        Returns:
+            callable: The guarded function.
+        """
+        if not self.enabled:
+            return function
+        breaker = self.get(upstream)
+        if asynchronous is None:
+            asynchronous = inspect.iscoroutinefunction(function)
+
+        if asynchronous:
+            @functools.wraps(function)
+            async def guarded(*args, **kwargs):
+                probe = await breaker.abefore_call()
+                try:
+                    call = function(*args, **kwargs)
+                    if timeout:
+                        result = await asyncio.wait_for(call, timeout)
+                    else:
+                        result = await call
+                except asyncio.CancelledError:
+                    breaker.release(probe)
+                    raise
+                except Exception as error:
+                    await breaker.arecord(
+                        not is_upstream_failure(error), probe
+                    )
+                    if timeout and isinstance(error, asyncio.TimeoutError):
+                        raise TimeoutError(
+                            f"{upstream} did not answer within {timeout:g} s"
+                        ) from error
+                    raise
+                await breaker.arecord(True, probe)
+                return result
+        else:
+            @functools.wraps(function)
+            def guarded(*args, **kwargs):
+                probe = breaker.before_call()
+                started = time.monotonic()
+                try:
+                    result = function(*args, **kwargs)
+                except Exception as error:
+                    breaker.record(not is_upstream_failure(error), probe)
+                    raise
+                except BaseException:
+                    breaker.release(probe)
+                    raise
+                breaker.record(
+                    not timeout or time.monotonic() - started <= timeout, probe
+                )
+                return result
+
+        return guarded
+
+    def wrap_functions(self, functions: dict, upstreams: dict) -> dict:
+        """
+        Guard the tool functions that declare an upstream.
+
+        Args:
+            functions (dict): The functions keyed by tool name.
+            upstreams (dict): The upstream hosts keyed by tool name.
+
+        Returns:
+            dict: The functions, guarded when they have an upstream.
+        """
+        return {
+            name: (
+                self.guard(upstreams[name], function, timeout=self.call_timeout)
+                if name in upstreams else function
+            )
+            for name, function in functions.items()
+        }
+
+    def stats(self):
+        """
+        Get the state of every breaker.
+        """
+        return {
+            "enabled": self.enabled,
+            "failure_threshold": self.failure_threshold,
+            "reset_timeout": self.reset_timeout,
+            "upstreams": {
+                upstream: breaker.stats()
+                for upstream, breaker in self.breakers.items()
+            },
+        }
+
+
+# Define the circuit breakers shared by the tools and the model clients.
+circuit_breakers = CircuitBreakers(
+    failure_threshold=CIRCUIT_FAILURE_THRESHOLD,
+    reset_timeout=CIRCUIT_RESET_TIMEOUT,
+    call_timeout=CIRCUIT_CALL_TIMEOUT,
+    enabled=CIRCUIT_BREAKER_ENABLED,
+    shared=shared_store if SHARED_STORE_ENABLED else None,
+)
@@ -0,0 +1,372 @@
+# !/usr/bin/env python
+# coding: utf-8
+# Filename: completion_cache.py
+# Path: utils/completion_cache.py
+
+"""
+
+Completion Cache
+===============
+This module contains the exact-match cache for chat completions.
+
+
+Classes
+-------
+CompletionCache
+    Two tier (in-memory LRU and SQLite) cache of deterministic completions.
+
+"""
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from openai.types.chat import ChatCompletion
+
+from config import (
+    COMPLETION_CACHE_ENABLED,
+    COMPLETION_CACHE_PATH,
+    COMPLETION_CACHE_MEMORY_ENTRIES,
+    COMPLETION_CACHE_TTL,
+    COMPLETION_CACHE_MAX_MB,
+)
+
+# The request parameters that change the completion returned by the API.
+KEY_PARAMETERS = (
+    "model",
+    "messages",
+    "tools",
+    "tool_choice",
+    "temperature",
+    "top_p",
+    "max_tokens",
+    "frequency_penalty",
+    "presence_penalty",
+    "stop",
+    "seed",
+    "response_format",
+    "n",
+)
+
+
+def _serialize(value):
+    """
+    Serialize the pydantic objects found in request messages.
+    """
+    if hasattr(value, "model_dump"):
+        return value.model_dump(exclude_none=True)
+    raise TypeError(f"Object of type {type(value).__name__} is not serializable")
+
+
+class CompletionCache:
+    """
+    Exact-match cache of chat completions.
+
+    Requests are keyed by a SHA-256 hash of their canonical JSON form and
+    only cached when sampling is deterministic. Entries live in an
+    in-memory LRU tier backed by a SQLite tier with a TTL and a size cap.
+    The SQLite tier is shared by the worker processes of the web server; it
+    is best effort, a database error counts as a miss or a skipped write,
+    and ``acreate`` reaches it from a worker thread.
+    """
+
+    def __init__(
+        self,
+        path: str = None,
+        memory_entries: int = 256,
+        ttl: float = 86400,
+        max_bytes: int = 64 * 1024 * 1024,
+        enabled: bool = True,
+    ):
+        self.enabled = enabled
+        self.memory_entries = memory_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self._memory = OrderedDict()
+        self.failures = 0
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._db = None
+
+        if enabled and path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            try:
+                self._db = sqlite3.connect(
+                    path, timeout=5.0, check_same_thread=False
+                )
+                # WAL lets the web server workers read while another writes.
+                self._db.execute("PRAGMA journal_mode=WAL")
+                self._db.execute("PRAGMA synchronous=NORMAL")
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS completions ("
+                    "key TEXT PRIMARY KEY, response TEXT NOT NULL, "
+                    "expires REAL NOT NULL, last_access REAL NOT NULL, "
+                    "size INTEGER NOT NULL)"
+                )
+                self._db.execute(
+                    "CREATE INDEX IF NOT EXISTS completions_last_access "
+                    "ON completions (last_access)"
+                )
+                self._db.commit()
+            except sqlite3.Error:
+                # Run on the in-memory tier alone.
+                self.failures += 1
+                self._db = None
+
+    @staticmethod
+    def is_cacheable(params: dict) -> bool:
+        """
+        Check whether a request samples deterministically.
+        """
+        return (
+            params.get("temperature") == 0
+            and params.get("n", 1) in (None, 1)
+            and not params.get("stream")
+        )
+
+    @staticmethod
+    def make_key(params: dict) -> str:
+        """
+        Hash the canonical form of a request.
+        """
+        canonical = json.dumps(
+            {name: params.get(name) for name in KEY_PARAMETERS},
+            sort_keys=True,
+            separators=(",", ":"),
+            default=_serialize,
+        )
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def get(self, key: str):
+        """
+        Get a cached completion, or None on a miss.
+        """
+        payload = self._get_memory(key)
+        if payload is None and self._db is not None:
+            payload = self._get_disk(key)
+        return self._decode(payload)
+
+    async def aget(self, key: str):
+        """
+        Get a cached completion, reading the SQLite tier in a thread.
+        """
+        payload = self._get_memory(key)
+        if payload is None and self._db is not None:
+            payload = await asyncio.to_thread(self._get_disk, key)
+        return self._decode(payload)
+
+    def _get_memory(self, key: str):
+        """
+        Get the payload of an entry of the in-memory tier.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return None
+            expires, payload = entry
+            if expires > now:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return payload
+            del self._memory[key]
+            return None
+
+    def _get_disk(self, key: str):
+        """
+        Get the payload of an entry of the SQLite tier.
+
+        The tier is best effort: a database error counts as a miss.
+        """
+        now = time.time()
+        try:
+            with self._db_lock:
+                row = self._db.execute(
+                    "SELECT response, expires FROM completions WHERE key = ?",
+                    (key,),
+                ).fetchone()
+                if row is None or row[1] <= now:
+                    return None
+                with self._db:
+                    self._db.execute(
+                        "UPDATE completions SET last_access = ? WHERE key = ?",
+                        (now, key),
+                    )
+        except sqlite3.Error:
+            self.failures += 1
+            return None
+        with self._lock:
+            self._remember(key, row[1], row[0])
+            self.hits += 1
+            self.disk_hits += 1
+        return row[0]
+
+    def _decode(self, payload):
+        """
+        Decode a cached payload, counting a miss when there is none.
+        """
+        if payload is None:
+            with self._lock:
+                self.misses += 1
+            return None
+        return ChatCompletion.model_validate_json(payload)
+
+    def _prepare(self, key: str, completion: ChatCompletion):
+        """
+        Store a completion in the in-memory tier and return its row.
+        """
+        now = time.time()
+        expires = now + self.ttl
+        payload = completion.model_dump_json()
+        with self._lock:
+            self._remember(key, expires, payload)
+        return (key, payload, expires, now, len(payload))
+
+    def set(self, key: str, completion: ChatCompletion):
+        """
+        Store a completion in both tiers.
+        """
+        row = self._prepare(key, completion)
+        if self._db is not None:
+            self._set_disk(row)
+
+    async def aset(self, key: str, completion: ChatCompletion):
+        """
+        Store a completion in both tiers, writing SQLite in a thread.
+        """
+        row = self._prepare(key, completion)
+        if self._db is not None:
+            await asyncio.to_thread(self._set_disk, row)
+
+    def _set_disk(self, row: tuple):
+        """
+        Write an entry to the SQLite tier and evict over the cap.
+
+        The tier is best effort: a database error skips the write.
+        """
+        try:
+            with self._db_lock, self._db:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO completions "
+                    "(key, response, expires, last_access, size) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    row,
+                )
+                self._evict(row[3])
+        except sqlite3.Error:
+            self.failures += 1
+
+    def _remember(self, key: str, expires: float, payload: str):
+        """
+        Store an entry in the in-memory LRU tier.
+        """
+        self._memory[key] = (expires, payload)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _evict(self, now: float):
+        """
+        Drop expired entries and the least recently used ones over the cap.
+        """
+        self._db.execute("DELETE FROM completions WHERE expires <= ?", (now,))
+        total = self._db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM completions"
+        ).fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        rows = self._db.execute(
+            "SELECT key, size FROM completions ORDER BY last_access"
+        )
+        stale = []
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            stale.append((key,))
+            total -= size
+        self._db.executemany("DELETE FROM completions WHERE key = ?", stale)
+
+    def create(self, create, **params):
+        """
+        Serve a synchronous completion request through the cache.
+
+        Args:
+            create (callable): The client's ``chat.completions.create``.
+            **params: The request parameters.
+
+        Returns:
+            ChatCompletion: The cached or freshly requested completion.
+        """
+        if not self.enabled or not self.is_cacheable(params):
+            self.bypassed += 1
+            return create(**params)
+
+        key = self.make_key(params)
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+
+        completion = create(**params)
+        self.set(key, completion)
+        return completion
+
+    async def acreate(self, create, **params):
+        """
+        Serve an asynchronous completion request through the cache.
+
+        Args:
+            create (callable): The client's ``chat.completions.create``.
+            **params: The request parameters.
+
+        Returns:
+            ChatCompletion: The cached or freshly requested completion.
+        """
+        if not self.enabled or not self.is_cacheable(params):
+            self.bypassed += 1
+            return await create(**params)
+
+        key = self.make_key(params)
+        cached = await self.aget(key)
+        if cached is not None:
+            return cached
+
+        completion = await create(**params)
+        await self.aset(key, completion)
+        return completion
+
+    def stats(self):
+        """
+        Get the hit and miss counters.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "failures": self.failures,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "memory_entries": len(self._memory),
+        }
+
+
+# Define the completion cache shared by the main and expert clients.
+completion_cache = CompletionCache(
+    path=COMPLETION_CACHE_PATH,
+    memory_entries=COMPLETION_CACHE_MEMORY_ENTRIES,
+    ttl=COMPLETION_CACHE_TTL,
+    max_bytes=COMPLETION_CACHE_MAX_MB * 1024 * 1024,
+    enabled=COMPLETION_CACHE_ENABLED,
+)
@@ -0,0 +1,394 @@
+# !/usr/bin/env python
+# coding: utf-8
+# Filename: conversation_journal.py
+# Path: utils/conversation_journal.py
+
+"""
+
+Conversation Journal
+===============
+This module persists the conversation memory of a CLI session in an
+append-only journal, so a session can be resumed after a restart.
+
+
+Classes
+-------
+ConversationJournal
+    Append-only, length-prefixed journal of a conversation.
+
+"""
+import asyncio
+import json
+import mmap
+import os
+import struct
+
+from utils.conversation_memory import ConversationMemory, is_summary
+
+# First bytes of every journal file.
+JOURNAL_MAGIC = b"GPTALLJ1"
+
+# Length of a record payload, written before and after the payload.
+LENGTH = struct.Struct("<I")
+
+
+def encode_record(record: dict) -> bytes:
+    """
+    Frame a record as its length, its JSON payload and its length again.
+    """
+    payload = json.dumps(record, separators=(",", ":")).encode("utf-8")
+    length = LENGTH.pack(len(payload))
+    return length + payload + length
+
+
+class ConversationJournal:
+    """
+    Append-only, length-prefixed journal of a conversation.
+
+    Each record is a JSON payload framed by its length on both sides, so
+    the journal can be read forwards from the start and backwards from the
+    end. Message records carry a sequence number. When the memory compactor
+    folds old turns into a summary, a summary record is appended with the
+    sequence number of the first message it does not cover.
+
+    ``resume`` memory-maps the journal and reads only the pinned messages
+    at its start and, backwards from its end, the latest summary and at most
+    ``resume_messages`` newest messages, so resuming takes the same time
+    whatever the journal size. ``schedule`` encodes the messages appended
+    since the last turn and writes them in a background thread. Once the
+    journal grows past ``compact_bytes`` it is rewritten from the memory.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        compact_bytes: int = 8 * 1024 * 1024,
+        resume_messages: int = 200,
+    ):
+        self.path = path
+        self.compact_bytes = compact_bytes
+        self.resume_messages = resume_messages
+        self.size = 0
+        self.sequence = 0
+        self.resumed = 0
+        self.records_written = 0
+        self.compactions = 0
+        self.failures = 0
+        self._memory = None
+        self._synced = 0
+        self._summary = None
+        self._pending = []
+        self._task = None
+        self._compact_requested = False
+        self._compacted_size = 0
+
+    def resume(self, model: str) -> ConversationMemory:
+        """
+        Restore the conversation memory from the journal.
+
+        Args:
+            model (str): The model used to count tokens.
+
+        Returns:
+            ConversationMemory: The restored memory, empty when there is no
+            journal yet.
+        """
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        memory = ConversationMemory(model=model)
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            with open(self.path, "wb") as file:
+                file.write(JOURNAL_MAGIC)
+            self.size = len(JOURNAL_MAGIC)
+            self._attach(memory)
+            return memory
+
+        with open(self.path, "r+b") as file:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as view:
+                if view[:len(JOURNAL_MAGIC)] != JOURNAL_MAGIC:
+                    raise ValueError(f"{self.path} is not a conversation journal")
+                end = self._valid_end(view)
+                head, head_end = self._read_head(view, end)
+                summary, tail = self._read_tail(view, head_end, end, len(head))
+                last = self._last_sequence(view, head_end, end)
+            if end != os.path.getsize(self.path):
+                # Drop a record torn by an interrupted write.
+                file.truncate(end)
+
+        memory.extend(head)
+        if summary is not None:
+            memory.append(summary)
+        memory.extend(tail)
+        self.size = end
+        self.sequence = max(last + 1, len(head))
+        self.resumed = len(memory)
+        self._attach(memory)
+        return memory
+
+    def schedule(self, memory: ConversationMemory) -> int:
+        """
+        Write the messages appended to a memory since the last call.
+
+        The records are encoded right away and written by a background task,
+        which also compacts the journal once it is over ``compact_bytes``.
+
+        Args:
+            memory (ConversationMemory): The conversation memory.
+
+        Returns:
+            int: The number of records queued.
+        """
+        if memory is not self._memory:
+            # A new memory was started, every message in it is new.
+            self._memory = memory
+            self._synced = 0
+
+        fresh = min(memory.appended - self._synced, len(memory))
+        records = []
+        for message in memory[len(memory) - fresh:] if fresh else ():
+            records.append({"seq": self.sequence, "message": message})
+            self.sequence += 1
+        self._synced = memory.appended
+
+        summary = (
+            memory[memory.pinned]
+            if memory.evictable and is_summary(memory[memory.pinned])
+            else None
+        )
+        if summary is not None and summary != self._summary:
+            covered = self.sequence - (len(memory) - memory.pinned - 1)
+            records.append({"before": covered, "summary": summary})
+            self._summary = summary
+
+        if records:
+            self._pending.append(
+                (b"".join(map(encode_record, records)), len(records))
+            )
+        if self._pending and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._flush())
+        return len(records)
+
+    async def compact(self, memory: ConversationMemory):
+        """
+        Rewrite the journal with the messages of the memory only.
+        """
+        self.schedule(memory)
+        self._compact_requested = True
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._flush())
+        await self.drain()
+
+    async def drain(self):
+        """
+        Wait for the queued records to be written.
+        """
+        while self._task is not None and not self._task.done():
+            await self._task
+
+    async def _flush(self):
+        """
+        Write the queued records, then compact the journal if it is too big.
+        """
+        while True:
+            while self._pending:
+                data = b"".join(data for data, _ in self._pending)
+                count = sum(count for _, count in self._pending)
+                self._pending.clear()
+                try:
+                    await asyncio.to_thread(self._append, data)
+                except OSError:
+                    self.failures += 1
+                    return
+                self.records_written += count
+
+            if not self._compact_requested and not self._oversized():
+                return
+            self._compact_requested = False
+            data = self._snapshot()
+            try:
+                await asyncio.to_thread(self._replace, data)
+            except OSError:
+                self.failures += 1
+                return
+            self.compactions += 1
+
+    def _oversized(self) -> bool:
+        """
+        Check whether the journal grew past the compaction threshold.
+
+        The journal must also have doubled since it was last rewritten, so a
+        memory larger than the threshold is not rewritten on every turn.
+        """
+        return (
+            self.compact_bytes > 0
+            and self.size > self.compact_bytes
+            and self.size > 2 * self._compacted_size
+        )
+
+    def _attach(self, memory: ConversationMemory):
+        """
+        Mark the messages of a memory as already written.
+        """
+        self._memory = memory
+        self._synced = memory.appended
+        if memory.evictable and is_summary(memory[memory.pinned]):
+            self._summary = memory[memory.pinned]
+
+    def _append(self, data: bytes):
+        """
+        Append encoded records to the journal.
+        """
+        with open(self.path, "ab") as file:
+            file.write(data)
+            file.flush()
+        self.size += len(data)
+
+    def _snapshot(self) -> bytes:
+        """
+        Encode the written messages of the memory as a new journal.
+
+        Messages appended after the last ``schedule`` call are left out, they
+        are written by the next one.
+        """
+        memory = self._memory
+        unsynced = memory.appended - self._synced
+        messages = memory[:len(memory) - unsynced]
+        records = []
+        summary = None
+        for index, message in enumerate(messages):
+            if index == memory.pinned and is_summary(message):
+                summary = message
+                continue
+            records.append({"seq": len(records), "message": message})
+        if summary is not None:
+            records.append({"before": memory.pinned, "summary": summary})
+
+        self.sequence = len(records) - (summary is not None)
+        self._summary = summary
+        return JOURNAL_MAGIC + b"".join(map(encode_record, records))
+
+    def _replace(self, data: bytes):
+        """
+        Atomically replace the journal with new contents.
+        """
+        temporary = self.path + ".tmp"
+        with open(temporary, "wb") as file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary, self.path)
+        self.size = len(data)
+        self._compacted_size = len(data)
+
+    @staticmethod
+    def _valid_end(view) -> int:
+        """
+        Get the end of the last complete record.
+        """
+        end = len(view)
+        if end >= len(JOURNAL_MAGIC) + 2 * LENGTH.size:
+            (length,) = LENGTH.unpack_from(view, end - LENGTH.size)
+            start = end - 2 * LENGTH.size - length
+            if (
+                start >= len(JOURNAL_MAGIC)
+                and LENGTH.unpack_from(view, start)[0] == length
+            ):
+                return end
+        elif end == len(JOURNAL_MAGIC):
+            return end
+
+        # The last record is torn, find the end of the valid records.
+        offset = len(JOURNAL_MAGIC)
+        while offset + LENGTH.size <= end:
+            (length,) = LENGTH.unpack_from(view, offset)
+            stop = offset + 2 * LENGTH.size + length
+            if stop > end or LENGTH.unpack_from(view, stop - LENGTH.size)[0] != length:
+                break
+            offset = stop
+        return offset
+
+    @staticmethod
+    def _read_forward(view, offset: int):
+        """
+        Read the record at an offset and the offset of the next record.
+        """
+        (length,) = LENGTH.unpack_from(view, offset)
+        start = offset + LENGTH.size
+        record = json.loads(view[start:start + length])
+        return record, start + length + LENGTH.size
+
+    @staticmethod
+    def _read_backward(view, end: int):
+        """
+        Read the record ending at an offset and the offset where it starts.
+        """
+        (length,) = LENGTH.unpack_from(view, end - LENGTH.size)
+        start = end - LENGTH.size - length
+        record = json.loads(view[start:end - LENGTH.size])
+        return record, start - LENGTH.size
+
+    def _read_head(self, view, end: int):
+        """
+        Read the pinned system messages at the start of the journal.
+        """
+        head = []
+        offset = len(JOURNAL_MAGIC)
+        while offset < end:
+            record, next_offset = self._read_forward(view, offset)
+            message = record.get("message")
+            if (
+                message is None
+                or message.get("role") != "system"
+                or is_summary(message)
+            ):
+                break
+            head.append(message)
+            offset = next_offset
+        return head, offset
+
+    def _read_tail(self, view, start: int, end: int, pinned: int):
+        """
+        Read the latest summary and the newest messages it does not cover.
+        """
+        summary = None
+        covered = pinned
+        tail = []
+        offset = end
+        while offset > start and len(tail) < self.resume_messages:
+            record, offset = self._read_backward(view, offset)
+            if "summary" in record:
+                if summary is None:
+                    summary = record["summary"]
+                    covered = max(covered, record["before"])
+                continue
+            if record["seq"] < covered:
+                break
+            tail.append(record["message"])
+        tail.reverse()
+        return summary, tail
+
+    def _last_sequence(self, view, start: int, end: int) -> int:
+        """
+        Get the sequence number of the newest message record.
+        """
+        offset = end
+        while offset > start:
+            record, offset = self._read_backward(view, offset)
+            if "seq" in record:
+                return record["seq"]
+        return -1
+
+    def stats(self):
+        """
+        Get the journal counters.
+        """
+        return {
+            "path": self.path,
+            "bytes": self.size,
+            "resumed": self.resumed,
+            "records_written": self.records_written,
+            "compactions": self.compactions,
+            "failures": self.failures,
+        }
@@ -0,0 +1,299 @@
+# !/usr/bin/env python
+# coding: utf-8
+# Filename: conversation_memory.py
+# Path: utils/conversation_memory.py
+
+"""
+
+Conversation Memory
+===============
+This module contains the conversation memory used by the chat loop.
+
+
+Functions
+---------
+is_summary(message)
+    Check whether a message holds the summary of compacted turns.
+
+
+Classes
+-------
+MessageRecord
+    Compact record of a stored message.
+ConversationMemory
+    Conversation messages with cached sizes and O(1) eviction.
+
+"""
+import json
+import sys
+from collections import deque
+from itertools import islice
+
+from utils.token_tools import count_tokens
+
+# Prefix of the message holding the summary of the compacted turns.
+SUMMARY_PREFIX = "Summary of the earlier conversation:"
+
+
+def is_summary(message: dict) -> bool:
+    """
+    Check whether a message holds the summary of compacted turns.
+    """
+    content = message.get("content")
+    return (
+        message.get("role") == "system"
+        and isinstance(content, str)
+        and content.startswith(SUMMARY_PREFIX)
+    )
+
+
+class MessageRecord:
+    """
+    Compact record of a stored message.
+
+    The role is interned, keys other than ``role`` and ``content`` are kept
+    in ``extra``, and the token count and serialized size are computed once.
+    ``vector`` is filled in by the memory retriever the first time the
+    record is indexed.
+    """
+
+    __slots__ = ("role", "content", "extra", "tokens", "size", "vector")
+
+    def __init__(self, message: dict, model: str):
+        self.role = sys.intern(message.get("role", ""))
+        self.content = message.get("content")
+        extra = {
+            key: value for key, value in message.items()
+            if key not in ("role", "content")
+        }
+        self.extra = extra or None
+        self.tokens = (
+            count_tokens(self.content + "\n", model)
+            if isinstance(self.content, str) else 0
+        )
+        self.size = len(json.dumps(message))
+        self.vector = None
+
+    def to_message(self) -> dict:
+        """
+        Rebuild the message dictionary.
+        """
+        message = {"role": self.role, "content": self.content}
+        if self.extra:
+            message.update(self.extra)
+        return message
+
+
+class ConversationMemory:
+    """
+    Conversation memory with incremental size accounting.
+
+    Messages are stored as slotted records in a deque. The token count and
+    serialized size of each message are computed once when it is appended,
+    and running totals are kept so trimming the memory to a token or size
+    limit never re-encodes the conversation.
+
+    The leading system messages are pinned and never evicted. A summary of
+    compacted turns is kept right after them, see ``replace_span``.
+    """
+
+    def __init__(self, messages=(), model: str = "gpt-4"):
+        self.model = model
+        self.total_tokens = 0
+        self.total_bytes = 0
+        self.pinned = 0
+        self.summarized = 0
+        self.appended = 0
+        self._records = deque()
+        self.extend(messages)
+
+    @classmethod
+    def wrap(cls, memory, model: str):
+        """
+        Get a ConversationMemory for the given memory.
+
+        Args:
+            memory (ConversationMemory | list): The conversation memory.
+            model (str): The model used to count tokens.
+
+        Returns:
+            ConversationMemory: The memory itself, or a new memory holding
+            the messages of the given list.
+        """
+        if isinstance(memory, cls):
+            return memory
+        return cls(memory, model=model)
+
+    def append(self, message: dict):
+        """
+        Append a message and account for its tokens and size.
+        """
+        record = MessageRecord(message, self.model)
+        if (
+            self.pinned == len(self._records)
+            and record.role == "system"
+            and not is_summary(message)
+        ):
+            self.pinned += 1
+        self._records.append(record)
+        self.total_tokens += record.tokens
+        self.total_bytes += record.size
+        self.appended += 1
+
+    def extend(self, messages):
+        """
+        Append several messages.
+        """
+        for message in messages:
+            self.append(message)
+
+    def popleft(self) -> dict:
+        """
+        Evict the oldest message that is not pinned.
+        """
+        if len(self._records) <= self.pinned:
+            raise IndexError("only pinned messages are left")
+        if self.pinned == 0:
+            record = self._records.popleft()
+        else:
+            record = self._records[self.pinned]
+            del self._records[self.pinned]
+        self.total_tokens -= record.tokens
+        self.total_bytes -= record.size
+        return record.to_message()
+
+    @property
+    def evictable(self) -> int:
+        """
+        Get the number of messages that are not pinned.
+        """
+        return len(self._records) - self.pinned
+
+    @property
+    def serialized_size(self) -> int:
+        """
+        Get the length of ``json.dumps`` of the message list.
+        """
+        count = len(self._records)
+        return self.total_bytes + 2 + max(0, count - 1) * 2
+
+    def trim(self, limit: int, keep: int = 1) -> int:
+        """
+        Evict the oldest messages until the memory fits the token limit.
+
+        Args:
+            limit (int): The token limit.
+            keep (int): The minimum number of unpinned messages to keep.
+
+        Returns:
+            int: The number of evicted messages.
+        """
+        evicted = 0
+        while self.total_tokens > limit and self.evictable > keep:
+            self.popleft()
+            evicted += 1
+        return evicted
+
+    def trim_size(self, limit: int, keep: int = 1) -> int:
+        """
+        Evict the oldest messages until the serialized memory fits the limit.
+
+        Args:
+            limit (int): The size limit, in characters of serialized JSON.
+            keep (int): The minimum number of unpinned messages to keep.
+
+        Returns:
+            int: The number of evicted messages.
+        """
+        evicted = 0
+        while self.serialized_size > limit and self.evictable > keep:
+            self.popleft()
+            evicted += 1
+        return evicted
+
+    def replace_span(self, span: list[dict], message: dict) -> bool:
+        """
+        Replace the oldest unpinned messages with a single message.
+
+        The span is only replaced when the memory still starts with the same
+        messages after the pinned messages, so a compaction computed in the
+        background is dropped if the memory changed meanwhile.
+
+        Args:
+            span (list): The oldest unpinned messages, as read before.
+            message (dict): The message replacing them.
+
+        Returns:
+            bool: Whether the span was replaced.
+        """
+        start = self.pinned
+        stop = start + len(span)
+        current = islice(self._records, start, stop)
+        if len(span) > self.evictable or any(
+            record.to_message() != old for record, old in zip(current, span)
+        ):
+            return False
+
+        record = MessageRecord(message, self.model)
+        records = list(self._records)
+        for old in records[start:stop]:
+            self.total_tokens -= old.tokens
+            self.total_bytes -= old.size
+        self.total_tokens += record.tokens
+        self.total_bytes += record.size
+        self.summarized += sum(1 for old in span if not is_summary(old))
+        records[start:stop] = [record]
+        self._records = deque(records)
+        return True
+
+    def window(self, size: int) -> list[dict]:
+        """
+        Get the pinned messages followed by the newest messages.
+
+        Args:
+            size (int): The maximum number of messages.
+
+        Returns:
+            list: At most ``size`` messages, always including the pinned
+            messages.
+        """
+        recent = max(0, min(size - self.pinned, self.evictable))
+        records = list(islice(self._records, 0, self.pinned))
+        records.extend(
+            islice(self._records, len(self._records) - recent, None)
+        )
+        return [record.to_message() for record in records]
+
+    def records(self) -> list[MessageRecord]:
+        """
+        Get the stored records, oldest first.
+        """
+        return list(self._records)
+
+    def token_counts(self):
+        """
+        Get the cached token count of each message.
+        """
+        return (record.tokens for record in self._records)
+
+    def to_list(self) -> list[dict]:
+        """
+        Get the messages as a list.
+        """
+        return [record.to_message() for record in self._records]
+
+    def __len__(self):
+        return len(self._records)
+
+    def __iter__(self):
+        return (record.to_message() for record in self._records)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self._records))
+            if step < 0:
+                records = list(self._records)[index]
+            else:
+                records = islice(self._records, start, stop, step)
+            return [record.to_message() for record in records]
+        return self._records[index].to_message()
@@ -0,0 +1,331 @@
+# !/usr/bin/env python
+# coding: utf-8
+# Filename: expert_router.py
+# Path: utils/expert_router.py
+
+"""
+
+Expert Router
+===============
+This module sends expert requests to the fastest healthy model among the
+interchangeable expert backends.
+
+
+Classes
+-------
+ExpertBackend
+    An expert model with its call functions and live health scores.
+ExpertRouter
+    Route expert requests by latency, error rate and context size.
+
+"""
+import asyncio
+import time
+
+from config import (
+    OPENAI_MODEL,
+    EXPERT_EWMA_ALPHA,
+    EXPERT_MAX_ATTEMPTS,
+    EXPERT_MAX_ERROR_RATE,
+    EXPERT_PROBE_INTERVAL,
+)
+from utils.circuit_breaker import CircuitOpenError
+from utils.token_tools import count_tokens
+
+# Reply used when every backend failed.
+NO_CONTENT_REPLY = "An error occurred or no content was returned."
+
+
+class ExpertBackend:
+    """
+    An expert model with its call functions and live health scores.
+
+    ``call`` and ``acall`` take the question, the text and the sampling
+    parameters and return the reply, or ``None`` when no content was
+    returned. The latency and error rate are exponentially weighted moving
+    averages of the recent calls. ``probing`` is set while a probe call of
+    an unhealthy backend is planned or running.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        provider: str,
+        context_window: int,
+        call=None,
+        acall=None,
+    ):
+        self.name = name
+        self.provider = provider
+        self.context_window = context_window
+        self.call = call
+        self.acall = acall
+        self.latency = None
+        self.error_rate = 0.0
+        self.in_flight = 0
+        self.calls = 0
+        self.failures = 0
+        self.rejected = 0
+        self.last_failure = 0.0
+        self.probing = False
+
+    def record(self, seconds: float, ok: bool, alpha: float):
+        """
+        Update the moving averages with the outcome of a call.
+        """
+        self.calls += 1
+        self.error_rate += alpha * ((0.0 if ok else 1.0) - self.error_rate)
+        if ok:
+            self.latency = (
+                seconds if self.latency is None
+                else self.latency + alpha * (seconds - self.latency)
+            )
+        else:
+            self.failures += 1
+            self.last_failure = time.monotonic()
+
+    def score(self) -> float:
+        """
+        Get the expected latency of a call, lower is better.
+
+        Untried backends score zero so each one is measured once. The
+        latency is divided by the success rate, to account for retries, and
+        scaled by the calls already in flight.
+        """
+        if self.latency is None:
+            return 0.0
+        success = max(0.05, 1.0 - self.error_rate)
+        return self.latency / success * (1 + self.in_flight)
+
+
+class ExpertRouter:
+    """
+    Route expert requests by latency, error rate and context size.
+
+    A request goes to the backend with the lowest score among those whose
+    context window fits the prompt and ``max_tokens``. Backends with an
+    error rate over ``max_error_rate`` are skipped, except for a single
+    probe call at a time once ``probe_interval`` seconds passed since their
+    last failure, so a recovered backend is noticed.
+    A failed call is retried on the next backend, up to ``max_attempts``.
+    A call rejected by the circuit breaker of a backend goes to the next
+    backend without counting as a failure or as the probe of the backend.
+    """
+
+    def __init__(
+        self,
+        alpha: float = 0.3,
+        max_error_rate: float = 0.5,
+        probe_interval: float = 30.0,
+        max_attempts: int = 2,
+        model: str = "gpt-4",
+    ):
+        self.alpha = alpha
+        self.max_error_rate = max_error_rate
+        self.probe_interval = probe_interval
+        self.max_attempts = max(1, max_attempts)
+        self.model = model
+        self.backends = {}
+        self.requests = 0
+        self.too_large = 0
+
+    def register(self, backend: ExpertBackend):
+        """
+        Register an expert backend, replacing one with the same name.
+        """
+        existing = self.backends.get(backend.name)
+        if existing is not None:
+            backend.latency = existing.latency
+            backend.error_rate = existing.error_rate
+        self.backends[backend.name] = backend
+
+    def is_healthy(self, backend: ExpertBackend, now: float) -> bool:
+        """
+        Check whether a backend may receive a request.
+        """
+        return backend.error_rate <= self.max_error_rate or (
+            not backend.probing
+            and now - backend.last_failure >= self.probe_interval
+        )
+
+    def candidates(self, tokens: int, asynchronous: bool) -> list:
+        """
+        Get the backends fitting a request, best first.
+
+        Args:
+            tokens (int): The prompt tokens plus the completion tokens.
+            asynchronous (bool): Whether the request is awaited.
+
+        Returns:
+            list: The healthy backends, or every fitting backend when none
+            is healthy.
+        """
+        fitting = [
+            backend for backend in self.backends.values()
+            if backend.context_window >= tokens
+            and (backend.acall if asynchronous else backend.call) is not None
+        ]
+        now = time.monotonic()
+        healthy = [
+            backend for backend in fitting if self.is_healthy(backend, now)
+        ]
+        return sorted(healthy or fitting, key=ExpertBackend.score)
+
+    def _plan(self, question: str, text: str, max_tokens: int, asynchronous: bool):
+        """
+        Count a request and select the backends to try.
+
+        The unhealthy backends selected are marked ``probing`` until the
+        request ends, so concurrent requests do not probe them as well.
+
+        Returns:
+            tuple: The backends to try and the backends it probes.
+        """
+        self.requests += 1
+        tokens = (
+            count_tokens(question, self.model)
+            + count_tokens(text, self.model)
+            + max_tokens
+        )
+        backends = self.candidates(tokens, asynchronous)
+        if not backends:
+            self.too_large += 1
+        backends = backends[:self.max_attempts]
+        probes = [
+            backend for backend in backends
+            if backend.error_rate > self.max_error_rate
+            and not backend.probing
+        ]
+        for backend in probes:
+            backend.probing = True
+        return backends, probes
+
+    @staticmethod
+    def _reject(backend: ExpertBackend, probes: list):
+        """
+        Count a call the breaker of a backend rejected without calling it.
+        """
+        backend.rejected += 1
+        if backend in probes:
+            backend.probing = False
+
+    def ask(self, question: str, text: str = "", max_tokens: int = 2048, **params) -> str:
+        """
+        Send an expert request and wait for the reply.
+
+        Args:
+            question (str): The question.
+            text (str): The text the question is about.
+            max_tokens (int): The completion tokens.
+            **params: The sampling parameters.
+
+        Returns:
+            str: The reply.
+        """
+        backends, probes = self._plan(question, text, max_tokens, False)
+        try:
+            for backend in backends:
+                backend.in_flight += 1
+                started = time.perf_counter()
+                try:
+                    reply = backend.call(
+                        question, text, max_tokens=max_tokens, **params
+                    )
+                except CircuitOpenError:
+                    self._reject(backend, probes)
+                    continue
+                except Exception:  # pylint: disable=broad-except
+                    reply = None
+                finally:
+                    backend.in_flight -= 1
+                backend.record(
+                    time.perf_counter() - started, bool(reply), self.alpha
+                )
+                if reply:
+                    return reply
+            return NO_CONTENT_REPLY
+        finally:
+            for backend in probes:
+                backend.probing = False
+
+    async def aask(
+        self, question: str, text: str = "", max_tokens: int = 2048, **params
+    ) -> str:
+        """
+        Send an expert request and await the reply.
+
+        Args:
+            question (str): The question.
+            text (str): The text the question is about.
+            max_tokens (int): The completion tokens.
+            **params: The sampling parameters.
+
+        Returns:
+            str: The reply.
+        """
+        backends, probes = self._plan(question, text, max_tokens, True)
+        try:
+            for backend in backends:
+                backend.in_flight += 1
+                started = time.perf_counter()
+                try:
+                    reply = await backend.acall(
+                        question, text, max_tokens=max_tokens, **params
+                    )
+                except asyncio.CancelledError:
+                    raise
+                except CircuitOpenError:
+                    self._reject(backend, probes)
+                    continue
+                except Exception:  # pylint: disable=broad-except
+                    reply = None
+                finally:
+                    backend.in_flight -= 1
+                backend.record(
+                    time.perf_counter() - started, bool(reply), self.alpha
+                )
+                if reply:
+                    return reply
+            return NO_CONTENT_REPLY
+        finally:
+            for backend in probes:
+                backend.probing = False
+
+    def stats(self):
+        """
+        Get the live scores of the backends.
+        """
+        now = time.monotonic()
+        return {
+            "requests": self.requests,
+            "too_large": self.too_large,
+            "backends": {
+                name: {
+                    "provider": backend.provider,
+                    "context_window": backend.context_window,
+                    "latency_ms": (
+                        round(backend.latency * 1000, 1)
+                        if backend.latency is not None else None
+                    ),
+                    "error_rate": round(backend.error_rate, 3),
+                    "score": round(backend.score(), 3),
+                    "healthy": self.is_healthy(backend, now),
+                    "probing": backend.probing,
+                    "in_flight": backend.in_flight,
+                    "calls": backend.calls,
+                    "failures": backend.failures,
+                    "rejected": backend.rejected,
+                }
+                for name, backend in self.backends.items()
+            },
+        }
+
+
+# Define the expert router shared by the expert tools.
+expert_router = ExpertRouter(
+    alpha=EXPERT_EWMA_ALPHA,
+    max_error_rate=EXPERT_MAX_ERROR_RATE,
+    probe_interval=EXPERT_PROBE_INTERVAL,
+    max_attempts=EXPERT_MAX_ATTEMPTS,
+    model=OPENAI_MODEL,
+)
@@ -0,0 +1,356 @@
+# !/usr/bin/env python
+# coding: utf-8
+# Filename: fast_path.py
+# Path: utils/fast_path.py
+
+"""
+
+Fast Path
+===============
+This module answers trivial requests with a local function, without a
+round trip to the model.
+
+Each intent names the tool answering it, the patterns recognizing it and
+example requests for the classifier, for example::
+
+    "current_time": {
+        "tool": "get_current_date_time",
+        "patterns": [r"what time is it( now)?"],
+        "examples": ["what time is it", "tell me the time"],
+    }
+
+``patterns`` must match the whole normalized request. ``format`` may be a
+callable building the answer from the tool result and the enabled tools.
+
+
+Functions
+---------
+normalize_request(text)
+    Lowercase a request and strip its trailing punctuation.
+
+
+Classes
+-------
+FastPathAnswer
+    A request answered by the fast path.
+FastPathRouter
+    Route trivial requests to local functions.
+
+"""
+import inspect
+import json
+import math
+import re
+import time
+from collections import Counter
+
+from rich.console import Console
+
+from utils.tool_selector import tokenize
+
+console = Console()
+
+
+def format_tool_list(result, tools) -> str:
+    """
+    Format the names and descriptions of the enabled tools.
+    """
+    lines = ["Available tools:"]
+    for tool in tools:
+        function = tool["function"]
+        lines.append(
+            f"- {function['name']}: "
+            f"{function.get('description', 'No description available.')}"
+        )
+    return "\n".join(lines)
+
+
+INTENTS = {
+    "current_time": {
+        "tool": "get_current_date_time",
+        "patterns": [
+            r"what(?:'s| is)? (?:the )?(?:current )?(?:time|date)(?: (?:is it|now|today|right now))?",
+            r"what (?:time|day|date) is it(?: (?:now|today|right now))?",
+            r"what(?:'s| is) today'?s date",
+            r"(?:tell me )?the (?:current )?(?:time|date)",
+        ],
+        "examples": [
+            "what time is it",
+            "what is the current time",
+            "what is the date today",
+            "what day is it today",
+            "tell me the time",
+        ],
+    },
+    "list_tools": {
+        "tool": None,
+        "format": format_tool_list,
+        "patterns": [
+            r"(?:list|show)(?: me)? (?:my |your |the |all )*(?:available )?tools",
+            r"what tools (?:do you have|are available|can you use)",
+        ],
+        "examples": [
+            "list my tools",
+            "show available tools",
+            "what tools do you have",
+            "which tools can you use",
+        ],
+    },
+    "next_event": {
+        "tool": "get_next_calendar_event",
+        "patterns": [
+            r"what(?:'s| is) (?:my )?next (?:event|meeting|appointment)",
+            r"when is my next (?:event|meeting|appointment)",
+        ],
+        "examples": [
+            "what is my next event",
+            "when is my next meeting",
+            "next calendar event",
+            "what is my next appointment",
+        ],
+    },
+}
+
+
+def normalize_request(text: str) -> str:
+    """
+    Lowercase a request, collapse its spaces and strip trailing punctuation.
+    """
+    text = " ".join(text.lower().replace("’", "'").split())
+    return text.rstrip("?.! ")
+
+
+def term_vector(text: str) -> Counter:
+    """
+    Count the search terms of a text, ignoring one letter terms.
+    """
+    return Counter(term for term in tokenize(text) if len(term) > 1)
+
+
+def cosine(left: Counter, right: Counter) -> float:
+    """
+    Get the cosine similarity of two term vectors.
+    """
+    if not left or not right:
+        return 0.0
+    dot = sum(count * right[term] for term, count in left.items())
+    norm = math.sqrt(sum(c * c for c in left.values())) * math.sqrt(
+        sum(c * c for c in right.values())
+    )
+    return dot / norm
+
+
+class FastPathAnswer:
+    """
+    A request answered by the fast path.
+    """
+
+    __slots__ = ("intent", "text", "confidence", "latency")
+
+    def __init__(self, intent: str, text: str, confidence: float, latency: float):
+        self.intent = intent
+        self.text = text
+        self.confidence = confidence
+        self.latency = latency
+
+
+class FastPathRouter:
+    """
+    Route trivial requests to local functions.
+
+    A request matching an intent pattern is routed with full confidence.
+    Otherwise a classifier compares its terms with the intent examples and
+    routes it when the best cosine similarity reaches ``min_confidence``
+    and every term of the request appears in the examples of the intent, so
+    a qualifier the intent cannot handle ("on friday", "for email") takes
+    the full pipeline.
+    Requests longer than ``max_terms`` terms, or whose intent tool is not
+    enabled, always take the full pipeline. Unknown intent names are
+    skipped with a warning.
+
+    The latency of the full pipeline is recorded with ``record_pipeline``
+    to estimate the time saved by each routed request. Intent tools are run
+    by ``executor`` when one is given.
+    """
+
+    def __init__(
+        self,
+        intents=None,
+        min_confidence: float = 0.8,
+        max_terms: int = 6,
+        enabled: bool = True,
+        executor=None,
+    ):
+        self.enabled = enabled
+        self.executor = executor
+        self.min_confidence = min_confidence
+        self.max_terms = max_terms
+        self.intents = {}
+        self.requests = 0
+        self.routed = 0
+        self.low_confidence = 0
+        self.errors = 0
+        self.fast_time = 0.0
+        self.pipeline_turns = 0
+        self.pipeline_time = 0.0
+        self.counters = {}
+        for name in intents if intents is not None else INTENTS:
+            if name not in INTENTS:
+                console.print(
+                    f"Unknown fast path intent {name!r} skipped, expected "
+                    f"one of {', '.join(INTENTS)}.",
+                    style="yellow",
+                )
+                continue
+            self.register(name, INTENTS[name])
+
+    def register(self, name: str, intent: dict):
+        """
+        Register an intent.
+
+        Args:
+            name (str): The intent name.
+            intent (dict): The tool, patterns, examples and formatter.
+        """
+        self.intents[name] = {
+            "tool": intent.get("tool"),
+            "format": intent.get("format"),
+            "patterns": [
+                re.compile(pattern) for pattern in intent.get("patterns", ())
+            ],
+            "examples": [
+                term_vector(example) for example in intent.get("examples", ())
+            ],
+        }
+        self.intents[name]["vocabulary"] = set().union(
+            *self.intents[name]["examples"]
+        )
+        self.counters.setdefault(name, 0)
+
+    def classify(self, user_input: str, enabled=None):
+        """
+        Find the intent of a request.
+
+        Args:
+            user_input (str): The user input.
+            enabled (set): The names of the enabled tools.
+
+        Returns:
+            tuple: The intent name and the confidence, or ``(None, score)``
+            when no intent is recognized.
+        """
+        text = normalize_request(user_input)
+        terms = term_vector(text)
+        if not terms or sum(terms.values()) > self.max_terms:
+            return None, 0.0
+
+        best, best_score = None, 0.0
+        for name, intent in self.intents.items():
+            if (
+                intent["tool"] is not None
+                and enabled is not None
+                and intent["tool"] not in enabled
+            ):
+                continue
+            if any(pattern.fullmatch(text) for pattern in intent["patterns"]):
+                return name, 1.0
+            if not terms.keys() <= intent["vocabulary"]:
+                continue
+            score = max(
+                (cosine(terms, example) for example in intent["examples"]),
+                default=0.0,
+            )
+            if score > best_score:
+                best, best_score = name, score
+
+        if best_score >= self.min_confidence:
+            return best, best_score
+        return None, best_score
+
+    async def route(self, user_input: str, tools: list, available_functions: dict):
+        """
+        Answer a request locally when its intent is recognized.
+
+        Args:
+            user_input (str): The user input.
+            tools (list): The enabled tool schemas.
+            available_functions (dict): The functions keyed by tool name.
+
+        Returns:
+            FastPathAnswer: The answer, or ``None`` to take the full
+            pipeline.
+        """
+        if not self.enabled or not self.intents:
+            return None
+
+        started = time.perf_counter()
+        self.requests += 1
+        enabled = {
+            tool["function"]["name"] for tool in tools
+            if tool["function"]["name"] in available_functions
+        }
+        name, confidence = self.classify(user_input, enabled)
+        if name is None:
+            if confidence > 0:
+                self.low_confidence += 1
+            return None
+
+        intent = self.intents[name]
+        result = None
+        try:
+            if intent["tool"] is not None:
+                function = available_functions[intent["tool"]]
+                if self.executor is not None:
+                    result = await self.executor.run(
+                        intent["tool"], function, {}
+                    )
+                else:
+                    result = function()
+                    if inspect.isawaitable(result):
+                        result = await result
+            if intent["format"] is not None:
+                text = intent["format"](result, tools)
+            elif isinstance(result, str):
+                text = result
+            else:
+                text = json.dumps(result)
+        # A failing local function falls back to the full pipeline.
+        except Exception:  # pylint: disable=broad-except
+            self.errors += 1
+            return None
+
+        latency = time.perf_counter() - started
+        self.routed += 1
+        self.fast_time += latency
+        self.counters[name] += 1
+        return FastPathAnswer(name, text, confidence, latency)
+
+    def record_pipeline(self, seconds: float):
+        """
+        Record the latency of a request answered by the full pipeline.
+        """
+        self.pipeline_turns += 1
+        self.pipeline_time += seconds
+
+    def stats(self):
+        """
+        Get the routing counters and the estimated latency saved.
+        """
+        average_fast = self.fast_time / self.routed if self.routed else 0.0
+        average_pipeline = (
+            self.pipeline_time / self.pipeline_turns
+            if self.pipeline_turns else 0.0
+        )
+        return {
+            "requests": self.requests,
+            "routed": self.routed,
+            "hit_rate": self.routed / self.requests if self.requests else 0,
+            "low_confidence": self.low_confidence,
+            "errors": self.errors,
+            "intents": dict(self.counters),
+            "average_fast_ms": round(average_fast * 1000, 3),
+            "average_pipeline_ms": round(average_pipeline * 1000, 3),
+            "estimated_saved_s": round(
+                max(0.0, average_pipeline - average_fast) * self.routed, 3
+            ),
+        }
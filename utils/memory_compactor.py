@@ -0,0 +1,224 @@
+# !/usr/bin/env python
+# coding: utf-8
+# Filename: memory_compactor.py
+# Path: utils/memory_compactor.py
+
+"""
+
+Memory Compactor
+===============
+This module summarizes the oldest turns of a conversation in the background.
+
+
+Classes
+-------
+MemoryCompactor
+    Fold the oldest conversation turns into a single summary message.
+
+"""
+import asyncio
+import time
+
+from utils.circuit_breaker import CircuitOpenError
+from utils.conversation_memory import SUMMARY_PREFIX, is_summary
+from utils.request_sizer import context_window
+
+SUMMARY_INSTRUCTIONS = (
+    "You maintain the running summary of a conversation between a user and "
+    "an assistant. Merge the previous summary and the new messages into one "
+    "concise summary. Keep names, dates, numbers, decisions, open tasks and "
+    "user preferences. Reply with the summary only."
+)
+
+# Share of the summary model's context window a span may fill, leaving room
+# for the instructions and the role of each message.
+SPAN_WINDOW_RATIO = 0.75
+
+
+class MemoryCompactor:
+    """
+    Fold the oldest conversation turns into a single summary message.
+
+    Once a memory holds more than ``budget`` tokens, a background task
+    summarizes the previous summary and the oldest turns, so the memory
+    drops to ``target_ratio`` of the budget. The system prompt stays pinned
+    and the ``keep_recent`` newest messages are never summarized. Only one
+    compaction runs per memory at a time.
+
+    ``create`` sends the summary request with the chat completion
+    parameters, so the application can guard and size it like its other
+    requests. A span is kept small enough for the context window of the
+    summary model, and a request rejected by an open circuit breaker is
+    counted as ``rejected``.
+    """
+
+    def __init__(
+        self,
+        create,
+        model: str,
+        budget: int = 8000,
+        target_ratio: float = 0.6,
+        keep_recent: int = 6,
+        max_tokens: int = 512,
+    ):
+        self.create = create
+        self.model = model
+        self.budget = budget
+        self.target_ratio = target_ratio
+        self.keep_recent = keep_recent
+        self.max_tokens = max_tokens
+        self.span_limit = (
+            int(context_window(model) * SPAN_WINDOW_RATIO) - max_tokens
+        )
+        self.compactions = 0
+        self.discarded = 0
+        self.failures = 0
+        self.rejected = 0
+        self.summary_time = 0.0
+        self._tasks = {}
+
+    def needs_compaction(self, memory) -> bool:
+        """
+        Check whether a memory is over the token budget.
+        """
+        return self.budget > 0 and memory.total_tokens > self.budget
+
+    def schedule(self, memory) -> bool:
+        """
+        Start compacting a memory in the background if it is over budget.
+
+        Args:
+            memory (ConversationMemory): The conversation memory.
+
+        Returns:
+            bool: Whether a compaction task was started.
+        """
+        if id(memory) in self._tasks or not self.needs_compaction(memory):
+            return False
+
+        task = asyncio.create_task(self.compact(memory))
+        self._tasks[id(memory)] = task
+        task.add_done_callback(lambda _: self._tasks.pop(id(memory), None))
+        return True
+
+    def select_span(self, memory) -> list[dict]:
+        """
+        Select the oldest unpinned messages to summarize.
+
+        The span starts with the previous summary, if any, and grows until
+        the memory would fit the target or the span would not fit the
+        summary model. It never ends on a message followed by a tool
+        result, so tool calls are not split from their results.
+        """
+        messages = memory[memory.pinned:]
+        counts = list(memory.token_counts())[memory.pinned:]
+        target = self.budget * self.target_ratio
+        limit = len(messages) - self.keep_recent
+
+        span_end = 0
+        freed = 0
+        while (
+            span_end < limit
+            and memory.total_tokens - freed > target
+            and (span_end == 0 or freed + counts[span_end] <= self.span_limit)
+        ):
+            freed += counts[span_end]
+            span_end += 1
+        while span_end < len(messages) and messages[span_end].get("role") == "tool":
+            span_end += 1
+
+        span = messages[:span_end]
+        if not any(not is_summary(message) for message in span):
+            return []
+        return span
+
+    async def compact(self, memory) -> bool:
+        """
+        Summarize the oldest turns of a memory into one message.
+
+        Args:
+            memory (ConversationMemory): The conversation memory.
+
+        Returns:
+            bool: Whether the memory was compacted.
+        """
+        span = self.select_span(memory)
+        if not span:
+            return False
+
+        started = time.perf_counter()
+        try:
+            summary = await self.summarize(span)
+        except CircuitOpenError:
+            self.rejected += 1
+            return False
+        except Exception:  # pylint: disable=broad-except
+            self.failures += 1
+            return False
+        finally:
+            self.summary_time += time.perf_counter() - started
+
+        if not summary:
+            self.failures += 1
+            return False
+
+        message = {"role": "system", "content": f"{SUMMARY_PREFIX}\n{summary}"}
+        if not memory.replace_span(span, message):
+            self.discarded += 1
+            return False
+
+        self.compactions += 1
+        return True
+
+    async def summarize(self, span: list[dict]) -> str:
+        """
+        Summarize a span of messages, merging any previous summary.
+        """
+        previous = ""
+        lines = []
+        for message in span:
+            content = message.get("content")
+            if not content:
+                continue
+            if is_summary(message):
+                previous = content[len(SUMMARY_PREFIX):].strip()
+            else:
+                lines.append(f"{message.get('role')}: {content}")
+
+        response = await self.create(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": SUMMARY_INSTRUCTIONS},
+                {
+                    "role": "user",
+                    "content": (
+                        f"Previous summary:\n{previous or '(none)'}\n\n"
+                        "New messages:\n" + "\n".join(lines)
+                    ),
+                },
+            ],
+            temperature=0,
+            max_tokens=self.max_tokens,
+        )
+        return (response.choices[0].message.content or "").strip()
+
+    async def drain(self):
+        """
+        Wait for the running compactions to finish.
+        """
+        if self._tasks:
+            await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+
+    def stats(self):
+        """
+        Get the compaction counters.
+        """
+        return {
+            "budget": self.budget,
+            "compactions": self.compactions,
+            "discarded": self.discarded,
+            "failures": self.failures,
+            "rejected": self.rejected,
+            "running": len(self._tasks),
+            "summary_time": round(self.summary_time, 3),
+        }
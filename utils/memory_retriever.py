@@ -0,0 +1,191 @@
+# !/usr/bin/env python
+# coding: utf-8
+# Filename: memory_retriever.py
+# Path: utils/memory_retriever.py
+
+"""
+
+Memory Retriever
+===============
+This module selects the messages of the conversation memory sent with a
+request: the pinned messages, a window of recent messages and the older
+turns most relevant to the user input, within a token budget.
+
+
+Functions
+---------
+hash_vectors(texts, dim)
+    Embed texts as normalized hashed bag-of-words vectors.
+
+
+Classes
+-------
+MemoryRetriever
+    Local cosine similarity index over the conversation memory.
+
+"""
+import math
+import zlib
+from collections import Counter
+
+import numpy as np
+
+from utils.conversation_memory import is_summary
+from utils.tool_selector import tokenize
+
+
+def hash_vectors(texts: list[str], dim: int = 1024) -> np.ndarray:
+    """
+    Embed texts as normalized hashed bag-of-words vectors.
+
+    Each term is hashed to a column and a sign with CRC32, so the vectors
+    are stable across processes, and weighted by ``1 + log(tf)`` so long
+    messages are not dominated by their most repeated words.
+
+    Args:
+        texts (list): The texts to embed.
+        dim (int): The number of columns.
+
+    Returns:
+        np.ndarray: One L2-normalized ``float32`` row per text.
+    """
+    vectors = np.zeros((len(texts), dim), dtype=np.float32)
+    for row, text in enumerate(texts):
+        for term, frequency in Counter(tokenize(text)).items():
+            digest = zlib.crc32(term.encode("utf-8"))
+            sign = 1.0 if digest & 0x80000000 else -1.0
+            vectors[row, digest % dim] += sign * (1.0 + math.log(frequency))
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    np.divide(vectors, norms, out=vectors, where=norms > 0)
+    return vectors
+
+
+class MemoryRetriever:
+    """
+    Local cosine similarity index over the conversation memory.
+
+    Every message is embedded once, the first time it is seen, and the
+    vector is kept on its record, so the index grows with the memory and
+    evicted or summarized messages leave it with their records. ``embed``
+    may be any callable mapping a list of texts to a matrix of normalized
+    rows, such as a local embedding model; hashed bag-of-words vectors are
+    used by default.
+
+    ``select`` always sends the pinned messages, the summary of compacted
+    turns and the ``recent`` newest messages. Older turns, a user message
+    and the replies following it, are ranked by their best cosine
+    similarity to the user input and added while they fit the ``budget``.
+    """
+
+    def __init__(
+        self,
+        budget: int = 6000,
+        recent: int = 8,
+        min_score: float = 0.1,
+        dim: int = 1024,
+        embed=None,
+    ):
+        self.budget = budget
+        self.recent = recent
+        self.min_score = min_score
+        self.dim = dim
+        self.embed = embed or (lambda texts: hash_vectors(texts, dim))
+        self.indexed = 0
+        self.selections = 0
+        self.messages_sent = 0
+        self.turns_retrieved = 0
+
+    def index(self, records):
+        """
+        Embed the records that have no vector yet.
+        """
+        pending = [record for record in records if record.vector is None]
+        if not pending:
+            return
+        vectors = self.embed(
+            [
+                record.content if isinstance(record.content, str) else ""
+                for record in pending
+            ]
+        )
+        for record, vector in zip(pending, vectors):
+            record.vector = vector
+        self.indexed += len(pending)
+
+    def select(self, memory, query: str, size: int) -> list[dict]:
+        """
+        Select the messages to send for a query.
+
+        Args:
+            memory (ConversationMemory): The conversation memory.
+            query (str): The user input.
+            size (int): The maximum number of messages.
+
+        Returns:
+            list: The selected messages, in conversation order.
+        """
+        if self.budget <= 0 or (
+            memory.total_tokens <= self.budget and len(memory) <= size
+        ):
+            return memory.window(size)
+
+        records = memory.records()
+        start = memory.pinned
+        if start < len(records) and is_summary(records[start].to_message()):
+            start += 1
+        recent = min(
+            max(0, size - start), self.recent, len(records) - start
+        )
+        stop = len(records) - recent
+        keep = list(range(start)) + list(range(stop, len(records)))
+        remaining = min(
+            self.budget - sum(records[index].tokens for index in keep),
+            sum(record.tokens for record in records[start:stop]),
+        )
+        slots = size - len(keep)
+
+        chosen = []
+        if remaining > 0 and slots > 0 and stop > start:
+            self.index(records[start:stop])
+            matrix = np.stack([record.vector for record in records[start:stop]])
+            scores = matrix @ self.embed([query])[0]
+
+            turns = []
+            for offset, record in enumerate(records[start:stop]):
+                if record.role == "user" or not turns:
+                    turns.append([])
+                turns[-1].append(offset)
+
+            ranked = sorted(
+                turns, key=lambda turn: scores[turn].max(), reverse=True
+            )
+            for turn in ranked:
+                if scores[turn].max() < self.min_score:
+                    break
+                tokens = sum(records[start + offset].tokens for offset in turn)
+                if tokens > remaining or len(turn) > slots:
+                    continue
+                chosen.extend(start + offset for offset in turn)
+                remaining -= tokens
+                slots -= len(turn)
+                self.turns_retrieved += 1
+
+        selected = sorted(keep + chosen)
+        self.selections += 1
+        self.messages_sent += len(selected)
+        return [records[index].to_message() for index in selected]
+
+    def stats(self):
+        """
+        Get the retrieval counters.
+        """
+        return {
+            "budget": self.budget,
+            "recent": self.recent,
+            "indexed": self.indexed,
+            "selections": self.selections,
+            "average_messages_sent": (
+                self.messages_sent / self.selections if self.selections else 0
+            ),
+            "turns_retrieved": self.turns_retrieved,
+        }
@@ -12,6 +12,7 @@ This file contains the core tools for the AI Assistant.
 import requests
 import base64
 import mimetypes
+from functools import partial
 from openai import OpenAI, AsyncOpenAI
 from rich.console import Console
 from pathlib import Path
@@ -21,7 +22,12 @@ from plugins._gmail_plugin.drive_tools import (
 from config import (
     OPENAI_API_KEY,
     OPENAI_ORG_ID,
+    EXPERT_OPENAI_MODELS,
 )
+from utils.completion_cache import completion_cache
+from utils.request_sizer import request_sizer, context_window
+from utils.expert_router import ExpertBackend, expert_router
+from utils.circuit_breaker import circuit_breakers, model_upstream
 console = Console()
 
 api_key = OPENAI_API_KEY
@@ -34,175 +40,168 @@ gpt4_client = OpenAI(api_key=api_key, organization=openai_org_id, timeout=10)
 gpt4_client_async = AsyncOpenAI(api_key=api_key, organization=openai_org_id, timeout=10)
 
 
-def ask_chat_gpt_4_0314_synchronous(**kwargs) -> str:
+# System prompt of the expert models.
+EXPERT_SYSTEM_PROMPT = "You are a specialized AI language model designed to act as an expert tool within a larger conversational system. Your role is to provide detailed and expert-level responses to queries directed to you by the controller AI. You should focus on delivering precise information and insights based on your specialized knowledge and capabilities. Your responses should be concise, relevant, and strictly within the scope of the expertise you represent. You are not responsible for maintaining the overall conversation with the end user, but rather for supporting the controller AI by processing and responding to specific requests for information or analysis. Adhere to the constraints provided by the controller, such as token limits and context relevance, and ensure that your contributions are well-reasoned and can be seamlessly integrated into the broader conversation managed by the controller AI."
+
+
+def expert_messages(question: str, text: str) -> list:
     """
-    Ask ChatGPT a question and return the response.
+    Build the messages of an expert request.
 
     Args:
-        kwargs (dict): The keyword arguments to pass to the function.
+        question (str): The question.
+        text (str): The text the question is about.
     Returns:
-        str: The response from ChatGPT.
+        list: The chat messages.
     """
-
-    question = kwargs.get("question", "")
-    text = kwargs.get("text", "")
-
-    messages = [
-        {
-            "role": "system",
-            "content": "You are a specialized AI language model designed to act as an expert tool within a larger conversational system. Your role is to provide detailed and expert-level responses to queries directed to you by the controller AI. You should focus on delivering precise information and insights based on your specialized knowledge and capabilities. Your responses should be concise, relevant, and strictly within the scope of the expertise you represent. You are not responsible for maintaining the overall conversation with the end user, but rather for supporting the controller AI by processing and responding to specific requests for information or analysis. Adhere to the constraints provided by the controller, such as token limits and context relevance, and ensure that your contributions are well-reasoned and can be seamlessly integrated into the broader conversation managed by the controller AI.",
-        },
+    return [
+        {"role": "system", "content": EXPERT_SYSTEM_PROMPT},
         {"role": "user", "content": question},
         {"role": "assistant", "content": text},
     ]
 
-    response = gpt4_client.chat.completions.create(
-        model="gpt-4-0314",
-        messages=messages,
-        temperature=0,
-        max_tokens=2048,
-        top_p=0.3,
-        frequency_penalty=0,
-        presence_penalty=0,
-    )
 
+def reply_content(response):
+    """
+    Get the content of a chat completion, or None when it is empty.
+    """
     if (
         response.choices
         and response.choices[0].message
         and response.choices[0].message.content
     ):
         return response.choices[0].message.content
-    else:
-        return "An error occurred or no content was returned."
+    return None
 
 
-async def ask_chat_gpt_4_0314_asynchronous(**kwargs) -> str:
+def openai_expert(model: str) -> ExpertBackend:
+    """
+    Build the expert backend of an OpenAI chat model.
+
+    Args:
+        model (str): The model name.
+    Returns:
+        ExpertBackend: The backend calling the model.
+    """
+    # Stop calling the model while it keeps failing, without stopping the
+    # other models.
+    upstream = model_upstream("api.openai.com", model)
+    create = circuit_breakers.guard(
+        upstream, gpt4_client.chat.completions.create, asynchronous=False
+    )
+    acreate = circuit_breakers.guard(
+        upstream, gpt4_client_async.chat.completions.create, asynchronous=True
+    )
+
+    def call(question, text, temperature=0.2, top_p=0.5, max_tokens=2048):
+        response = request_sizer.create(
+            partial(completion_cache.create, create),
+            model=model,
+            messages=expert_messages(question, text),
+            temperature=temperature,
+            max_tokens=max_tokens,
+            top_p=top_p,
+            frequency_penalty=0,
+            presence_penalty=0,
+        )
+        return reply_content(response)
+
+    async def acall(question, text, temperature=0.2, top_p=0.5, max_tokens=2048):
+        response = await request_sizer.acreate(
+            partial(completion_cache.acreate, acreate),
+            model=model,
+            messages=expert_messages(question, text),
+            temperature=temperature,
+            max_tokens=max_tokens,
+            top_p=top_p,
+            frequency_penalty=0,
+            presence_penalty=0,
+        )
+        return reply_content(response)
+
+    return ExpertBackend(model, "openai", context_window(model), call, acall)
+
+
+# Register the OpenAI expert models with the expert router.
+for expert_model in EXPERT_OPENAI_MODELS:
+    expert_router.register(openai_expert(expert_model))
+
+
+def ask_chat_gpt_4_0314_synchronous(**kwargs) -> str:
     """
     Ask ChatGPT a question and return the response.
 
+    The request is sent to the fastest healthy expert model that fits it.
+
     Args:
         kwargs (dict): The keyword arguments to pass to the function.
     Returns:
         str: The response from ChatGPT.
     """
+    return expert_router.ask(
+        kwargs.get("question", ""),
+        kwargs.get("text", ""),
+        temperature=0,
+        top_p=0.3,
+    )
 
-    question = kwargs.get("question", "")
-    text = kwargs.get("text", "")
 
-    messages = [
-        {
-            "role": "system",
-            "content": "You are a specialized AI language model designed to act as an expert tool within a larger conversational system. Your role is to provide detailed and expert-level responses to queries directed to you by the controller AI. You should focus on delivering precise information and insights based on your specialized knowledge and capabilities. Your responses should be concise, relevant, and strictly within the scope of the expertise you represent. You are not responsible for maintaining the overall conversation with the end user, but rather for supporting the controller AI by processing and responding to specific requests for information or analysis. Adhere to the constraints provided by the controller, such as token limits and context relevance, and ensure that your contributions are well-reasoned and can be seamlessly integrated into the broader conversation managed by the controller AI.",
-        },
-        {"role": "user", "content": question},
-        {"role": "assistant", "content": text},
-    ]
+async def ask_chat_gpt_4_0314_asynchronous(**kwargs) -> str:
+    """
+    Ask ChatGPT a question and return the response.
+
+    The request is sent to the fastest healthy expert model that fits it.
 
-    response = await gpt4_client_async.chat.completions.create(
-        model="gpt-4-0314",
-        messages=messages,
+    Args:
+        kwargs (dict): The keyword arguments to pass to the function.
+    Returns:
+        str: The response from ChatGPT.
+    """
+    return await expert_router.aask(
+        kwargs.get("question", ""),
+        kwargs.get("text", ""),
         temperature=0.2,
-        max_tokens=2048,
         top_p=0.5,
-        frequency_penalty=0,
-        presence_penalty=0,
     )
 
-    if (
-        response.choices
-        and response.choices[0].message
-        and response.choices[0].message.content
-    ):
-        return response.choices[0].message.content
-    else:
-        return "An error occurred or no content was returned."
-
 
 def ask_chat_gpt_4_0613_synchronous(**kwargs) -> str:
     """
     Ask ChatGPT a question and return the response.
 
+    The request is sent to the fastest healthy expert model that fits it.
+
     Args:
         kwargs (dict): The keyword arguments to pass to the function.
     Returns:
         str: The response from ChatGPT.
     """
-
-    question = kwargs.get("question", "")
-    text = kwargs.get("text", "")
-
-    messages = [
-        {
-            "role": "system",
-            "content": "You are a specialized AI language model designed to act as an expert tool within a larger conversational system. Your role is to provide detailed and expert-level responses to queries directed to you by the controller AI. You should focus on delivering precise information and insights based on your specialized knowledge and capabilities. Your responses should be concise, relevant, and strictly within the scope of the expertise you represent. You are not responsible for maintaining the overall conversation with the end user, but rather for supporting the controller AI by processing and responding to specific requests for information or analysis. Adhere to the constraints provided by the controller, such as token limits and context relevance, and ensure that your contributions are well-reasoned and can be seamlessly integrated into the broader conversation managed by the controller AI.",
-        },
-        {"role": "user", "content": question},
-        {"role": "assistant", "content": text},
-    ]
-
-    response = gpt4_client.chat.completions.create(
-        model="gpt-4-613",
-        messages=messages,
+    return expert_router.ask(
+        kwargs.get("question", ""),
+        kwargs.get("text", ""),
         temperature=0.2,
-        max_tokens=2048,
         top_p=0.5,
-        frequency_penalty=0,
-        presence_penalty=0,
     )
 
-    # Check if the response has the expected structure and content
-    if (
-        response.choices
-        and response.choices[0].message
-        and response.choices[0].message.content
-    ):
-        return response.choices[0].message.content
-    else:
-        # Handle the case where the expected content is not available
-        return "An error occurred or no content was returned."
-
 
 async def ask_chat_gpt_4_0613_asynchronous(**kwargs) -> str:
     """
     Ask ChatGPT a question and return the response.
 
+    The request is sent to the fastest healthy expert model that fits it.
+
     Args:
         kwargs (dict): The keyword arguments to pass to the function.
     Returns:
         str: The response from ChatGPT.
     """
-
-    question = kwargs.get("question", "")
-    text = kwargs.get("text", "")
-
-    messages = [
-        {
-            "role": "system",
-            "content": "You are a specialized AI language model designed to act as an expert tool within a larger conversational system. Your role is to provide detailed and expert-level responses to queries directed to you by the controller AI. You should focus on delivering precise information and insights based on your specialized knowledge and capabilities. Your responses should be concise, relevant, and strictly within the scope of the expertise you represent. You are not responsible for maintaining the overall conversation with the end user, but rather for supporting the controller AI by processing and responding to specific requests for information or analysis. Adhere to the constraints provided by the controller, such as token limits and context relevance, and ensure that your contributions are well-reasoned and can be seamlessly integrated into the broader conversation managed by the controller AI.",
-        },
-        {"role": "user", "content": question},
-        {"role": "assistant", "content": text},
-    ]
-
-    response = await gpt4_client_async.chat.completions.create(
-        model="gpt-4-0613",
-        messages=messages,
+    return await expert_router.aask(
+        kwargs.get("question", ""),
+        kwargs.get("text", ""),
         temperature=0.2,
-        max_tokens=2048,
         top_p=0.5,
-        frequency_penalty=0,
-        presence_penalty=0,
     )
 
-    if (
-        response.choices
-        and response.choices[0].message
-        and response.choices[0].message.content
-    ):
-        return response.choices[0].message.content
-    else:
-        return "An error occurred or no content was returned."
-
 
 # Function to encode the image
 def encode_image(image_path):
@@ -219,85 +218,39 @@ def ask_chat_gpt_4_32k_0314_synchronous(**kwargs) -> str:
     """
     Ask ChatGPT a question and return the response.
 
+    The request is sent to the fastest healthy expert model that fits it.
+
     Args:
         kwargs (dict): The keyword arguments to pass to the function.
     Returns:
         str: The response from ChatGPT.
     """
-
-    question = kwargs.get("question", "")
-    text = kwargs.get("text", "")
-
-    messages = [
-        {
-            "role": "system",
-            "content": "You are a specialized AI language model designed to act as an expert tool within a larger conversational system. Your role is to provide detailed and expert-level responses to queries directed to you by the controller AI. You should focus on delivering precise information and insights based on your specialized knowledge and capabilities. Your responses should be concise, relevant, and strictly within the scope of the expertise you represent. You are not responsible for maintaining the overall conversation with the end user, but rather for supporting the controller AI by processing and responding to specific requests for information or analysis. Adhere to the constraints provided by the controller, such as token limits and context relevance, and ensure that your contributions are well-reasoned and can be seamlessly integrated into the broader conversation managed by the controller AI.",
-        },
-        {"role": "user", "content": question},
-        {"role": "assistant", "content": text},
-    ]
-
-    response = gpt4_client.chat.completions.create(
-        model="gpt-4-32k-0314",
-        messages=messages,
+    return expert_router.ask(
+        kwargs.get("question", ""),
+        kwargs.get("text", ""),
         temperature=0,
-        max_tokens=2048,
         top_p=0.3,
-        frequency_penalty=0,
-        presence_penalty=0,
     )
 
-    if (
-        response.choices
-        and response.choices[0].message
-        and response.choices[0].message.content
-    ):
-        return response.choices[0].message.content
-    else:
-        return "An error occurred or no content was returned."
-
 
 async def ask_chat_gpt_4_32k_0314_asynchronous(**kwargs) -> str:
     """
     Ask ChatGPT a question and return the response.
 
+    The request is sent to the fastest healthy expert model that fits it.
+
     Args:
         kwargs (dict): The keyword arguments to pass to the function.
     Returns:
         str: The response from ChatGPT.
     """
-
-    question = kwargs.get("question", "")
-    text = kwargs.get("text", "")
-
-    messages = [
-        {
-            "role": "system",
-            "content": "You are a specialized AI language model designed to act as an expert tool within a larger conversational system. Your role is to provide detailed and expert-level responses to queries directed to you by the controller AI. You should focus on delivering precise information and insights based on your specialized knowledge and capabilities. Your responses should be concise, relevant, and strictly within the scope of the expertise you represent. You are not responsible for maintaining the overall conversation with the end user, but rather for supporting the controller AI by processing and responding to specific requests for information or analysis. Adhere to the constraints provided by the controller, such as token limits and context relevance, and ensure that your contributions are well-reasoned and can be seamlessly integrated into the broader conversation managed by the controller AI.",
-        },
-        {"role": "user", "content": question},
-        {"role": "assistant", "content": text},
-    ]
-
-    response = await gpt4_client_async.chat.completions.create(
-        model="gpt-4-32k-0314",
-        messages=messages,
+    return await expert_router.aask(
+        kwargs.get("question", ""),
+        kwargs.get("text", ""),
         temperature=0.2,
-        max_tokens=2048,
         top_p=0.5,
-        frequency_penalty=0,
-        presence_penalty=0,
     )
 
-    if (
-        response.choices
-        and response.choices[0].message
-        and response.choices[0].message.content
-    ):
-        return response.choices[0].message.content
-    else:
-        return "An error occurred or no content was returned."
-
 
 # Function to send the image to the vision model
 async def ask_gpt_4_vision(image_name, drive_service=None):
@@ -0,0 +1,420 @@
+# !/usr/bin/env python
+# coding: utf-8
+# Filename: request_sizer.py
+# Path: utils/request_sizer.py
+
+"""
+
+Request Sizer
+===============
+This module sizes chat completion requests against the model's context
+window before they are sent.
+
+
+Functions
+---------
+context_window(model)
+    Get the context window of a model.
+format_tool_definitions(tools)
+    Render tool schemas the way they are presented to the model.
+is_context_length_error(error)
+    Check whether an API error reports an oversized request.
+
+
+Classes
+-------
+RequestSizer
+    Count, fit and retry chat completion requests.
+
+"""
+import json
+from functools import lru_cache
+
+from openai import BadRequestError
+
+from config import OPENAI_DEFAULT_CONTEXT_WINDOW
+from utils.token_tools import get_encoding
+
+# Context window of the models whose name is also the prefix of models
+# with another window, matched by the exact name.
+EXACT_CONTEXT_WINDOWS = {
+    "gpt-4": 8192,
+    "gpt-4-0314": 8192,
+    "gpt-4-0613": 8192,
+    "gpt-3.5-turbo-0301": 4096,
+    "gpt-3.5-turbo-0613": 4096,
+}
+
+# Context window of each model family, matched by the longest prefix.
+CONTEXT_WINDOWS = {
+    "gpt-4-32k": 32768,
+    "gpt-4-1106": 128000,
+    "gpt-4-0125": 128000,
+    "gpt-4-turbo": 128000,
+    "gpt-4-vision": 128000,
+    "gpt-4o": 128000,
+    "gpt-4.1": 1047576,
+    "gpt-4.5": 128000,
+    "gpt-5": 400000,
+    "o1": 200000,
+    "o1-mini": 128000,
+    "o1-preview": 128000,
+    "o3": 200000,
+    "o4-mini": 200000,
+    "gpt-3.5-turbo": 16385,
+    "gpt-3.5-turbo-instruct": 4096,
+}
+
+# Tokens added to every message and to prime the assistant reply.
+TOKENS_PER_MESSAGE = 3
+TOKENS_PER_NAME = 1
+REPLY_PRIMING_TOKENS = 3
+
+# Tokens added when tool definitions are sent.
+TOOL_DEFINITION_TOKENS = 9
+
+
+def context_window(model: str, default: int = None) -> int:
+    """
+    Get the context window of a model.
+
+    Args:
+        model (str): The model name.
+        default (int): The window of unknown models,
+            ``OPENAI_DEFAULT_CONTEXT_WINDOW`` when ``None``.
+
+    Returns:
+        int: The number of tokens the model accepts.
+    """
+    if model in EXACT_CONTEXT_WINDOWS:
+        return EXACT_CONTEXT_WINDOWS[model]
+    if default is None:
+        default = OPENAI_DEFAULT_CONTEXT_WINDOW
+    match = ""
+    for prefix in CONTEXT_WINDOWS:
+        if model.startswith(prefix) and len(prefix) > len(match):
+            match = prefix
+    return CONTEXT_WINDOWS[match] if match else default
+
+
+@lru_cache(maxsize=4096)
+def count_text_tokens(text: str, model: str) -> int:
+    """
+    Count the tokens of a text, caching the most recent texts.
+    """
+    return len(get_encoding(model).encode(text))
+
+
+def format_type(schema: dict, indent: int) -> str:
+    """
+    Render the type of a JSON schema property.
+    """
+    kind = schema.get("type")
+    if "enum" in schema:
+        return " | ".join(json.dumps(value) for value in schema["enum"])
+    if kind == "array":
+        items = schema.get("items")
+        return f"{format_type(items, indent)}[]" if items else "any[]"
+    if kind == "object":
+        if not schema.get("properties"):
+            return "object"
+        return (
+            "{\n" + format_properties(schema, indent + 2)
+            + "\n" + " " * indent + "}"
+        )
+    if kind in ("integer", "number"):
+        return "number"
+    if kind in ("string", "boolean", "null"):
+        return kind
+    return "any"
+
+
+def format_properties(schema: dict, indent: int) -> str:
+    """
+    Render the properties of a JSON schema object.
+    """
+    required = set(schema.get("required", ()))
+    lines = []
+    for name, prop in schema.get("properties", {}).items():
+        if prop.get("description"):
+            lines.append(" " * indent + f"// {prop['description']}")
+        optional = "" if name in required else "?"
+        lines.append(
+            " " * indent + f"{name}{optional}: {format_type(prop, indent)},"
+        )
+    return "\n".join(lines)
+
+
+def format_tool_definitions(tools: list) -> str:
+    """
+    Render tool schemas the way they are presented to the model.
+
+    Args:
+        tools (list): The OpenAI tool schemas.
+
+    Returns:
+        str: The tools as a TypeScript ``functions`` namespace.
+    """
+    lines = ["namespace functions {", ""]
+    for tool in tools:
+        function = tool["function"]
+        if function.get("description"):
+            lines.append(f"// {function['description']}")
+        parameters = function.get("parameters") or {}
+        if parameters.get("properties"):
+            lines.append(f"type {function['name']} = (_: {{")
+            lines.append(format_properties(parameters, 0))
+            lines.append("}) => any;")
+        else:
+            lines.append(f"type {function['name']} = () => any;")
+        lines.append("")
+    lines.append("} // namespace functions")
+    return "\n".join(lines)
+
+
+def is_context_length_error(error: Exception) -> bool:
+    """
+    Check whether an API error reports an oversized request.
+    """
+    return isinstance(error, BadRequestError) and (
+        getattr(error, "code", None) == "context_length_exceeded"
+        or "maximum context length" in str(error)
+    )
+
+
+class RequestSizer:
+    """
+    Count, fit and retry chat completion requests.
+
+    ``fit`` lowers ``max_tokens`` to what is left of the context window.
+    When less than ``min_completion`` tokens would be left, the oldest
+    messages after the leading system messages are dropped, and as a last
+    resort the longest remaining message is truncated. ``create`` and
+    ``acreate`` fit a request, send it, and fit it again with a safety
+    margin and retry once if the API still reports a context-length error.
+    """
+
+    def __init__(self, min_completion: int = 256, retry_margin: float = 0.1):
+        self.min_completion = min_completion
+        self.retry_margin = retry_margin
+        self.clamped = 0
+        self.trimmed = 0
+        self.truncated = 0
+        self.retried = 0
+        self._tool_tokens = {}
+
+    def message_tokens(self, message, model: str) -> int:
+        """
+        Count the chat-format tokens of a message.
+        """
+        if hasattr(message, "model_dump"):
+            message = message.model_dump(exclude_none=True)
+
+        tokens = TOKENS_PER_MESSAGE
+        for key, value in message.items():
+            if key == "name":
+                tokens += TOKENS_PER_NAME + count_text_tokens(value, model)
+            elif key == "content" and isinstance(value, list):
+                for part in value:
+                    if part.get("type") == "text":
+                        tokens += count_text_tokens(part.get("text", ""), model)
+            elif key == "tool_calls" and value:
+                for call in value:
+                    function = call.get("function", {})
+                    tokens += count_text_tokens(
+                        function.get("name", "") + function.get("arguments", ""),
+                        model,
+                    )
+            elif isinstance(value, str) and value:
+                tokens += count_text_tokens(value, model)
+        return tokens
+
+    def tool_tokens(self, tools, model: str) -> int:
+        """
+        Count the tokens of the tool definitions, caching each schema.
+        """
+        if not tools:
+            return 0
+        tokens = TOOL_DEFINITION_TOKENS
+        for tool in tools:
+            key = (id(tool), model)
+            entry = self._tool_tokens.get(key)
+            if entry is None or entry[0] is not tool:
+                rendered = format_tool_definitions([tool])
+                entry = (tool, count_text_tokens(rendered, model))
+                self._tool_tokens[key] = entry
+            tokens += entry[1]
+        return tokens
+
+    def measure(self, model: str, messages, tools=None) -> int:
+        """
+        Count the prompt tokens of a request.
+
+        Args:
+            model (str): The model name.
+            messages (list): The request messages.
+            tools (list): The tool schemas, if any.
+
+        Returns:
+            int: The number of prompt tokens.
+        """
+        return (
+            sum(self.message_tokens(message, model) for message in messages)
+            + self.tool_tokens(tools, model)
+            + REPLY_PRIMING_TOKENS
+        )
+
+    def fit(self, model: str, messages, tools=None, max_tokens=None, margin=0):
+        """
+        Fit a request into the model's context window.
+
+        Args:
+            model (str): The model name.
+            messages (list): The request messages.
+            tools (list): The tool schemas, if any.
+            max_tokens (int): The requested completion tokens, if any.
+            margin (int): Tokens of the window kept unused.
+
+        Returns:
+            tuple: The messages and ``max_tokens`` to send. The messages are
+            a new list when they had to be trimmed.
+        """
+        window = context_window(model) - margin
+        counts = [self.message_tokens(message, model) for message in messages]
+        fixed = self.tool_tokens(tools, model) + REPLY_PRIMING_TOKENS
+        prompt = sum(counts) + fixed
+        wanted = max_tokens if max_tokens is not None else self.min_completion
+
+        if prompt + wanted <= window:
+            return messages, max_tokens
+
+        if window - prompt >= self.min_completion:
+            self.clamped += 1
+            return messages, window - prompt
+
+        messages = list(messages)
+        pinned = 0
+        while pinned < len(messages) - 1 and self._role(messages[pinned]) == "system":
+            pinned += 1
+
+        limit = window - self.min_completion
+        dropped = False
+        while prompt > limit and len(messages) - pinned > 1:
+            prompt -= counts.pop(pinned)
+            messages.pop(pinned)
+            dropped = True
+            # A tool result must follow the assistant message that called it.
+            while len(messages) - pinned > 1 and self._role(messages[pinned]) == "tool":
+                prompt -= counts.pop(pinned)
+                messages.pop(pinned)
+        if dropped:
+            self.trimmed += 1
+
+        if prompt > limit:
+            longest = max(range(len(messages)), key=counts.__getitem__)
+            messages[longest] = self._truncate(
+                messages[longest], counts[longest] - (prompt - limit), model
+            )
+            prompt = limit
+            self.truncated += 1
+
+        available = window - prompt
+        if max_tokens is None or max_tokens > available:
+            self.clamped += 1
+            max_tokens = available
+        return messages, max_tokens
+
+    def create(self, create_fn, **params):
+        """
+        Fit a request, send it and retry once on a context-length error.
+
+        Args:
+            create_fn (callable): The function sending the request.
+            **params: The request parameters.
+
+        Returns:
+            ChatCompletion: The response.
+        """
+        params = self._fitted(params)
+        try:
+            return create_fn(**params)
+        except BadRequestError as error:
+            if not is_context_length_error(error):
+                raise
+            self.retried += 1
+            return create_fn(**self._fitted(params, retry=True))
+
+    async def acreate(self, create_fn, **params):
+        """
+        Fit a request, await it and retry once on a context-length error.
+
+        Args:
+            create_fn (callable): The coroutine function sending the request.
+            **params: The request parameters.
+
+        Returns:
+            ChatCompletion: The response.
+        """
+        params = self._fitted(params)
+        try:
+            return await create_fn(**params)
+        except BadRequestError as error:
+            if not is_context_length_error(error):
+                raise
+            self.retried += 1
+            return await create_fn(**self._fitted(params, retry=True))
+
+    def _fitted(self, params: dict, retry: bool = False) -> dict:
+        """
+        Get the request parameters fitted to the context window.
+        """
+        model = params["model"]
+        margin = int(context_window(model) * self.retry_margin) if retry else 0
+        messages, max_tokens = self.fit(
+            model,
+            params["messages"],
+            params.get("tools"),
+            params.get("max_tokens"),
+            margin=margin,
+        )
+        fitted = dict(params, messages=messages)
+        if max_tokens is not None:
+            fitted["max_tokens"] = max_tokens
+        return fitted
+
+    @staticmethod
+    def _role(message) -> str:
+        """
+        Get the role of a message dictionary or object.
+        """
+        if isinstance(message, dict):
+            return message.get("role")
+        return getattr(message, "role", None)
+
+    def _truncate(self, message, tokens: int, model: str):
+        """
+        Truncate the content of a message to about ``tokens`` tokens.
+        """
+        if hasattr(message, "model_dump"):
+            message = message.model_dump(exclude_none=True)
+        content = message.get("content")
+        if not isinstance(content, str):
+            return message
+        encoding = get_encoding(model)
+        keep = max(0, tokens - TOKENS_PER_MESSAGE)
+        return dict(message, content=encoding.decode(encoding.encode(content)[:keep]))
+
+    def stats(self):
+        """
+        Get the sizing counters.
+        """
+        return {
+            "clamped": self.clamped,
+            "trimmed": self.trimmed,
+            "truncated": self.truncated,
+            "retried": self.retried,
+        }
+
+
+# Define the request sizer shared by the application.
+request_sizer = RequestSizer()
@@ -0,0 +1,394 @@
+# !/usr/bin/env python
+# coding: utf-8
+# Filename: session_store.py
+# Path: utils/session_store.py
+
+"""
+
+Session Store
+===============
+This module keeps the conversation memory of the web sessions on the
+server, so a request only carries the new user input.
+
+
+Functions
+---------
+is_session_id(value)
+    Check whether a value is a well-formed session ID.
+
+
+Classes
+-------
+SessionEntry
+    The conversation memory of a session and its sync state.
+SessionStore
+    In-process LRU of sessions backed by an optional SQLite tier.
+
+"""
+import asyncio
+import contextlib
+import json
+import os
+import re
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from utils.conversation_memory import ConversationMemory, is_summary
+
+SESSION_ID_PATTERN = re.compile(r"[A-Za-z0-9_-]{8,64}")
+
+
+def is_session_id(value) -> bool:
+    """
+    Check whether a value is a well-formed session ID.
+    """
+    return (
+        isinstance(value, str)
+        and SESSION_ID_PATTERN.fullmatch(value) is not None
+    )
+
+
+class SessionEntry:
+    """
+    The conversation memory of a session and its sync state.
+
+    Requests replace ``memory`` when the conversation returns a new memory
+    object. ``synced`` and ``next_seq`` track the messages already written
+    to the SQLite tier.
+    """
+
+    __slots__ = (
+        "memory", "lock", "last_used", "loaded",
+        "synced_memory", "synced", "next_seq", "summary", "updated",
+    )
+
+    def __init__(self):
+        self.memory = None
+        self.lock = asyncio.Lock()
+        self.last_used = time.monotonic()
+        self.loaded = False
+        self.synced_memory = None
+        self.synced = 0
+        self.next_seq = 0
+        self.summary = None
+        self.updated = None
+
+
+class SessionStore:
+    """
+    In-process LRU of sessions backed by an optional SQLite tier.
+
+    At most ``max_sessions`` sessions are kept in memory, and a session
+    idle for ``idle_ttl`` seconds is evicted. With a ``path``, every turn
+    is written to a SQLite database in WAL mode, so an evicted session is
+    loaded again on its next request and survives a restart. Only the
+    messages appended since the last turn are inserted; the messages
+    evicted from the memory are deleted.
+
+    A session is used through ``open``, which serializes the requests of
+    the same session. When several worker processes share the database,
+    ``shared`` makes ``open`` reload a session another worker has written
+    since this one last used it. Two workers can still run a turn of the
+    same session at once; the later write then finds the session changed,
+    appends its messages after those of the other worker instead of
+    overwriting them, and reloads the session on its next request. A
+    rewrite after a summary replaces the session, dropping the other turn.
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = 1000,
+        idle_ttl: float = 1800,
+        path: str = None,
+        model: str = "gpt-4",
+        shared: bool = False,
+    ):
+        self.max_sessions = max(1, max_sessions)
+        self.shared = shared
+        self.idle_ttl = idle_ttl
+        self.model = model
+        self.created = 0
+        self.loaded = 0
+        self.reloaded = 0
+        self.evicted_idle = 0
+        self.evicted_lru = 0
+        self.rows_written = 0
+        self.conflicts = 0
+        self.failures = 0
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(
+                path, timeout=5.0, check_same_thread=False
+            )
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS session_messages ("
+                "session_id TEXT NOT NULL, seq INTEGER NOT NULL, "
+                "message TEXT NOT NULL, PRIMARY KEY (session_id, seq))"
+            )
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                "session_id TEXT PRIMARY KEY, updated REAL NOT NULL)"
+            )
+            self._db.commit()
+
+    @staticmethod
+    def new_id() -> str:
+        """
+        Generate a new session ID.
+        """
+        return secrets.token_urlsafe(16)
+
+    @contextlib.asynccontextmanager
+    async def open(self, session_id: str):
+        """
+        Use the memory of a session for one request.
+
+        The session is created when it does not exist. Concurrent requests
+        of the same session wait for each other. The memory is written to
+        the SQLite tier when the request completes.
+
+        Args:
+            session_id (str): The session ID.
+
+        Yields:
+            SessionEntry: The session, whose ``memory`` may be replaced.
+        """
+        entry = self._entry(session_id)
+        async with entry.lock:
+            if entry.loaded and self.shared and self._db is not None:
+                try:
+                    updated = await asyncio.to_thread(
+                        self._updated, session_id
+                    )
+                except sqlite3.Error:
+                    self.failures += 1
+                    updated = entry.updated
+                if updated != entry.updated:
+                    entry.loaded = False
+                    self.reloaded += 1
+            if not entry.loaded:
+                await self._load(session_id, entry)
+            yield entry
+            entry.last_used = time.monotonic()
+            await self._persist(session_id, entry)
+
+    def _entry(self, session_id: str) -> SessionEntry:
+        """
+        Get the entry of a session, evicting idle and surplus sessions.
+        """
+        now = time.monotonic()
+        entry = self._sessions.get(session_id)
+        if entry is not None:
+            self._sessions.move_to_end(session_id)
+        else:
+            entry = self._sessions[session_id] = SessionEntry()
+
+        for other_id, other in list(self._sessions.items()):
+            if other is entry or other.lock.locked():
+                continue
+            if now - other.last_used > self.idle_ttl:
+                del self._sessions[other_id]
+                self.evicted_idle += 1
+            elif len(self._sessions) > self.max_sessions:
+                del self._sessions[other_id]
+                self.evicted_lru += 1
+            else:
+                break
+        return entry
+
+    async def _load(self, session_id: str, entry: SessionEntry):
+        """
+        Restore a session from the SQLite tier, or start an empty one.
+        """
+        rows, updated = [], None
+        if self._db is not None:
+            try:
+                rows, updated = await asyncio.to_thread(
+                    self._read, session_id
+                )
+            except sqlite3.Error:
+                self.failures += 1
+        entry.memory = ConversationMemory(
+            [json.loads(message) for _, message in rows], model=self.model
+        )
+        entry.loaded = True
+        if rows:
+            self.loaded += 1
+        else:
+            self.created += 1
+        entry.synced_memory = entry.memory
+        entry.synced = entry.memory.appended
+        entry.next_seq = rows[-1][0] + 1 if rows else 0
+        entry.summary = self._summary(entry.memory)
+        entry.updated = updated
+
+    @staticmethod
+    def _summary(memory: ConversationMemory):
+        """
+        Get the summary message of a memory, if any.
+        """
+        if memory.evictable and is_summary(memory[memory.pinned]):
+            return memory[memory.pinned]
+        return None
+
+    async def _persist(self, session_id: str, entry: SessionEntry):
+        """
+        Write the changes of a session memory to the SQLite tier.
+
+        A replaced memory or a new summary rewrites the session. Otherwise
+        the new messages are inserted and the rows of the messages evicted
+        from the memory are deleted.
+        """
+        if self._db is None or entry.memory is None:
+            return
+        memory = entry.memory
+        summary = self._summary(memory)
+        if memory is not entry.synced_memory or summary != entry.summary:
+            rewrite = True
+            first_seq = 0
+            fresh = memory.to_list()
+        else:
+            rewrite = False
+            first_seq = entry.next_seq
+            count = min(memory.appended - entry.synced, len(memory))
+            fresh = memory[len(memory) - count:] if count else []
+
+        rows = [
+            (session_id, first_seq + index, json.dumps(message))
+            for index, message in enumerate(fresh)
+        ]
+        next_seq = first_seq + len(rows)
+        # The pinned messages are the oldest rows, the live tail the newest.
+        evicted = (memory.pinned, next_seq - memory.evictable)
+
+        updated = time.time()
+        try:
+            written = await asyncio.to_thread(
+                self._write,
+                session_id, rows, evicted, rewrite, updated, entry.updated,
+            )
+        except sqlite3.Error:
+            self.failures += 1
+            return
+        if not written:
+            # Another worker wrote the session during this turn.
+            self.conflicts += 1
+            entry.loaded = False
+        self.rows_written += len(rows)
+        entry.synced_memory = memory
+        entry.synced = memory.appended
+        entry.next_seq = next_seq
+        entry.summary = summary
+        entry.updated = updated
+
+    def _read(self, session_id: str) -> tuple:
+        """
+        Read the stored messages of a session in order and its write time.
+        """
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT seq, message FROM session_messages "
+                "WHERE session_id = ? ORDER BY seq",
+                (session_id,),
+            ).fetchall()
+        return rows, self._updated(session_id)
+
+    def _updated(self, session_id: str):
+        """
+        Read the time of the last write of a session, or None.
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT updated FROM sessions WHERE session_id = ?",
+                (session_id,),
+            ).fetchone()
+        return row[0] if row is not None else None
+
+    def _write(
+        self,
+        session_id: str,
+        rows: list,
+        evicted: tuple,
+        rewrite: bool,
+        updated: float,
+        expected: float,
+    ):
+        """
+        Apply the changes of a session in a single transaction.
+
+        Returns:
+            bool: False when the session was written since ``expected``;
+            the new rows are then appended after the stored ones and no
+            rows are deleted.
+        """
+        with self._lock, self._db:
+            # Hold the write lock from the check to the commit.
+            self._db.execute("BEGIN IMMEDIATE")
+            row = self._db.execute(
+                "SELECT updated FROM sessions WHERE session_id = ?",
+                (session_id,),
+            ).fetchone()
+            current = row[0] if row is not None else None
+            if current != expected and not rewrite:
+                last = self._db.execute(
+                    "SELECT MAX(seq) FROM session_messages "
+                    "WHERE session_id = ?",
+                    (session_id,),
+                ).fetchone()[0]
+                first_seq = last + 1 if last is not None else 0
+                rows = [
+                    (session_id, first_seq + index, message)
+                    for index, (_, _, message) in enumerate(rows)
+                ]
+                evicted = (0, 0)
+            if rewrite:
+                self._db.execute(
+                    "DELETE FROM session_messages WHERE session_id = ?",
+                    (session_id,),
+                )
+            self._db.executemany(
+                "INSERT OR REPLACE INTO session_messages "
+                "(session_id, seq, message) VALUES (?, ?, ?)",
+                rows,
+            )
+            if evicted[0] < evicted[1]:
+                self._db.execute(
+                    "DELETE FROM session_messages "
+                    "WHERE session_id = ? AND seq >= ? AND seq < ?",
+                    (session_id, *evicted),
+                )
+            self._db.execute(
+                "INSERT OR REPLACE INTO sessions (session_id, updated) "
+                "VALUES (?, ?)",
+                (session_id, updated),
+            )
+        return current == expected
+
+    def stats(self):
+        """
+        Get the session counters.
+        """
+        return {
+            "sessions": len(self._sessions),
+            "max_sessions": self.max_sessions,
+            "created": self.created,
+            "loaded": self.loaded,
+            "reloaded": self.reloaded,
+            "evicted_idle": self.evicted_idle,
+            "evicted_lru": self.evicted_lru,
+            "rows_written": self.rows_written,
+            "conflicts": self.conflicts,
+            "failures": self.failures,
+            "persistent": self._db is not None,
+        }
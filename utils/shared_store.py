@@ -0,0 +1,229 @@
+# !/usr/bin/env python
+# coding: utf-8
+# Filename: shared_store.py
+# Path: utils/shared_store.py
+
+"""
+
+Shared Store
+===============
+This module keeps the cached lookups and upstream state that the worker
+processes of the web server share, so each worker does not repeat the
+lookups of the others.
+
+Values are JSON, grouped by namespace and optionally expiring. They live
+in a SQLite database in WAL mode, which every worker opens on its own;
+without a path the store is an in-memory database private to the process.
+The store is best effort: a database error counts as a miss. Code running
+on the event loop uses the ``a``-prefixed methods, which run the blocking
+SQLite calls in a worker thread, so a worker waiting on the write lock of
+another does not stall its other requests.
+
+
+Classes
+-------
+SharedStore
+    Namespaced key-value store shared by the worker processes.
+
+"""
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from config import SHARED_STORE_ENABLED, SHARED_STORE_PATH
+
+
+class SharedStore:
+    """
+    Namespaced key-value store shared by the worker processes.
+
+    The connection is opened on first use in each process, so a store
+    created before the workers fork or spawn is safe to use in all of
+    them. Expired values are purged every ``purge_every`` writes.
+    """
+
+    def __init__(self, path: str = None, purge_every: int = 500):
+        self.path = path
+        self.purge_every = max(1, purge_every)
+        self.counters = {}
+        self.failures = 0
+        self._writes = 0
+        self._db = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    @property
+    def shared(self) -> bool:
+        """
+        Whether the values are visible to the other processes.
+        """
+        return bool(self.path)
+
+    def _connection(self) -> sqlite3.Connection:
+        """
+        Get the connection of the current process, opening it if needed.
+        """
+        if self._db is not None and self._pid == os.getpid():
+            return self._db
+        if self.path:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            db = sqlite3.connect(
+                self.path, timeout=5.0, check_same_thread=False
+            )
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+        else:
+            db = sqlite3.connect(":memory:", check_same_thread=False)
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS shared_values ("
+            "namespace TEXT NOT NULL, key TEXT NOT NULL, "
+            "value TEXT NOT NULL, expires REAL, "
+            "PRIMARY KEY (namespace, key))"
+        )
+        db.commit()
+        self._db = db
+        self._pid = os.getpid()
+        return db
+
+    def entry(self, namespace: str, key: str):
+        """
+        Get a value and its remaining lifetime.
+
+        Args:
+            namespace (str): The namespace of the value.
+            key (str): The key of the value.
+
+        Returns:
+            tuple: The value and its remaining seconds (``None`` when it
+            never expires), or ``None`` when the key is missing or expired.
+        """
+        now = time.time()
+        try:
+            with self._lock:
+                row = self._connection().execute(
+                    "SELECT value, expires FROM shared_values "
+                    "WHERE namespace = ? AND key = ?",
+                    (namespace, key),
+                ).fetchone()
+        except sqlite3.Error:
+            self.failures += 1
+            row = None
+        if row is None or (row[1] is not None and row[1] <= now):
+            self._count(namespace, "miss")
+            return None
+        self._count(namespace, "hit")
+        remaining = row[1] - now if row[1] is not None else None
+        return json.loads(row[0]), remaining
+
+    async def aentry(self, namespace: str, key: str):
+        """
+        Get a value and its remaining lifetime in a worker thread.
+        """
+        return await asyncio.to_thread(self.entry, namespace, key)
+
+    def get(self, namespace: str, key: str, default=None):
+        """
+        Get a value, or ``default`` when it is missing or expired.
+        """
+        found = self.entry(namespace, key)
+        return found[0] if found is not None else default
+
+    async def aget(self, namespace: str, key: str, default=None):
+        """
+        Get a value in a worker thread, or ``default``.
+        """
+        found = await self.aentry(namespace, key)
+        return found[0] if found is not None else default
+
+    def set(self, namespace: str, key: str, value, ttl: float = None):
+        """
+        Store a JSON-serializable value.
+
+        Args:
+            namespace (str): The namespace of the value.
+            key (str): The key of the value.
+            value: The value.
+            ttl (float): The lifetime in seconds, ``None`` never expires.
+        """
+        now = time.time()
+        expires = now + ttl if ttl is not None else None
+        try:
+            with self._lock:
+                db = self._connection()
+                with db:
+                    db.execute(
+                        "INSERT OR REPLACE INTO shared_values "
+                        "(namespace, key, value, expires) VALUES (?, ?, ?, ?)",
+                        (namespace, key, json.dumps(value), expires),
+                    )
+                    self._writes += 1
+                    if self._writes % self.purge_every == 0:
+                        db.execute(
+                            "DELETE FROM shared_values WHERE expires <= ?",
+                            (now,),
+                        )
+        except sqlite3.Error:
+            self.failures += 1
+            return
+        self._count(namespace, "write")
+
+    async def aset(self, namespace: str, key: str, value, ttl: float = None):
+        """
+        Store a JSON-serializable value in a worker thread.
+        """
+        await asyncio.to_thread(self.set, namespace, key, value, ttl)
+
+    def delete(self, namespace: str, key: str):
+        """
+        Remove a value.
+        """
+        try:
+            with self._lock:
+                db = self._connection()
+                with db:
+                    db.execute(
+                        "DELETE FROM shared_values "
+                        "WHERE namespace = ? AND key = ?",
+                        (namespace, key),
+                    )
+        except sqlite3.Error:
+            self.failures += 1
+
+    async def adelete(self, namespace: str, key: str):
+        """
+        Remove a value in a worker thread.
+        """
+        await asyncio.to_thread(self.delete, namespace, key)
+
+    def _count(self, namespace: str, status: str):
+        """
+        Increment the counter of a namespace.
+        """
+        counters = self.counters.setdefault(
+            namespace, {"hit": 0, "miss": 0, "write": 0}
+        )
+        counters[status] += 1
+
+    def stats(self):
+        """
+        Get the counters of this process.
+        """
+        return {
+            "shared": self.shared,
+            "failures": self.failures,
+            "namespaces": {
+                namespace: dict(counters)
+                for namespace, counters in self.counters.items()
+            },
+        }
+
+
+# Define the store shared by the caches, plugins and circuit breakers.
+shared_store = SharedStore(
+    path=SHARED_STORE_PATH if SHARED_STORE_ENABLED else None
+)
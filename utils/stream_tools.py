@@ -0,0 +1,264 @@
+# !/usr/bin/env python
+# coding: utf-8
+# Filename: stream_tools.py
+# Path: utils/stream_tools.py
+
+"""
+
+Stream Tools
+===============
+This module assembles streamed chat completions.
+
+
+Functions
+---------
+build_chat_completion(model, content, tool_calls, finish_reason)
+    Build a ChatCompletion from its message parts.
+collect_stream(stream, on_token)
+    Consume a streamed completion and assemble the final ChatCompletion.
+format_sse(event, data)
+    Encode an event as a Server-Sent Event.
+
+
+Classes
+-------
+MarkdownStreamRenderer
+    Render streamed tokens into a rich Live Markdown region.
+EventChannel
+    Queue the events of a turn for a Server-Sent Events response.
+
+"""
+import asyncio
+import json
+import time
+from openai.types.chat import ChatCompletion
+from rich.live import Live
+from rich.markdown import Markdown
+from rich.spinner import Spinner
+
+
+def build_chat_completion(
+    model: str,
+    content,
+    tool_calls=None,
+    finish_reason: str = "stop",
+    completion_id: str = "chatcmpl-local",
+) -> ChatCompletion:
+    """
+    Build a ChatCompletion from its message parts.
+
+    Args:
+        model (str): The model name.
+        content (str | None): The assistant message content.
+        tool_calls (list): The tool calls as dictionaries.
+        finish_reason (str): The finish reason of the choice.
+        completion_id (str): The completion ID.
+
+    Returns:
+        ChatCompletion: The completion.
+    """
+    message = {"role": "assistant", "content": content}
+    if tool_calls:
+        message["tool_calls"] = tool_calls
+
+    return ChatCompletion.model_validate(
+        {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [
+                {
+                    "index": 0,
+                    "message": message,
+                    "finish_reason": finish_reason or "stop",
+                }
+            ],
+        }
+    )
+
+
+async def collect_stream(stream, on_token=None) -> ChatCompletion:
+    """
+    Consume a streamed chat completion.
+
+    Content deltas are passed to ``on_token`` as they arrive. Tool call
+    deltas are merged by their index, concatenating the streamed function
+    names and arguments.
+
+    Args:
+        stream: The async stream of ChatCompletionChunk objects.
+        on_token (callable): Called with each content delta.
+
+    Returns:
+        ChatCompletion: The assembled completion.
+    """
+    completion_id = "chatcmpl-local"
+    model = ""
+    finish_reason = None
+    content_parts = []
+    tool_calls = {}
+
+    async for chunk in stream:
+        completion_id = chunk.id or completion_id
+        model = chunk.model or model
+        if not chunk.choices:
+            continue
+
+        choice = chunk.choices[0]
+        delta = choice.delta
+        if choice.finish_reason:
+            finish_reason = choice.finish_reason
+
+        if delta.content:
+            content_parts.append(delta.content)
+            if on_token is not None:
+                on_token(delta.content)
+
+        for tool_call_delta in delta.tool_calls or []:
+            tool_call = tool_calls.setdefault(
+                tool_call_delta.index,
+                {
+                    "id": "",
+                    "type": "function",
+                    "function": {"name": "", "arguments": ""},
+                },
+            )
+            if tool_call_delta.id:
+                tool_call["id"] = tool_call_delta.id
+            function = tool_call_delta.function
+            if function is not None:
+                if function.name:
+                    tool_call["function"]["name"] += function.name
+                if function.arguments:
+                    tool_call["function"]["arguments"] += function.arguments
+
+    return build_chat_completion(
+        model=model,
+        content="".join(content_parts) if content_parts else None,
+        tool_calls=[tool_calls[index] for index in sorted(tool_calls)],
+        finish_reason=finish_reason,
+        completion_id=completion_id,
+    )
+
+
+def format_sse(event: str, data) -> str:
+    """
+    Encode an event as a Server-Sent Event with a JSON payload.
+    """
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class EventChannel:
+    """
+    Queue the events of a turn for a Server-Sent Events response.
+
+    ``on_token``, ``on_discard`` and ``on_tool_event`` are passed to the
+    conversation, which runs in another task, and ``events`` yields the
+    encoded events until ``close`` is called. The time to the first token is
+    recorded.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.first_token = None
+        self._queue = asyncio.Queue()
+
+    def emit(self, event: str, data):
+        """
+        Queue an event.
+        """
+        self._queue.put_nowait(format_sse(event, data))
+
+    def on_token(self, token: str):
+        """
+        Queue a content delta of the model.
+        """
+        if self.first_token is None:
+            self.first_token = time.perf_counter() - self.started
+        self.emit("token", {"text": token})
+
+    def on_discard(self):
+        """
+        Tell the client to clear the streamed text of a retried completion.
+        """
+        self.emit("discard", {})
+
+    def on_tool_event(self, event: str, details: dict):
+        """
+        Queue the start or finish of a tool call.
+        """
+        self.emit(event, details)
+
+    def close(self):
+        """
+        End the event stream after the queued events.
+        """
+        self._queue.put_nowait(None)
+
+    async def events(self):
+        """
+        Yield the encoded events as they are queued.
+        """
+        while True:
+            event = await self._queue.get()
+            if event is None:
+                return
+            yield event
+
+
+class MarkdownStreamRenderer:
+    """
+    Render streamed tokens into a rich Live Markdown region.
+
+    A spinner is shown until the first token arrives. Re-rendering the
+    Markdown is throttled to ``refresh_interval`` seconds, and the time to
+    the first token is measured from entering the renderer.
+    """
+
+    def __init__(self, console, style="green", refresh_interval=1 / 12):
+        self.style = style
+        self.refresh_interval = refresh_interval
+        self.parts = []
+        self.started = None
+        self.time_to_first_token = None
+        self._last_render = 0.0
+        self._live = Live(
+            Spinner("pong", " "), console=console, refresh_per_second=12
+        )
+
+    @property
+    def text(self) -> str:
+        """
+        Get the text streamed so far.
+        """
+        return "".join(self.parts)
+
+    def on_token(self, token: str):
+        """
+        Add a streamed token to the rendered text.
+        """
+        now = time.perf_counter()
+        if self.time_to_first_token is None:
+            self.time_to_first_token = now - self.started
+        self.parts.append(token)
+        if now - self._last_render >= self.refresh_interval:
+            self._last_render = now
+            self._live.update(Markdown(self.text, style=self.style))
+
+    def discard(self):
+        """
+        Clear the text streamed so far, before a completion is retried.
+        """
+        self.parts.clear()
+        self._live.update(Spinner("pong", " "))
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        self._live.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.parts:
+            self._live.update(Markdown(self.text, style=self.style))
+        return self._live.__exit__(exc_type, exc_value, traceback)
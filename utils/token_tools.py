@@ -0,0 +1,58 @@
+# !/usr/bin/env python
+# coding: utf-8
+# Filename: token_tools.py
+# Path: utils/token_tools.py
+
+"""
+
+Token Tools
+===============
+This module contains the tiktoken helpers shared by the application.
+
+
+Functions
+---------
+get_encoding(model)
+    Get the cached tiktoken encoder for a model.
+count_tokens(text, model)
+    Count the tokens of a text for a model.
+
+"""
+from functools import lru_cache
+import tiktoken
+
+
+@lru_cache(maxsize=None)
+def get_encoding(model: str):
+    """
+    Get the tiktoken encoder for a model.
+
+    The encoder is loaded once per model and reused afterwards. Models
+    unknown to tiktoken fall back to the ``cl100k_base`` encoding.
+
+    Args:
+        model (str): The model name.
+
+    Returns:
+        tiktoken.Encoding: The encoder for the model.
+    """
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def count_tokens(text: str, model: str) -> int:
+    """
+    Count the tokens of a text.
+
+    Args:
+        text (str): The text to count.
+        model (str): The model name.
+
+    Returns:
+        int: The number of tokens.
+    """
+    if not text:
+        return 0
+    return len(get_encoding(model).encode(text))
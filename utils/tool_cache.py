@@ -0,0 +1,324 @@
+# !/usr/bin/env python
+# coding: utf-8
+# Filename: tool_cache.py
+# Path: utils/tool_cache.py
+
+"""
+
+Tool Cache
+===============
+This module contains the TTL result cache used by the tool dispatcher.
+
+Plugins declare a cache policy per tool in their ``cache_policies``
+dictionary, for example::
+
+    cache_policies = {
+        "get_current_weather": {
+            "ttl": 600,
+            "key_fields": ["location"],
+            "max_entries": 128,
+        },
+    }
+
+``ttl`` is in seconds (``None`` never expires), ``key_fields`` lists the
+arguments that identify a result (``None`` uses all of them) and
+``max_entries`` bounds the number of results kept for the tool.
+
+With a shared store, results are also written there, so the worker
+processes of the web server reuse each other's results. The dispatcher
+uses ``alookup`` and ``astore``, which reach the shared store from a worker
+thread instead of blocking the event loop.
+
+
+Classes
+-------
+ToolResultCache
+    Bounded per-tool cache of tool call results.
+
+"""
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from config import SHARED_STORE_ENABLED
+from utils.shared_store import shared_store
+
+
+class ToolResultCache:
+    """
+    Bounded per-tool cache of tool call results.
+
+    Only tools with a registered policy are cached; every other call is a
+    bypass. Each tool keeps its own LRU of at most ``max_entries`` results.
+    A local miss is looked up in the ``shared`` store, if any, before it
+    counts as a miss.
+    """
+
+    def __init__(self, shared=None):
+        self.shared = shared
+        self.policies = {}
+        self.counters = {}
+        self.shared_hits = 0
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def register(self, policies: dict):
+        """
+        Register the cache policies of a set of tools.
+
+        Args:
+            policies (dict): The cache policies keyed by tool name.
+        """
+        with self._lock:
+            for name, policy in policies.items():
+                self.policies[name] = {
+                    "ttl": policy.get("ttl"),
+                    "key_fields": policy.get("key_fields"),
+                    "max_entries": policy.get("max_entries", 128),
+                }
+                self._entries.setdefault(name, OrderedDict())
+
+    def make_key(self, name: str, args: dict) -> str:
+        """
+        Build the cache key of a tool call from its key fields.
+        """
+        key_fields = self.policies[name]["key_fields"]
+        if key_fields is not None:
+            args = {field: args.get(field) for field in key_fields}
+        return json.dumps(args, sort_keys=True, default=str)
+
+    def lookup(self, name: str, args: dict):
+        """
+        Look up the result of a tool call.
+
+        Args:
+            name (str): The tool name.
+            args (dict): The tool call arguments.
+
+        Returns:
+            tuple: The cache status (``hit``, ``miss`` or ``bypass``) and
+            the cached result on a hit.
+        """
+        status, key, result = self._lookup_local(name, args)
+        if status == "miss" and self.shared is not None:
+            found = self._adopt(
+                name, key, self.shared.entry(f"tool:{name}", key)
+            )
+            if found is not None:
+                status, result = "hit", found[0]
+        self._count(name, status)
+        return status, result
+
+    async def alookup(self, name: str, args: dict):
+        """
+        Look up the result of a tool call, reading the shared store in a
+        worker thread.
+
+        Returns:
+            tuple: The cache status and the cached result on a hit.
+        """
+        status, key, result = self._lookup_local(name, args)
+        if status == "miss" and self.shared is not None:
+            found = self._adopt(
+                name, key, await self.shared.aentry(f"tool:{name}", key)
+            )
+            if found is not None:
+                status, result = "hit", found[0]
+        self._count(name, status)
+        return status, result
+
+    def _lookup_local(self, name: str, args: dict):
+        """
+        Look up the result of a tool call in the LRU of the tool.
+
+        Returns:
+            tuple: The cache status, the cache key and the result on a hit.
+        """
+        if name not in self.policies:
+            return "bypass", None, None
+
+        key = self.make_key(name, args)
+        now = time.monotonic()
+        with self._lock:
+            entries = self._entries[name]
+            entry = entries.get(key)
+            if entry is not None:
+                expires, result = entry
+                if expires is None or expires > now:
+                    entries.move_to_end(key)
+                    return "hit", key, result
+                del entries[key]
+        return "miss", key, None
+
+    def _adopt(self, name: str, key: str, found):
+        """
+        Keep a result found in the shared store locally.
+        """
+        if found is None:
+            return None
+        result, remaining = found
+        expires = (
+            time.monotonic() + remaining if remaining is not None else None
+        )
+        with self._lock:
+            self._remember(name, key, expires, result)
+        self.shared_hits += 1
+        return found
+
+    def contains(self, name: str, args: dict) -> bool:
+        """
+        Check whether a fresh result is cached locally, without counting a
+        lookup.
+        """
+        if name not in self.policies:
+            return False
+        key = self.make_key(name, args)
+        with self._lock:
+            entry = self._entries[name].get(key)
+        return entry is not None and (
+            entry[0] is None or entry[0] > time.monotonic()
+        )
+
+    async def acached(self, name: str, args: dict):
+        """
+        Get a fresh cached result, locally or from the shared store,
+        without counting a lookup.
+
+        Returns:
+            The cached result, or ``None``.
+        """
+        if name not in self.policies:
+            return None
+        key = self.make_key(name, args)
+        with self._lock:
+            entry = self._entries[name].get(key)
+        if entry is not None and (
+            entry[0] is None or entry[0] > time.monotonic()
+        ):
+            return entry[1]
+        if self.shared is None:
+            return None
+        found = self._adopt(
+            name, key, await self.shared.aentry(f"tool:{name}", key)
+        )
+        return found[0] if found is not None else None
+
+    def store(self, name: str, args: dict, result):
+        """
+        Store the result of a tool call that has a cache policy.
+        """
+        key = self._store_local(name, args, result)
+        if (
+            key is not None
+            and self.shared is not None
+            and self._is_json(result)
+        ):
+            self.shared.set(
+                f"tool:{name}", key, result, self.policies[name]["ttl"]
+            )
+
+    async def astore(self, name: str, args: dict, result):
+        """
+        Store the result of a tool call, writing the shared store in a
+        worker thread.
+        """
+        key = self._store_local(name, args, result)
+        if (
+            key is not None
+            and self.shared is not None
+            and self._is_json(result)
+        ):
+            await self.shared.aset(
+                f"tool:{name}", key, result, self.policies[name]["ttl"]
+            )
+
+    def _store_local(self, name: str, args: dict, result):
+        """
+        Store a cacheable result in the LRU of the tool.
+
+        Returns:
+            str: The cache key, or ``None`` when the result is not cached.
+        """
+        if name not in self.policies or not self.is_cacheable(result):
+            return None
+
+        policy = self.policies[name]
+        expires = (
+            time.monotonic() + policy["ttl"]
+            if policy["ttl"] is not None else None
+        )
+        key = self.make_key(name, args)
+        with self._lock:
+            self._remember(name, key, expires, result)
+        return key
+
+    def _remember(self, name: str, key: str, expires, result):
+        """
+        Store a result in the LRU of a tool.
+        """
+        entries = self._entries[name]
+        entries[key] = (expires, result)
+        entries.move_to_end(key)
+        while len(entries) > self.policies[name]["max_entries"]:
+            entries.popitem(last=False)
+
+    @staticmethod
+    def _is_json(result) -> bool:
+        """
+        Check that a result survives a JSON round trip unchanged.
+        """
+        try:
+            return json.loads(json.dumps(result)) == result
+        except (TypeError, ValueError):
+            return False
+
+    @staticmethod
+    def is_cacheable(result) -> bool:
+        """
+        Check that a result is not empty and does not report an error.
+        """
+        if result in (None, "", "[]", "{}"):
+            return False
+        try:
+            decoded = json.loads(result)
+        except (TypeError, ValueError):
+            return True
+        return not (isinstance(decoded, dict) and "error" in decoded)
+
+    def _count(self, name: str, status: str):
+        """
+        Increment the counter of a tool's cache status.
+        """
+        counters = self.counters.setdefault(
+            name, {"hit": 0, "miss": 0, "bypass": 0}
+        )
+        counters[status] += 1
+
+    def stats(self):
+        """
+        Get the cache counters and sizes.
+        """
+        totals = {"hit": 0, "miss": 0, "bypass": 0}
+        for counters in self.counters.values():
+            for status, count in counters.items():
+                totals[status] += count
+        return {
+            "totals": totals,
+            "shared_hits": self.shared_hits,
+            "tools": {
+                name: {
+                    **self.counters.get(
+                        name, {"hit": 0, "miss": 0, "bypass": 0}
+                    ),
+                    "entries": len(self._entries.get(name, ())),
+                }
+                for name in self.policies
+            },
+        }
+
+
+# Define the tool result cache shared by every dispatcher.
+tool_result_cache = ToolResultCache(
+    shared=shared_store if SHARED_STORE_ENABLED else None
+)
@@ -0,0 +1,228 @@
+# !/usr/bin/env python
+# coding: utf-8
+# Filename: tool_dispatcher.py
+# Path: utils/tool_dispatcher.py
+
+"""
+
+Tool Dispatcher
+===============
+This module runs the tool calls requested by the model in a single turn.
+
+
+Classes
+-------
+ToolDispatcher
+    Execute a turn's tool calls concurrently and record per-call timings.
+
+"""
+import asyncio
+import inspect
+import json
+import time
+from collections import deque
+
+from utils.circuit_breaker import CircuitOpenError
+
+
+class ToolDispatcher:
+    """
+    Execute the tool calls of a single model turn.
+
+    Independent tool calls are run concurrently, bounded by
+    ``max_concurrency``. The tool messages are returned in the order the
+    model issued the calls, and the timing of every call is recorded so the
+    critical path of each turn can be inspected. Repeated calls are served
+    from ``result_cache`` when their tool declares a cache policy, and calls
+    started early by the tool prefetcher are served from their batch.
+    Calls are run by ``executor``, which keeps blocking tools off the event
+    loop.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 4,
+        history_size: int = 50,
+        result_cache=None,
+        executor=None,
+    ):
+        self.max_concurrency = max(1, max_concurrency)
+        self.history = deque(maxlen=history_size)
+        self.result_cache = result_cache
+        self.executor = executor
+
+    async def dispatch(
+        self, tool_calls, available_functions, prefetched=None, on_event=None
+    ):
+        """
+        Run the tool calls and build their tool messages.
+
+        Args:
+            tool_calls (list): The tool calls returned by the model.
+            available_functions (dict): The functions keyed by tool name.
+            prefetched (PrefetchBatch): The calls started by the prefetcher.
+            on_event (callable): Called with ``"tool_start"`` or
+                ``"tool_end"`` and the call details as each call starts and
+                finishes.
+
+        Returns:
+            tuple: The tool messages in the original ``tool_call`` order and
+            the metadata of each call (timings and cache status).
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        turn_start = time.perf_counter()
+
+        results = await asyncio.gather(
+            *(
+                self._run_tool_call(
+                    tool_call,
+                    available_functions[tool_call.function.name],
+                    semaphore,
+                    turn_start,
+                    prefetched,
+                    on_event,
+                )
+                for tool_call in tool_calls
+                if tool_call.function.name in available_functions
+            )
+        )
+
+        messages = [message for message, _ in results]
+        timings = [timing for _, timing in results]
+
+        if timings:
+            critical = max(timings, key=lambda timing: timing["finished"])
+            self.history.append(
+                {
+                    "calls": timings,
+                    "wall_time": critical["finished"],
+                    "serial_time": sum(t["duration"] for t in timings),
+                    "critical_path": critical["name"],
+                }
+            )
+
+        return messages, timings
+
+    async def _run_tool_call(
+        self,
+        tool_call,
+        function_to_call,
+        semaphore,
+        turn_start,
+        prefetched,
+        on_event=None,
+    ):
+        """
+        Run one tool call once a concurrency slot is free.
+        """
+        function_name = tool_call.function.name
+        cache_status = "bypass"
+        function_args = {}
+        prefetch_call = None
+
+        async with semaphore:
+            started = time.perf_counter()
+            if on_event is not None:
+                on_event(
+                    "tool_start", {"id": tool_call.id, "name": function_name}
+                )
+            try:
+                function_args = json.loads(tool_call.function.arguments or "{}")
+
+                if self.result_cache is not None:
+                    cache_status, cached_response = (
+                        await self.result_cache.alookup(
+                            function_name, function_args
+                        )
+                    )
+
+                if cache_status != "hit" and prefetched is not None:
+                    prefetch_call = prefetched.claim(function_name, function_args)
+
+                if cache_status == "hit":
+                    function_response = cached_response
+                elif prefetch_call is not None:
+                    function_response = await prefetch_call[1]
+                elif self.executor is not None:
+                    function_response = await self.executor.run(
+                        function_name, function_to_call, function_args
+                    )
+                elif inspect.iscoroutinefunction(function_to_call):
+                    function_response = await function_to_call(**function_args)
+                else:
+                    function_response = function_to_call(**function_args)
+
+            # An upstream that keeps failing is not called, the model is told
+            # when to try again.
+            except CircuitOpenError as error:
+                function_response = json.dumps(
+                    {
+                        "error": f"{function_name} is temporarily unavailable",
+                        "upstream": error.upstream,
+                        "retry_after": round(error.retry_after),
+                    }
+                )
+            # A failing tool must not cancel the other calls of the turn,
+            # so the error is reported back to the model instead.
+            except Exception as error:  # pylint: disable=broad-except
+                function_response = json.dumps(
+                    {
+                        "error": f"{function_name} failed",
+                        "details": str(error),
+                    }
+                )
+            finished = time.perf_counter()
+
+        if function_response is None:
+            function_response = "No response received from the function."
+        else:
+            if not isinstance(function_response, str):
+                function_response = json.dumps(function_response)
+            if cache_status == "miss":
+                # A prefetched result is stored under the arguments it was
+                # fetched with.
+                await self.result_cache.astore(
+                    function_name,
+                    prefetch_call[0] if prefetch_call is not None
+                    else function_args,
+                    function_response,
+                )
+
+        function_response_message = {
+            "role": "tool",
+            "name": function_name,
+            "content": function_response,
+            "tool_call_id": tool_call.id,
+        }
+
+        timing = {
+            "tool_call_id": tool_call.id,
+            "name": function_name,
+            "queued": started - turn_start,
+            "duration": finished - started,
+            "finished": finished - turn_start,
+            "cache": cache_status,
+            "prefetched": prefetch_call is not None,
+        }
+        if on_event is not None:
+            on_event(
+                "tool_end",
+                {
+                    "id": tool_call.id,
+                    "name": function_name,
+                    "duration_ms": round(timing["duration"] * 1000, 1),
+                    "cache": cache_status,
+                },
+            )
+
+        return function_response_message, timing
+
+    def stats(self):
+        """
+        Get the metadata of the most recent dispatched turns.
+        """
+        return {
+            "max_concurrency": self.max_concurrency,
+            "executor": self.executor.stats() if self.executor else None,
+            "turns": list(self.history),
+        }
@@ -0,0 +1,171 @@
+# !/usr/bin/env python
+# coding: utf-8
+# Filename: tool_executor.py
+# Path: utils/tool_executor.py
+
+"""
+
+Tool Executor
+===============
+This module runs tool functions without blocking the event loop.
+
+Coroutine tools run on the event loop and plain functions in a bounded
+thread pool. Plugins override this per tool in their ``execution_modes``
+dictionary, for example::
+
+    execution_modes = {
+        "get_vehicle_details_by_vin_asynchronous": "thread",
+        "list_events": {"mode": "thread", "group": "calendar"},
+    }
+
+``"thread"`` runs the tool in a worker thread, a coroutine tool that blocks
+inside (``requests``, Google API ``execute()``) then runs on its own event
+loop in that thread. ``"loop"`` runs the tool on the event loop, for cheap
+functions. Calls sharing a ``group`` run one at a time, for clients that
+are not thread-safe.
+
+
+Classes
+-------
+ToolExecutor
+    Run tools on the event loop or in a bounded thread pool.
+
+"""
+import asyncio
+import inspect
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from config import TOOL_THREAD_WORKERS
+
+
+async def resolve(awaitable):
+    """
+    Await any awaitable, so it can be run by ``asyncio.run``.
+    """
+    return await awaitable
+
+
+class ToolExecutor:
+    """
+    Run tools on the event loop or in a bounded thread pool.
+
+    At most ``max_workers`` blocking tools run at once, the others wait in
+    the pool queue; the time they waited is recorded.
+    """
+
+    def __init__(self, max_workers: int = 8):
+        self.max_workers = max(1, max_workers)
+        self.modes = {}
+        self.counters = {"loop": 0, "thread": 0}
+        self.busy = 0
+        self.peak_busy = 0
+        self.wait_time = 0.0
+        self.max_wait = 0.0
+        self._executor = None
+        self._groups = {}
+        self._lock = threading.Lock()
+
+    def register(self, modes: dict):
+        """
+        Register the execution modes of a set of tools.
+
+        Args:
+            modes (dict): The modes keyed by tool name, either ``"loop"``,
+                ``"thread"`` or a dictionary with a ``mode`` and a ``group``.
+        """
+        for name, mode in modes.items():
+            if isinstance(mode, str):
+                mode = {"mode": mode}
+            self.modes[name] = {
+                "mode": mode.get("mode", "thread"),
+                "group": mode.get("group"),
+            }
+
+    def mode(self, name: str, function) -> str:
+        """
+        Get where a tool runs, ``"loop"`` or ``"thread"``.
+        """
+        policy = self.modes.get(name)
+        if policy is not None:
+            return policy["mode"]
+        return "loop" if inspect.iscoroutinefunction(function) else "thread"
+
+    async def run(self, name: str, function, args: dict):
+        """
+        Run a tool call.
+
+        Args:
+            name (str): The tool name.
+            function (callable): The tool function.
+            args (dict): The call arguments.
+
+        Returns:
+            The result of the tool.
+        """
+        if self.mode(name, function) == "loop":
+            self.counters["loop"] += 1
+            result = function(**args)
+            if inspect.isawaitable(result):
+                result = await result
+            return result
+
+        group = self.modes.get(name, {}).get("group")
+        if group is None:
+            return await self._submit(function, args)
+        lock = self._groups.setdefault(group, asyncio.Lock())
+        async with lock:
+            return await self._submit(function, args)
+
+    async def _submit(self, function, args: dict):
+        """
+        Run a tool in the thread pool and wait for its result.
+        """
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="tool"
+            )
+        self.counters["thread"] += 1
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, self._call, function, args, time.perf_counter()
+        )
+
+    def _call(self, function, args: dict, submitted: float):
+        """
+        Run a tool in a worker thread.
+        """
+        waited = time.perf_counter() - submitted
+        with self._lock:
+            self.busy += 1
+            self.peak_busy = max(self.peak_busy, self.busy)
+            self.wait_time += waited
+            self.max_wait = max(self.max_wait, waited)
+        try:
+            result = function(**args)
+            if inspect.isawaitable(result):
+                result = asyncio.run(resolve(result))
+            return result
+        finally:
+            with self._lock:
+                self.busy -= 1
+
+    def stats(self):
+        """
+        Get the execution counters.
+        """
+        threaded = self.counters["thread"]
+        return {
+            "max_workers": self.max_workers,
+            "calls": dict(self.counters),
+            "busy": self.busy,
+            "peak_busy": self.peak_busy,
+            "average_wait_ms": round(
+                self.wait_time / threaded * 1000 if threaded else 0.0, 3
+            ),
+            "max_wait_ms": round(self.max_wait * 1000, 3),
+        }
+
+
+# Define the tool executor shared by the dispatcher, prefetcher and fast path.
+tool_executor = ToolExecutor(max_workers=TOOL_THREAD_WORKERS)
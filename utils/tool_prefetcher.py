@@ -0,0 +1,348 @@
+# !/usr/bin/env python
+# coding: utf-8
+# Filename: tool_prefetcher.py
+# Path: utils/tool_prefetcher.py
+
+"""
+
+Tool Prefetcher
+===============
+This module starts the tool calls a user input is likely to need while the
+first completion of the turn is still running.
+
+Plugins declare prefetch rules per tool in their ``prefetch_rules``
+dictionary, for example::
+
+    prefetch_rules = {
+        "get_articles_newsapi": {
+            "pattern": r"\\bnews (?:about|on) (?P<q>[^?.!]+)",
+        },
+    }
+
+``pattern`` is matched against the user input and its named groups are
+the call arguments. ``arguments`` may instead be a callable building the
+arguments from the input, returning ``None`` to skip the prefetch.
+
+A model call is served the prefetched result only when its arguments,
+completed with the parameter defaults of the tool, are the prefetched
+ones.
+
+
+Classes
+-------
+PrefetchBatch
+    The prefetched tool calls of a single turn.
+ToolPrefetcher
+    Local classifier starting the likely tool calls of a user input.
+
+"""
+import asyncio
+import inspect
+import json
+import re
+import time
+
+from config import (
+    PREFETCH_ENABLED,
+    PREFETCH_MAX_CALLS,
+    PREFETCH_MAX_WASTED,
+    PREFETCH_SUSPEND_SECONDS,
+)
+from utils.tool_cache import tool_result_cache
+from utils.tool_executor import tool_executor
+
+
+def complete_arguments(function, args: dict) -> dict:
+    """
+    Add the default values of the parameters a call leaves out.
+    """
+    try:
+        bound = inspect.signature(function).bind_partial(**args)
+    except (TypeError, ValueError):
+        return args
+    bound.apply_defaults()
+    return dict(bound.arguments)
+
+
+def normalize_arguments(function, args: dict) -> str:
+    """
+    Build the key comparing prefetched and requested arguments.
+
+    The arguments are completed with the parameter defaults, and string
+    values are compared without case and surrounding whitespace.
+    """
+    args = complete_arguments(function, args)
+    return json.dumps(
+        {
+            name: value.strip().casefold() if isinstance(value, str) else value
+            for name, value in args.items()
+        },
+        sort_keys=True,
+        default=str,
+    )
+
+
+class PrefetchBatch:
+    """
+    The prefetched tool calls of a single turn.
+
+    The dispatcher ``claim``s the call matching a tool call of the model,
+    with the arguments it was fetched with. The awaited ``close`` cancels
+    the calls that were never claimed and counts them as wasted; finished
+    results are kept in the tool result cache when their tool has a cache
+    policy.
+    """
+
+    def __init__(self, prefetcher):
+        self.prefetcher = prefetcher
+        self._calls = {}
+        self._functions = {}
+
+    def add(self, name: str, function, args: dict, task):
+        """
+        Add a started tool call.
+        """
+        self._functions[name] = function
+        key = normalize_arguments(function, args)
+        self._calls[(name, key)] = (args, task)
+
+    def claim(self, name: str, args: dict):
+        """
+        Take the prefetched call matching a tool call.
+
+        Args:
+            name (str): The tool name.
+            args (dict): The arguments requested by the model.
+
+        Returns:
+            tuple: The prefetched arguments and call, or ``None`` without a
+            match.
+        """
+        function = self._functions.get(name)
+        if function is None:
+            return None
+        key = normalize_arguments(function, args)
+        call = self._calls.pop((name, key), None)
+        if call is None:
+            return None
+        self.prefetcher.record(name, used=True)
+        return call
+
+    async def close(self):
+        """
+        Release the calls that were never claimed.
+        """
+        cache = self.prefetcher.result_cache
+        for (name, _), (args, task) in self._calls.items():
+            self.prefetcher.record(name, used=False)
+            if not task.done():
+                task.cancel()
+            elif (
+                cache is not None
+                and not task.cancelled()
+                and task.exception() is None
+            ):
+                result = task.result()
+                if not isinstance(result, str):
+                    result = json.dumps(result)
+                await cache.astore(name, args, result)
+        self._calls.clear()
+        self._functions.clear()
+
+    def __len__(self):
+        return len(self._calls)
+
+
+class ToolPrefetcher:
+    """
+    Local classifier starting the likely tool calls of a user input.
+
+    At most ``max_calls`` calls are started per turn. A rule whose
+    prefetches were wasted ``max_wasted`` more times than they were used
+    is suspended for ``suspend_for`` seconds, so a rule that keeps guessing
+    wrong stops costing upstream calls. The balance then starts over, so
+    the rule comes back when the workload changes.
+    """
+
+    def __init__(
+        self,
+        max_calls: int = 2,
+        max_wasted: int = 5,
+        suspend_for: float = 600.0,
+        result_cache=None,
+        executor=None,
+        enabled: bool = True,
+    ):
+        self.enabled = enabled
+        self.max_calls = max_calls
+        self.max_wasted = max_wasted
+        self.suspend_for = suspend_for
+        self.result_cache = result_cache
+        self.executor = executor
+        self.rules = {}
+        self.counters = {}
+        self._balance = {}
+        self._suspended_until = {}
+
+    def register(self, rules: dict):
+        """
+        Register the prefetch rules of a set of tools.
+
+        Args:
+            rules (dict): The prefetch rules keyed by tool name.
+        """
+        for name, rule in rules.items():
+            self.rules[name] = {
+                "pattern": re.compile(rule["pattern"], re.IGNORECASE),
+                "arguments": rule.get("arguments"),
+            }
+
+    def predict(self, user_input: str, enabled=None) -> list[tuple[str, dict]]:
+        """
+        Predict the tool calls a user input is likely to need.
+
+        Args:
+            user_input (str): The user input.
+            enabled (set): The names of the tools sent with the request.
+
+        Returns:
+            list: At most ``max_calls`` ``(name, arguments)`` pairs.
+        """
+        calls = []
+        for name, rule in self.rules.items():
+            if len(calls) >= self.max_calls:
+                break
+            if enabled is not None and name not in enabled:
+                continue
+            if self.is_suspended(name):
+                continue
+            match = rule["pattern"].search(user_input)
+            if match is None:
+                continue
+            if rule["arguments"] is not None:
+                args = rule["arguments"](user_input)
+                if args is None:
+                    continue
+            else:
+                args = {
+                    field: value.strip()
+                    for field, value in match.groupdict().items()
+                    if value
+                }
+            calls.append((name, args))
+        return calls
+
+    def start(self, user_input: str, available_functions: dict, tools=None):
+        """
+        Start the likely tool calls of a user input in the background.
+
+        Calls whose result is already cached are not started.
+
+        Args:
+            user_input (str): The user input.
+            available_functions (dict): The functions keyed by tool name.
+            tools (list): The tool schemas sent with the request.
+
+        Returns:
+            PrefetchBatch: The started calls.
+        """
+        batch = PrefetchBatch(self)
+        if not self.enabled or not self.rules:
+            return batch
+
+        enabled = (
+            {tool["function"]["name"] for tool in tools}
+            if tools is not None else None
+        )
+        for name, args in self.predict(user_input, enabled):
+            function = available_functions.get(name)
+            if function is None:
+                continue
+            if self.result_cache is not None and self.result_cache.contains(
+                name, args
+            ):
+                continue
+            batch.add(
+                name,
+                function,
+                args,
+                asyncio.create_task(self._call(name, function, args)),
+            )
+            self._count(name, "started")
+        return batch
+
+    async def _call(self, name: str, function, args: dict):
+        """
+        Run a tool function without blocking the event loop.
+
+        A result another worker cached since the turn started is returned
+        without calling the tool.
+        """
+        if self.result_cache is not None:
+            cached = await self.result_cache.acached(name, args)
+            if cached is not None:
+                return cached
+        if self.executor is not None:
+            return await self.executor.run(name, function, args)
+        if inspect.iscoroutinefunction(function):
+            return await function(**args)
+        return await asyncio.to_thread(function, **args)
+
+    def is_suspended(self, name: str) -> bool:
+        """
+        Check whether a rule is suspended for wasting too many prefetches.
+        """
+        return self._suspended_until.get(name, 0.0) > time.monotonic()
+
+    def record(self, name: str, used: bool):
+        """
+        Count a prefetched call as used or wasted.
+        """
+        self._count(name, "used" if used else "wasted")
+        balance = max(0, self._balance.get(name, 0) + (-1 if used else 1))
+        if balance >= self.max_wasted:
+            self._suspended_until[name] = time.monotonic() + self.suspend_for
+            balance = 0
+        self._balance[name] = balance
+
+    def _count(self, name: str, status: str):
+        """
+        Increment the counter of a rule.
+        """
+        counters = self.counters.setdefault(
+            name, {"started": 0, "used": 0, "wasted": 0}
+        )
+        counters[status] += 1
+
+    def stats(self):
+        """
+        Get the prefetch counters.
+        """
+        totals = {"started": 0, "used": 0, "wasted": 0}
+        for counters in self.counters.values():
+            for status, count in counters.items():
+                totals[status] += count
+        return {
+            "max_calls": self.max_calls,
+            "totals": totals,
+            "tools": {
+                name: {
+                    **self.counters.get(
+                        name, {"started": 0, "used": 0, "wasted": 0}
+                    ),
+                    "suspended": self.is_suspended(name),
+                }
+                for name in self.rules
+            },
+        }
+
+
+# Define the tool prefetcher shared by the CLI and web app.
+tool_prefetcher = ToolPrefetcher(
+    max_calls=PREFETCH_MAX_CALLS,
+    max_wasted=PREFETCH_MAX_WASTED,
+    suspend_for=PREFETCH_SUSPEND_SECONDS,
+    result_cache=tool_result_cache,
+    executor=tool_executor,
+    enabled=PREFETCH_ENABLED,
+)
@@ -0,0 +1,210 @@
+# !/usr/bin/env python
+# coding: utf-8
+# Filename: tool_registry.py
+# Path: utils/tool_registry.py
+
+"""
+
+Tool Registry
+===============
+This module contains the tool registry shared by the CLI and web app.
+
+
+Classes
+-------
+RegisteredTool
+    A tool schema with its function, serialized form and token cost.
+ToolRegistry
+    Index of every enabled tool, built once at startup.
+ToolSession
+    Per-session view of a registry with O(1) enable and disable.
+
+"""
+import json
+
+from utils.token_tools import count_tokens
+
+
+class RegisteredTool:
+    """
+    A tool schema with its function, serialized form and token cost.
+    """
+
+    __slots__ = ("name", "schema", "function", "serialized", "token_cost")
+
+    def __init__(self, schema: dict, function, model: str):
+        self.name = schema["function"]["name"]
+        self.schema = schema
+        self.function = function
+        self.serialized = json.dumps(schema, separators=(",", ":"))
+        self.token_cost = count_tokens(self.serialized, model)
+
+
+class ToolRegistry:
+    """
+    Index of every enabled tool, built once at startup.
+
+    Tools are indexed by name, and each schema is serialized and its token
+    cost counted once when it is registered. The full schema list and the
+    function map are cached until the next registration.
+    """
+
+    def __init__(self, model: str = "gpt-4"):
+        self.model = model
+        self.version = 0
+        self._tools = {}
+        self._schemas = None
+        self._functions = None
+
+    def register(self, schema: dict, function):
+        """
+        Register a tool schema and its function.
+
+        Args:
+            schema (dict): The OpenAI tool schema.
+            function (callable): The function called for the tool.
+        """
+        existing = self._tools.get(schema["function"]["name"])
+        if existing is not None and existing.schema == schema:
+            # Only the function changed, the schema payload is unchanged.
+            existing.function = function
+            self._functions = None
+            return
+
+        tool = RegisteredTool(schema, function, self.model)
+        self._tools[tool.name] = tool
+        self.version += 1
+        self._schemas = None
+        self._functions = None
+
+    def register_many(self, tools: list, available_functions: dict):
+        """
+        Register the tools that have a matching function.
+
+        Args:
+            tools (list): The OpenAI tool schemas.
+            available_functions (dict): The functions keyed by tool name.
+        """
+        for schema in tools:
+            name = schema["function"]["name"]
+            if name in available_functions:
+                self.register(schema, available_functions[name])
+
+    def get(self, name: str) -> RegisteredTool:
+        """
+        Get a registered tool by name.
+        """
+        return self._tools.get(name)
+
+    def names(self):
+        """
+        Get the registered tool names.
+        """
+        return self._tools.keys()
+
+    def schemas(self) -> list:
+        """
+        Get every tool schema, in registration order.
+
+        The list is shared and must not be modified.
+        """
+        if self._schemas is None:
+            self._schemas = [tool.schema for tool in self._tools.values()]
+        return self._schemas
+
+    @property
+    def functions(self) -> dict:
+        """
+        Get the functions keyed by tool name.
+
+        The dictionary is shared and must not be modified.
+        """
+        if self._functions is None:
+            self._functions = {
+                name: tool.function for name, tool in self._tools.items()
+            }
+        return self._functions
+
+    def session(self):
+        """
+        Create a session view of the registry.
+        """
+        return ToolSession(self)
+
+    def __contains__(self, name):
+        return name in self._tools
+
+    def __len__(self):
+        return len(self._tools)
+
+    def __iter__(self):
+        return iter(self._tools.values())
+
+
+class ToolSession:
+    """
+    Per-session view of a tool registry.
+
+    Enabling or disabling a tool only updates a set of disabled names. The
+    payload returned by ``tools`` is the registry's shared list when nothing
+    is disabled, and a cached filtered list otherwise.
+    """
+
+    def __init__(self, registry: ToolRegistry):
+        self.registry = registry
+        self.disabled = set()
+        self._payload = None
+        self._payload_key = None
+
+    def enable(self, name: str):
+        """
+        Enable a tool for this session.
+        """
+        if name in self.disabled:
+            self.disabled.discard(name)
+            self._payload = None
+
+    def disable(self, name: str):
+        """
+        Disable a tool for this session.
+        """
+        if name in self.registry and name not in self.disabled:
+            self.disabled.add(name)
+            self._payload = None
+
+    def is_enabled(self, name: str) -> bool:
+        """
+        Check whether a tool is enabled for this session.
+        """
+        return name in self.registry and name not in self.disabled
+
+    def tools(self) -> list:
+        """
+        Get the tool schemas to send with a request.
+        """
+        if not self.disabled:
+            return self.registry.schemas()
+        if self._payload is None or self._payload_key != self.registry.version:
+            self._payload = [
+                tool.schema for tool in self.registry
+                if tool.name not in self.disabled
+            ]
+            self._payload_key = self.registry.version
+        return self._payload
+
+    @property
+    def available_functions(self) -> dict:
+        """
+        Get the functions keyed by tool name.
+        """
+        return self.registry.functions
+
+    @property
+    def token_cost(self) -> int:
+        """
+        Get the token cost of the enabled tool schemas.
+        """
+        return sum(
+            tool.token_cost for tool in self.registry
+            if tool.name not in self.disabled
+        )
@@ -0,0 +1,208 @@
+# !/usr/bin/env python
+# coding: utf-8
+# Filename: tool_selector.py
+# Path: utils/tool_selector.py
+
+"""
+
+Tool Selector
+===============
+This module ranks the registered tools against the user input so only the
+relevant tool schemas are sent with a request.
+
+
+Functions
+---------
+tokenize(text)
+    Split a text into normalized search terms.
+
+
+Classes
+-------
+ToolSelector
+    Local BM25 ranker over the tool names and descriptions.
+
+"""
+import math
+import re
+from collections import Counter
+
+TERM_PATTERN = re.compile(r"[a-z0-9]+")
+
+STOP_WORDS = frozenset(
+    {
+        "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "for",
+        "from", "get", "how", "i", "in", "is", "it", "me", "my", "of", "on",
+        "or", "please", "that", "the", "this", "to", "what", "with", "you",
+        "your", "function", "allows",
+    }
+)
+
+
+def tokenize(text: str) -> list[str]:
+    """
+    Split a text into normalized search terms.
+
+    Snake case names are split on underscores, stop words are dropped and
+    a trailing plural ``s`` is removed.
+    """
+    terms = []
+    for term in TERM_PATTERN.findall(text.lower()):
+        if term in STOP_WORDS:
+            continue
+        if len(term) > 3 and term.endswith("s") and not term.endswith("ss"):
+            term = term[:-1]
+        terms.append(term)
+    return terms
+
+
+def tool_document(schema: dict) -> str:
+    """
+    Build the searchable text of a tool schema.
+    """
+    function = schema.get("function", {})
+    parts = [
+        function.get("name", "").replace("_", " "),
+        function.get("description", ""),
+    ]
+    properties = function.get("parameters", {}).get("properties", {})
+    for name, prop in properties.items():
+        parts.append(name)
+        parts.append(prop.get("description", ""))
+    return " ".join(parts)
+
+
+class ToolSelector:
+    """
+    Local BM25 ranker over the tool names and descriptions.
+
+    The index is built from a ToolRegistry and rebuilt only when the
+    registry changes. ``select`` keeps the always-on tools plus the
+    ``top_k`` best matching tools, in their original order.
+    """
+
+    def __init__(
+        self,
+        registry,
+        top_k: int = 8,
+        always_on=(),
+        k1: float = 1.5,
+        b: float = 0.75,
+    ):
+        self.registry = registry
+        self.top_k = top_k
+        self.always_on = set(always_on)
+        self.k1 = k1
+        self.b = b
+        self._version = None
+        self._postings = {}
+        self._idf = {}
+        self._lengths = {}
+        self._average_length = 0.0
+        self.selections = 0
+        self.tools_sent = 0
+        self.fallbacks = 0
+
+    def _build_index(self):
+        """
+        Build the inverted index of the registered tools.
+        """
+        postings = {}
+        lengths = {}
+        for tool in self.registry:
+            terms = Counter(tokenize(tool_document(tool.schema)))
+            lengths[tool.name] = sum(terms.values())
+            for term, frequency in terms.items():
+                postings.setdefault(term, []).append((tool.name, frequency))
+
+        count = len(lengths)
+        self._postings = postings
+        self._lengths = lengths
+        self._average_length = sum(lengths.values()) / count if count else 0.0
+        self._idf = {
+            term: math.log(
+                1 + (count - len(docs) + 0.5) / (len(docs) + 0.5)
+            )
+            for term, docs in postings.items()
+        }
+        self._version = self.registry.version
+
+    def rank(self, query: str) -> list[tuple[str, float]]:
+        """
+        Rank the tools matching a query.
+
+        Args:
+            query (str): The user input.
+
+        Returns:
+            list: The ``(name, score)`` pairs of matching tools, best first.
+        """
+        if self._version != self.registry.version:
+            self._build_index()
+
+        scores = {}
+        for term in set(tokenize(query)):
+            idf = self._idf.get(term)
+            if idf is None:
+                continue
+            for name, frequency in self._postings[term]:
+                norm = self.k1 * (
+                    1 - self.b
+                    + self.b * self._lengths[name] / self._average_length
+                )
+                scores[name] = scores.get(name, 0.0) + idf * (
+                    frequency * (self.k1 + 1) / (frequency + norm)
+                )
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+    def select(self, query: str, tools: list) -> list:
+        """
+        Select the tool schemas to send for a query.
+
+        Args:
+            query (str): The user input.
+            tools (list): The enabled tool schemas.
+
+        Returns:
+            list: The always-on tools and the ``top_k`` best matches, or
+            ``tools`` itself when selection would not drop anything or
+            would leave no tool at all.
+        """
+        if self.top_k <= 0 or len(tools) <= self.top_k + len(self.always_on):
+            return tools
+
+        chosen = set(self.always_on)
+        for name, _ in self.rank(query)[:self.top_k]:
+            chosen.add(name)
+
+        selected = [
+            tool for tool in tools
+            if tool["function"]["name"] in chosen
+        ]
+        if not selected:
+            # An empty tool list is rejected by the API.
+            return tools
+        self.selections += 1
+        self.tools_sent += len(selected)
+        return selected
+
+    def record_fallback(self):
+        """
+        Record a turn retried with every tool because the model called a
+        tool that was not sent.
+        """
+        self.fallbacks += 1
+
+    def stats(self):
+        """
+        Get the selection counters.
+        """
+        return {
+            "top_k": self.top_k,
+            "always_on": sorted(self.always_on),
+            "selections": self.selections,
+            "average_tools_sent": (
+                self.tools_sent / self.selections if self.selections else 0
+            ),
+            "fallbacks": self.fallbacks,
+        }
@@ -1,27 +1,61 @@
 import os
 import re
+import time
 import asyncio
-from quart import Quart, request, jsonify, send_file, send_from_directory
+from collections import deque
+from quart import (
+    Quart,
+    request,
+    jsonify,
+    make_response,
+    send_file,
+    send_from_directory,
+)
 from quart_cors import cors
+from rich.console import Console
 from hypercorn.config import Config
 from hypercorn.asyncio import serve
-from config import MAIN_SYSTEM_PROMPT
-from app import run_conversation, enable_plugins
-from utils.openai_model_tools import (
-    ask_chat_gpt_4_0314_synchronous,
-    ask_chat_gpt_4_0314_asynchronous,
-    ask_chat_gpt_4_32k_0314_synchronous,
-    ask_chat_gpt_4_32k_0314_asynchronous,
-    ask_chat_gpt_4_0613_synchronous,
-    ask_chat_gpt_4_0613_asynchronous,
-    ask_gpt_4_vision,
+from hypercorn.run import run as hypercorn_run
+from config import (
+    MAIN_SYSTEM_PROMPT,
+    OPENAI_MODEL,
+    TOOL_SELECTION_TOP_K,
+    TOOL_SELECTION_ALWAYS_ON,
+    SESSION_STORE_MAX_SESSIONS,
+    SESSION_IDLE_TTL,
+    SESSION_STORE_PERSIST,
+    SESSION_STORE_PATH,
+    ADMISSION_CONTROL_ENABLED,
+    ADMISSION_MAX_IN_FLIGHT,
+    ADMISSION_MAX_QUEUE,
+    ADMISSION_QUEUE_TIMEOUT,
+    WEB_WORKERS,
+)
+from app import (
+    run_conversation,
+    run_fast_path,
+    enable_plugins,
+    fast_path_router,
+    memory_compactor,
+    memory_retriever,
+)
+from utils.base_tools import (
+    base_tool_list,
+    available_functions as base_functions,
 )
-from utils.openai_dalle_tools import generate_an_image_with_dalle3
-from utils.core_tools import get_current_date_time
+from utils.tool_registry import ToolRegistry
+from utils.tool_selector import ToolSelector
+from utils.session_store import SessionStore, is_session_id
+from utils.admission_controller import AdmissionController, AdmissionRejected
+from utils.tool_prefetcher import tool_prefetcher
+from utils.shared_store import shared_store
+from utils.stream_tools import EventChannel, format_sse
 
 app = Quart(__name__)
 app = cors(app, allow_origin="*")
 
+console = Console()
+
 
 @app.route("/")
 async def index():
@@ -48,247 +82,80 @@ def format_response_text(response_text):
     return response_text
 
 
-available_functions = {
-    "get_current_date_time": get_current_date_time,
-    "ask_chat_gpt_4_0314_synchronous": ask_chat_gpt_4_0314_synchronous,
-    "ask_chat_gpt_4_0314_asynchronous": ask_chat_gpt_4_0314_asynchronous,
-    "ask_chat_gpt_4_32k_0314_synchronous": ask_chat_gpt_4_32k_0314_synchronous,
-    "ask_chat_gpt_4_32k_0314_asynchronous": ask_chat_gpt_4_32k_0314_asynchronous,
-    "ask_chat_gpt_4_0613_synchronous": ask_chat_gpt_4_0613_synchronous,
-    "ask_chat_gpt_4_0613_asynchronous": ask_chat_gpt_4_0613_asynchronous,
-    "generate_an_image_with_dalle3": generate_an_image_with_dalle3,
-    "ask_gpt_4_vision": ask_gpt_4_vision,
-}
-
-tools = [
-    {
-        "type": "function",
-        "function": {
-            "name": "get_current_date_time",
-            "description": "Get the current date and time from the local machine.",
-        },
-    },
-    {
-        "type": "function",
-        "function": {
-            "name": "ask_chat_gpt_4_0314_synchronous",
-            "description": "Ask a more experienced colleague for assistance.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "temperature": {
-                        "type": "integer",
-                        "description": "The temperature associated with request: 0 for factual, 2 for creative.",
-                    },
-                    "question": {
-                        "type": "string",
-                        "description": "What are you, the ai assistant, requesting to be done with the text you are providing?",
-                    },
-                    "text": {
-                        "type": "string",
-                        "description": "The text to be analyzed",
-                    },
-                },
-                "required": ["question", "text"],
-            },
-        },
-    },
-    {
-        "type": "function",
-        "function": {
-            "name": "ask_chat_gpt_4_0314_asynchronous",
-            "description": "Ask a more experienced colleague for assistance.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "temperature": {
-                        "type": "integer",
-                        "description": "The temperature associated with request: 0 for factual, 2 for creative.",
-                    },
-                    "question": {
-                        "type": "string",
-                        "description": "What are you, the ai assistant, requesting to be done with the text you are providing?",
-                    },
-                    "text": {
-                        "type": "string",
-                        "description": "The text to be analyzed",
-                    },
-                },
-                "required": ["question", "text"],
-            },
-        },
-    },
-    {
-        "type": "function",
-        "function": {
-            "name": "ask_chat_gpt_4_32k_0314_synchronous",
-            "description": "Ask a more experienced colleague for assistance.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "temperature": {
-                        "type": "integer",
-                        "description": "The temperature associated with request: 0 for factual, 2 for creative.",
-                    },
-                    "question": {
-                        "type": "string",
-                        "description": "What are you, the ai assistant, requesting to be done with the text you are providing?",
-                    },
-                    "text": {
-                        "type": "string",
-                        "description": "The text to be analyzed",
-                    },
-                },
-                "required": ["question", "text"],
-            },
-        },
-    },
-    {
-        "type": "function",
-        "function": {
-            "name": "ask_chat_gpt_4_32k_0314_asynchronous",
-            "description": "Ask a more experienced colleague for assistance.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "temperature": {
-                        "type": "integer",
-                        "description": "The temperature associated with request: 0 for factual, 2 for creative.",
-                    },
-                    "question": {
-                        "type": "string",
-                        "description": "What are you, the ai assistant, requesting to be done with the text you are providing?",
-                    },
-                    "text": {
-                        "type": "string",
-                        "description": "The text to be analyzed",
-                    },
-                },
-                "required": ["question", "text"],
-            },
-        },
-    },
-    {
-        "type": "function",
-        "function": {
-            "name": "ask_chat_gpt_4_0613_synchronous",
-            "description": "Ask a more experienced colleague for assistance.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "temperature": {
-                        "type": "integer",
-                        "description": "The temperature associated with request: 0 for factual, 2 for creative.",
-                    },
-                    "question": {
-                        "type": "string",
-                        "description": "What are you, the ai assistant, requesting to be done with the text you are providing?",
-                    },
-                    "text": {
-                        "type": "string",
-                        "description": "The text to be analyzed",
-                    },
-                    "tools": {
-                        "type": "string",
-                        "description": "The tools to use for the request.",
-                    },
-                    "tool_choice": {
-                        "type": "string",
-                        "description": "The tool choice to use for the request.",
-                    },
-                },
-                "required": ["question", "text"],
-            },
-        },
-    },
-    {
-        "type": "function",
-        "function": {
-            "name": "ask_chat_gpt_4_0613_asynchronous",
-            "description": "Ask a more experienced colleague for assistance.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "temperature": {
-                        "type": "integer",
-                        "description": "The temperature associated with request: 0 for factual, 2 for creative.",
-                    },
-                    "question": {
-                        "type": "string",
-                        "description": "What are you, the ai assistant, requesting to be done with the text you are providing?",
-                    },
-                    "text": {
-                        "type": "string",
-                        "description": "The text to be analyzed",
-                    },
-                    "tools": {
-                        "type": "string",
-                        "description": "The tools to use for the request.",
-                    },
-                    "tool_choice": {
-                        "type": "string",
-                        "description": "The tool choice to use for the request.",
-                    },
-                },
-                "required": ["question", "text"],
-            },
-        },
-    },
-    {
-        "type": "function",
-        "function": {
-            "name": "ask_gpt_4_vision",
-            "description": "Ask GPT-4 Vision a question about a specific image file located in the 'uploads' folder.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "image_name": {
-                        "type": "string",
-                        "description": "The name of the image file in the 'uploads' folder.",
-                    },
-                },
-                "required": ["image_name"],
-            },
-        },
-    },
-    {
-        "type": "function",
-        "function": {
-            "name": "generate_an_image_with_dalle3",
-            "description": "Generate an image with DALL-E 3.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "prompt": {
-                        "type": "string",
-                        "description": "The prompt to use for image generation.",
-                    },
-                    "n": {
-                        "type": "integer",
-                        "description": "The number of images to generate.",
-                    },
-                    "size": {
-                        "type": "string",
-                        "description": "The image size to generate.",
-                    },
-                    "quality": {
-                        "type": "string",
-                        "description": "The image quality to generate.",
-                    },
-                    "style": {
-                        "type": "string",
-                        "description": "The image style to generate. natural or vivid",
-                    },
-                    "response_format": {
-                        "type": "string",
-                        "description": "The response format to use for image generation b64_json or url.",
-                    },
-                },
-                "required": ["prompt"],
-            },
-        },
-    },
-]
+# Build the tool registry of the base tools once at startup.
+tool_registry = ToolRegistry(model=OPENAI_MODEL)
+tool_registry.register_many(base_tool_list, base_functions)
+tool_selector = ToolSelector(
+    tool_registry,
+    top_k=TOOL_SELECTION_TOP_K,
+    always_on=TOOL_SELECTION_ALWAYS_ON,
+)
+
+
+# Keep the conversation of each web session on the server.
+session_store = SessionStore(
+    max_sessions=SESSION_STORE_MAX_SESSIONS,
+    idle_ttl=SESSION_IDLE_TTL,
+    path=SESSION_STORE_PATH if SESSION_STORE_PERSIST else None,
+    model=OPENAI_MODEL,
+    shared=WEB_WORKERS > 1,
+)
+
+# Cap the turns running at once across every session.
+admission = AdmissionController(
+    max_in_flight=ADMISSION_MAX_IN_FLIGHT,
+    max_queue=ADMISSION_MAX_QUEUE,
+    queue_timeout=ADMISSION_QUEUE_TIMEOUT,
+    enabled=ADMISSION_CONTROL_ENABLED,
+)
+
+# Time to the first token and total time of the recent streamed turns.
+stream_timings = deque(maxlen=200)
+
+# Startup time of each enabled plugin, in seconds.
+plugin_timings = {}
+
+
+@app.before_serving
+async def load_plugins():
+    """
+    Discover and initialize the plugins once, before the first request.
+
+    Every request then shares the plugin tools of the tool registry.
+    """
+    started = time.perf_counter()
+    plugin_functions, plugin_tools = await enable_plugins(
+        {}, [], timings=plugin_timings
+    )
+    tool_registry.register_many(plugin_tools, plugin_functions)
+    console.print(
+        f"Loaded {len(plugin_tools)} plugin tools in "
+        f"{(time.perf_counter() - started) * 1000:.0f} ms."
+    )
+
+
+def opening_messages(user_input):
+    """
+    Build the messages opening a new conversation.
+    """
+    return [
+        {"role": "system", "content": f"{MAIN_SYSTEM_PROMPT}"},
+        {"role": "assistant", "content": "Understood. As we continue, feel free to direct any requests or tasks you'd like assistance with. Whether it's querying information, managing schedules, processing data, or utilizing any of the tools and functionalities I have available."},
+        {"role": "user", "content": f"{user_input}"},
+    ]
+
+
+def too_busy(rejected: AdmissionRejected):
+    """
+    Build the 429 response of a turn turned away by admission control.
+    """
+    response = jsonify(
+        {
+            "error": "The assistant is busy, please retry shortly.",
+            "retry_after": rejected.retry_after,
+        }
+    )
+    return response, 429, {"Retry-After": str(rejected.retry_after)}
 
 
 @app.route("/chat", methods=["POST"])
@@ -298,35 +165,235 @@ async def chat():
     if not user_input:
         return jsonify({"error": "User input is required"}), 400
 
-    memory = data.get("memory", [])
+    session_id = data.get("session_id")
+    if not is_session_id(session_id):
+        session_id = session_store.new_id()
     mem_size = data.get("mem_size", 200)
 
-    base_functions, plugin_tools = await enable_plugins({}, [])
-    all_functions = {**available_functions, **base_functions}
-
-    final_response, memory = await run_conversation(
-        messages=[
-            {"role": "system", "content": f"{MAIN_SYSTEM_PROMPT}"},
-            {"role": "assistant", "content": "Understood. As we continue, feel free to direct any requests or tasks you'd like assistance with. Whether it's querying information, managing schedules, processing data, or utilizing any of the tools and functionalities I have available."},
-            {"role": "user", "content": f"{user_input}"},
-        ],
-        tools=tools + plugin_tools,
-        available_functions=all_functions,
-        original_user_input=user_input,
-        mem_size=mem_size,
-        memory=memory,
-    )
+    tool_session = tool_registry.session()
+
+    messages = opening_messages(user_input)
+
+    try:
+        await admission.acquire()
+    except AdmissionRejected as rejected:
+        return too_busy(rejected)
+    turn_started = time.perf_counter()
+
+    try:
+        async with session_store.open(session_id) as session:
+            fast_answer, session.memory = await run_fast_path(
+                fast_path_router,
+                messages,
+                tool_session.tools(),
+                tool_session.available_functions,
+                user_input,
+                session.memory,
+            )
+            if fast_answer is not None:
+                return jsonify(
+                    {
+                        "session_id": session_id,
+                        "response": format_response_text(fast_answer.text),
+                    }
+                )
+
+            started = time.perf_counter()
+            final_response, session.memory = await run_conversation(
+                messages=messages,
+                tools=tool_session.tools(),
+                available_functions=tool_session.available_functions,
+                original_user_input=user_input,
+                mem_size=mem_size,
+                memory=session.memory,
+                tool_selector=tool_selector,
+                retriever=memory_retriever,
+                prefetcher=tool_prefetcher,
+                compactor=memory_compactor,
+            )
+            fast_path_router.record_pipeline(time.perf_counter() - started)
+    finally:
+        admission.release(time.perf_counter() - turn_started)
 
     response_message = final_response.choices[0].message
     response_text = response_message.content if response_message.content is not None else "I'm not sure how to help with that."
 
     response_text = format_response_text(response_text)
 
-    return jsonify({"response": response_text, "memory": memory})
+    return jsonify({"session_id": session_id, "response": response_text})
 
 
+@app.route("/chat/stream", methods=["POST"])
+async def chat_stream():
+    """
+    Stream a turn as Server-Sent Events.
+
+    The events are ``start`` with the session ID, ``token`` for each
+    content delta of the model, ``tool_start`` and ``tool_end`` for each
+    tool call, and ``final`` with the formatted response and the timings
+    of the turn, or ``error``.
+    """
+    data = await request.json
+    user_input = data.get("user_input")
+    if not user_input:
+        return jsonify({"error": "User input is required"}), 400
+
+    session_id = data.get("session_id")
+    if not is_session_id(session_id):
+        session_id = session_store.new_id()
+    mem_size = data.get("mem_size", 200)
+
+    try:
+        await admission.acquire()
+    except AdmissionRejected as rejected:
+        return too_busy(rejected)
+    turn_started = time.perf_counter()
+
+    tool_session = tool_registry.session()
+    messages = opening_messages(user_input)
+    channel = EventChannel()
+
+    async def run_turn():
+        try:
+            async with session_store.open(session_id) as session:
+                fast_answer, session.memory = await run_fast_path(
+                    fast_path_router,
+                    messages,
+                    tool_session.tools(),
+                    tool_session.available_functions,
+                    user_input,
+                    session.memory,
+                )
+                if fast_answer is not None:
+                    response_text = fast_answer.text
+                else:
+                    started = time.perf_counter()
+                    final_response, session.memory = await run_conversation(
+                        messages=messages,
+                        tools=tool_session.tools(),
+                        available_functions=tool_session.available_functions,
+                        original_user_input=user_input,
+                        mem_size=mem_size,
+                        memory=session.memory,
+                        stream=True,
+                        on_token=channel.on_token,
+                        on_discard=channel.on_discard,
+                        tool_selector=tool_selector,
+                        retriever=memory_retriever,
+                        prefetcher=tool_prefetcher,
+                        on_tool_event=channel.on_tool_event,
+                        compactor=memory_compactor,
+                    )
+                    fast_path_router.record_pipeline(
+                        time.perf_counter() - started
+                    )
+                    content = final_response.choices[0].message.content
+                    response_text = (
+                        content if content is not None
+                        else "I'm not sure how to help with that."
+                    )
+
+            timings = {
+                "first_token_ms": (
+                    round(channel.first_token * 1000, 1)
+                    if channel.first_token is not None else None
+                ),
+                "total_ms": round(
+                    (time.perf_counter() - channel.started) * 1000, 1
+                ),
+            }
+            stream_timings.append(timings)
+            channel.emit(
+                "final",
+                {
+                    "response": format_response_text(response_text),
+                    "timings": timings,
+                },
+            )
+        # The client is told about the failure, the stream must still end.
+        except Exception:  # pylint: disable=broad-except
+            channel.emit(
+                "error",
+                {"error": "Unable to get a response from the assistant."},
+            )
+        finally:
+            channel.close()
+            admission.release(time.perf_counter() - turn_started)
+
+    # The turn owns the admission slot, even if the stream is never read.
+    task = asyncio.create_task(run_turn())
+
+    async def events():
+        try:
+            yield format_sse("start", {"session_id": session_id}).encode()
+            async for event in channel.events():
+                yield event.encode()
+        finally:
+            # Stop the turn when the client disconnects.
+            if not task.done():
+                task.cancel()
+
+    response = await make_response(
+        events(),
+        200,
+        {
+            "Content-Type": "text/event-stream",
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+        },
+    )
+    response.timeout = None
+    return response
+
+
+@app.route("/stats")
+async def stats():
+    """
+    Get the session, admission and streaming counters of this worker.
+    """
+    first_tokens = [
+        timing["first_token_ms"] for timing in stream_timings
+        if timing["first_token_ms"] is not None
+    ]
+    return jsonify(
+        {
+            "worker": os.getpid(),
+            "sessions": session_store.stats(),
+            "compactor": memory_compactor.stats(),
+            "shared_store": shared_store.stats(),
+            "admission": admission.stats(),
+            "stream": {
+                "turns": len(stream_timings),
+                "average_first_token_ms": (
+                    round(sum(first_tokens) / len(first_tokens), 1)
+                    if first_tokens else None
+                ),
+                "average_total_ms": (
+                    round(
+                        sum(t["total_ms"] for t in stream_timings)
+                        / len(stream_timings),
+                        1,
+                    )
+                    if stream_timings else None
+                ),
+            },
+        }
+    )
+
 if __name__ == "__main__":
     config = Config()
     port = int(os.environ.get("PORT", 8080))
     config.bind = [f"0.0.0.0:{port}"]
-    asyncio.run(serve(app, config))
+    if WEB_WORKERS > 1:
+        # Each worker process imports this module and serves on the shared
+        # socket; caches and sessions are shared through SQLite.
+        if not SESSION_STORE_PERSIST:
+            raise SystemExit(
+                "WEB_WORKERS above 1 requires SESSION_STORE_PERSIST, or "
+                "each worker would keep its own copy of the sessions."
+            )
+        config.application_path = "web_app:app"
+        config.workers = WEB_WORKERS
+        hypercorn_run(config)
+    else:
+        asyncio.run(serve(app, config))